@@ -43,11 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reports.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'multitenant.middleware.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +89,23 @@ DATABASES = {
 }
 
 
+# Sharding por tenant: cada Tenant.database indica el alias de su base de datos.
+# Los modelos con campo `tenant` de estas apps se envían al shard del tenant.
+DATABASE_ROUTERS = ['multitenant.routers.TenantShardRouter']
+TENANT_SHARDED_APPS = ['reports']
+TENANT_SHARED_MODELS = ['reports.ReportJob']
+# Modelos del tenant cuyas filas sin tenant (compartidas) se copian de 'default' a cada shard
+TENANT_SHARED_LOOKUP_MODELS = ['reports.DocumentType', 'reports.PaymentType']
+
+# Réplicas de lectura: alias principal -> alias de la réplica (ej: {'default': 'replica'})
+DATABASE_REPLICAS = {}
+
+# Exportaciones en streaming: alias de lectura -> alias con cursor sin buffer (SSCursor en MySQL).
+# Es una conexión aparte para que las demás consultas de la petición no choquen con el cursor abierto.
+DATABASES['default_stream'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_STREAMING = {'default': 'default_stream'}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -130,3 +149,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Modelo de usuario personalizado
 AUTH_USER_MODEL = 'multitenant.User'
+
+# Segundos que un tenant resuelto por dominio permanece en la caché del proceso
+TENANT_CACHE_TTL = 300
+
+# Segundos que se conservan en caché las respuestas de reportes
+REPORTS_CACHE_TIMEOUT = 300
+
+# Paginación por cursor del reporte de citas entre fechas
+REPORTS_PAGE_SIZE = 100
+REPORTS_MAX_PAGE_SIZE = 500
+
+# Ruta rápida de serialización de reportes (formateadores directos y orjson si está instalado)
+REPORTS_FAST_SERIALIZATION = True
+
+# Worker de reportes PDF en segundo plano (manage.py run_report_worker)
+REPORT_WORKER_PROCESSES = 2
+REPORT_JOB_TIMEOUT = 600  # segundos antes de reencolar un trabajo bloqueado
+
+# Caché en disco de PDFs generados
+REPORTS_PDF_CACHE_DIR = BASE_DIR / 'pdf_cache'
+REPORTS_PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Cantidad de peticiones recientes por tenant y endpoint usadas para los percentiles
+REQUEST_METRICS_WINDOW = 1000
+
+# Leer reportes (y opcionalmente exportaciones) desde la réplica de lectura
+REPORTS_USE_REPLICA = True
+REPORTS_EXPORTS_USE_REPLICA = True
+
+# Búsqueda de pacientes: resultados por defecto y máximo por consulta
+PATIENT_SEARCH_RESULTS = 20
+PATIENT_SEARCH_MAX_RESULTS = 50
+
+# Hilos del pool para trabajo bloqueante (PDF/xlsx) de las vistas async
+REPORTS_BLOCKING_WORKERS = 4
+
+# Turnos libres de terapeutas: horario de atención, duración del turno,
+# días laborables (0 = lunes) y rango máximo por consulta
+AVAILABILITY_START_TIME = '08:00'
+AVAILABILITY_END_TIME = '20:00'
+AVAILABILITY_SLOT_MINUTES = 60
+AVAILABILITY_WORKING_DAYS = [0, 1, 2, 3, 4, 5]
+AVAILABILITY_MAX_DAYS = 62
+
+# Máximo de citas por solicitud de reserva en bloque
+BOOKING_MAX_ITEMS = 500
+
+# Máximo de sesiones generadas por tratamiento recurrente
+TREATMENT_MAX_SESSIONS = 100
+
+# Vigencia en caché de cada mes cerrado de la serie diaria (la clave cambia si el mes se modifica)
+REPORTS_SERIES_PARTITION_TIMEOUT = 60 * 60 * 24 * 30
+
+# Rango máximo (en días) de las estadísticas y de la serie diaria por consulta
+REPORTS_SERIES_MAX_DAYS = 3 * 366
+
+# Segundos que la versión de datos de cada tenant se lee de la caché (un 304 no consulta la base)
+REPORTS_DATA_VERSION_TIMEOUT = 5
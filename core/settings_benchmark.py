@@ -0,0 +1,17 @@
+"""
+Configuración para ejecutar los benchmarks de reportes sobre SQLite local:
+
+    python manage.py benchmark_reports --settings=core.settings_benchmark
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'benchmark.sqlite3',
+    }
+}
+
+ALLOWED_HOSTS = ['localhost', '.localhost', '127.0.0.1']
+
+REPORTS_PDF_CACHE_DIR = BASE_DIR / 'benchmark_pdf_cache'
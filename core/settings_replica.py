@@ -0,0 +1,26 @@
+"""
+Configuración local con una réplica de lectura sobre SQLite:
+
+    python manage.py migrate --settings=core.settings_replica
+    python manage.py runserver --settings=core.settings_replica
+
+Ambos alias apuntan al mismo archivo, como una réplica sin retraso; en las
+pruebas la réplica es un espejo de 'default' (TEST MIRROR).
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_REPLICAS = {'default': 'replica'}
+
+ALLOWED_HOSTS = ['localhost', '.localhost', '127.0.0.1']
@@ -0,0 +1,29 @@
+"""
+Configuración local con varios shards SQLite para probar el sharding por tenant:
+
+    python manage.py migrate --settings=core.settings_shards
+    python manage.py migrate --database shard_1 --settings=core.settings_shards
+    python manage.py migrate --database shard_2 --settings=core.settings_shards
+    python manage.py move_tenant <tenant_id> shard_1 --settings=core.settings_shards
+
+'default' guarda los tenants, los usuarios y la cola de trabajos; los datos
+de cada tenant viven en la base indicada en Tenant.database.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard_default.sqlite3',
+    },
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard_1.sqlite3',
+    },
+    'shard_2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard_2.sqlite3',
+    },
+}
+
+ALLOWED_HOSTS = ['localhost', '.localhost', '127.0.0.1']
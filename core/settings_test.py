@@ -0,0 +1,40 @@
+"""
+Configuración para ejecutar las pruebas sobre SQLite (en memoria):
+
+    python manage.py test --settings=core.settings_test
+
+Incluye un shard ('shard_1') y una réplica de 'default' ('replica', espejo
+en las pruebas) para probar el router de tenants y las lecturas de réplica.
+"""
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_default.sqlite3',
+    },
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_shard_1.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_default.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_REPLICAS = {'default': 'replica'}
+
+# Las pruebas que usan la réplica la habilitan con override_settings
+REPORTS_USE_REPLICA = False
+REPORTS_EXPORTS_USE_REPLICA = False
+
+ALLOWED_HOSTS = ['testserver', 'localhost', '.localhost']
+
+REPORTS_PDF_CACHE_DIR = Path(tempfile.gettempdir()) / 'reports_pdf_cache_test'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class MultitenantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'multitenant'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        
+        # Registrar señales de invalidación de la caché de tenants
+        from . import signals  # noqa: F401
+        from .routers import use_unbuffered_cursor
+        from .shared_rows import delete_shared_row, shared_lookup_models, sync_shared_row
+        
+        # Cursor sin buffer en las conexiones de streaming (DATABASE_STREAMING)
+        connection_created.connect(use_unbuffered_cursor)
+        
+        # Copias en los shards de las filas compartidas (tipos de documento y de pago sin tenant)
+        for model in shared_lookup_models():
+            post_save.connect(sync_shared_row, sender=model)
+            post_delete.connect(delete_shared_row, sender=model)
@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_active_tenant = ContextVar('active_tenant', default=None)
+
+
+def get_active_tenant():
+    """Tenant activo del contexto actual (petición, comando o worker)."""
+    return _active_tenant.get()
+
+
+@contextmanager
+def use_tenant(tenant):
+    """
+    Activa un tenant para el bloque. El router de bases de datos lo usa para
+    enviar las consultas de modelos del tenant a su base de datos (shard).
+    """
+    token = _active_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _active_tenant.reset(token)
+
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_primary_reads = ContextVar('primary_reads', default=False)
+_request_writes = ContextVar('request_writes', default=None)
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Permite que las lecturas del bloque vayan a la réplica de la base del
+    tenant (si hay una configurada en DATABASE_REPLICAS).
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Envía a la base principal las lecturas del bloque, aunque esté dentro de
+    read_from_replica() (por ejemplo, para calcular algo que se va a cachear).
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+def replica_reads_enabled():
+    return _replica_reads.get() and not _primary_reads.get()
+
+
+@contextmanager
+def track_writes():
+    """
+    Registra si hubo escrituras durante el bloque (una petición). Después de
+    escribir, las lecturas vuelven a la base principal para ver los datos nuevos.
+    """
+    token = _request_writes.set({'wrote': False})
+    try:
+        yield
+    finally:
+        _request_writes.reset(token)
+
+
+def note_write():
+    state = _request_writes.get()
+    if state is not None:
+        state['wrote'] = True
+
+
+def wrote_in_context():
+    state = _request_writes.get()
+    return state is not None and state['wrote']
@@ -0,0 +1,145 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connections, transaction
+
+from multitenant.models import Tenant
+from multitenant.routers import is_sharded, primary_databases, tenant_database
+from multitenant.shared_rows import copy_all_shared_rows
+
+
+def sharded_models():
+    """
+    Modelos del tenant ordenados para copiarlos: primero los referenciados
+    por claves foráneas (tipos de documento, pacientes...) y luego el resto.
+    """
+    pending = [model for model in apps.get_models() if is_sharded(model)]
+    ordered = []
+    while pending:
+        for model in pending:
+            dependencies = {
+                field.related_model for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is not model and field.related_model in pending
+            }
+            if not dependencies:
+                ordered.append(model)
+                pending.remove(model)
+                break
+        else:
+            raise CommandError("Dependencias circulares entre modelos del tenant")
+    return ordered
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los datos de un tenant a otra base de datos (shard) y actualiza Tenant.database. "
+        "Ejecutar en una ventana de mantenimiento: las escrituras del tenant durante la copia se pierden "
+        "y los demás procesos ven el cambio al expirar su caché de tenants (TENANT_CACHE_TTL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', type=int, help="ID del tenant a mover.")
+        parser.add_argument('database', help="Alias destino en settings.DATABASES.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Filas por bulk_create.")
+        parser.add_argument('--keep-source', action='store_true',
+                            help="No borrar los datos de la base de origen.")
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(pk=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"No existe el tenant con id {options['tenant']}")
+        source = tenant_database(tenant)
+        target = options['database']
+        if target not in primary_databases():
+            raise CommandError(f"La base de datos '{target}' no está configurada o es una réplica")
+        if source == target:
+            raise CommandError(f"El tenant {tenant} ya está en '{target}'")
+
+        models = sharded_models()
+        self.check_conflicts(tenant, models, source, target, options['batch_size'])
+
+        # Copia del tenant y de las filas compartidas en el shard destino, para las claves foráneas
+        Tenant.objects.using(target).update_or_create(
+            pk=tenant.pk, defaults={'name': tenant.name, 'domain': tenant.domain, 'database': target}
+        )
+        try:
+            copy_all_shared_rows(target)
+        except IntegrityError as e:
+            raise CommandError(f"{e}; no se movió nada")
+        with transaction.atomic(using=target):
+            for model in models:
+                copied = self.copy_model(model, tenant, source, target, options['batch_size'])
+                self.stdout.write(f"{model._meta.label}: {copied} filas copiadas.")
+
+        # A partir de aquí el router envía el tenant a su nuevo shard
+        tenant.database = target
+        tenant.save(update_fields=['database'])
+
+        if not options['keep_source']:
+            self.delete_source(tenant, models, source)
+        self.stdout.write(self.style.SUCCESS(f"Tenant {tenant} movido de '{source}' a '{target}'."))
+
+    def check_conflicts(self, tenant, models, source, target, batch_size):
+        """
+        Las filas conservan su id. Si el destino ya tiene ids iguales (de otro
+        tenant) se aborta: los shards deben usar rangos de ids disjuntos
+        (por ejemplo, auto_increment_offset distinto en cada MySQL).
+        También se comprueban los demás campos únicos (como document_number):
+        cada base garantiza la unicidad solo entre sus propias filas.
+        """
+        for model in models:
+            unique_fields = [
+                field.attname for field in model._meta.concrete_fields
+                if field.unique and not field.primary_key
+            ]
+            rows = model.objects.using(source).filter(tenant=tenant).values_list('pk', *unique_fields)
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self.check_batch(model, target, batch, unique_fields)
+                    batch = []
+            if batch:
+                self.check_batch(model, target, batch, unique_fields)
+
+    def check_batch(self, model, target, batch, unique_fields):
+        for index, field in enumerate(['pk'] + unique_fields):
+            values = [row[index] for row in batch if row[index] is not None]
+            if values and model.objects.using(target).filter(**{f'{field}__in': values}).exists():
+                name = 'ids' if field == 'pk' else f"valores de '{field}'"
+                raise CommandError(
+                    f"{model._meta.label}: '{target}' ya tiene filas con los mismos {name}; no se movió nada"
+                )
+
+    def copy_model(self, model, tenant, source, target, batch_size):
+        """Copia las filas del tenant sin disparar señales (bulk_create)."""
+        fields = [field.attname for field in model._meta.concrete_fields]
+        rows = model.objects.using(source).filter(tenant=tenant).order_by('pk').values(*fields)
+        copied = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(model(**row))
+            if len(batch) >= batch_size:
+                model.objects.using(target).bulk_create(batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            model.objects.using(target).bulk_create(batch)
+            copied += len(batch)
+        return copied
+
+    def delete_source(self, tenant, models, source):
+        """
+        Borra los datos del tenant en el origen con DELETE directos, en orden
+        inverso, para no disparar las señales que actualizan resúmenes.
+        """
+        connection = connections[source]
+        quote = connection.ops.quote_name
+        with transaction.atomic(using=source), connection.cursor() as cursor:
+            for model in reversed(models):
+                column = model._meta.get_field('tenant').column
+                cursor.execute(
+                    f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} = %s",
+                    [tenant.pk],
+                )
+                self.stdout.write(f"{model._meta.label}: {cursor.rowcount} filas borradas de '{source}'.")
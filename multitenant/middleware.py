@@ -0,0 +1,44 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http.request import split_domain_port
+
+from .context import track_writes, use_tenant
+from .tenant_cache import tenant_cache
+from .utils import aget_request_tenant, get_request_tenant
+
+
+class TenantMiddleware:
+    """
+    Resuelve el tenant de la petición a partir del header Host y lo asigna
+    a request.tenant. Funciona también para peticiones anónimas o con token,
+    ya que no depende de request.user.
+    Además activa el tenant de la petición para el router de shards y
+    registra sus escrituras (para no leer de la réplica después de escribir).
+    Soporta vistas síncronas (WSGI) y async (ASGI).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.tenant = self.resolve_tenant(request)
+        with use_tenant(get_request_tenant(request)), track_writes():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # La caché de tenants puede consultar la base: se resuelve fuera del event loop
+        request.tenant = await sync_to_async(self.resolve_tenant)(request)
+        with use_tenant(await aget_request_tenant(request)), track_writes():
+            return await self.get_response(request)
+
+    def resolve_tenant(self, request):
+        domain, _ = split_domain_port(request.get_host())
+        if not domain:
+            return None
+        return tenant_cache.get_by_domain(domain)
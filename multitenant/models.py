@@ -4,6 +4,7 @@ from django.contrib.auth.models import AbstractUser
 class Tenant(models.Model):
     name = models.CharField(max_length=100, unique=True)
     domain = models.CharField(max_length=100, unique=True)  # ej: empresa1.com
+    database = models.CharField(max_length=100, default='default')  # alias en settings.DATABASES (shard)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -0,0 +1,134 @@
+from django.conf import settings
+
+from .context import get_active_tenant, note_write, replica_reads_enabled, wrote_in_context
+from .models import Tenant
+from .tenant_cache import tenant_cache
+
+
+def is_sharded(model):
+    """
+    Indica si el modelo guarda datos de un tenant y vive en el shard del tenant.
+    Son los modelos con campo `tenant` de las apps de TENANT_SHARDED_APPS,
+    salvo los listados en TENANT_SHARED_MODELS (por ejemplo, colas globales).
+    """
+    opts = model._meta
+    if opts.app_label not in getattr(settings, 'TENANT_SHARDED_APPS', []):
+        return False
+    if opts.label in getattr(settings, 'TENANT_SHARED_MODELS', []):
+        return False
+    return any(field.name == 'tenant' for field in opts.concrete_fields)
+
+
+def tenant_database(tenant):
+    """Alias de la base de datos del tenant ('default' si no tiene shard)."""
+    if tenant is None:
+        return None
+    return getattr(tenant, 'database', None) or 'default'
+
+
+def tenant_id_database(tenant_id):
+    """Alias de la base de datos del tenant con el id dado."""
+    if tenant_id is None:
+        return 'default'
+    return tenant_database(tenant_cache.get_by_id(tenant_id)) or 'default'
+
+
+def replica_database(alias):
+    """Alias de la réplica de lectura de `alias` (el mismo alias si no tiene)."""
+    return getattr(settings, 'DATABASE_REPLICAS', {}).get(alias, alias)
+
+
+def primary_database(alias):
+    """Alias de la base principal de una réplica (el mismo alias si no es réplica)."""
+    for primary, replica in getattr(settings, 'DATABASE_REPLICAS', {}).items():
+        if replica == alias:
+            return primary
+    return alias
+
+
+def streaming_database(alias):
+    """
+    Alias para recorrer en streaming un resultado grande leído de `alias`:
+    el indicado en DATABASE_STREAMING (conexión con cursor sin buffer) o,
+    si no hay uno configurado, el mismo alias.
+    """
+    stream = getattr(settings, 'DATABASE_STREAMING', {}).get(alias)
+    return stream if stream in settings.DATABASES else alias
+
+
+def secondary_databases():
+    """Alias que solo se leen: réplicas y conexiones de streaming."""
+    return (
+        set(getattr(settings, 'DATABASE_REPLICAS', {}).values())
+        | set(getattr(settings, 'DATABASE_STREAMING', {}).values())
+    )
+
+
+def primary_databases():
+    """Alias de settings.DATABASES que no son réplicas ni conexiones de streaming."""
+    secondary = secondary_databases()
+    return [alias for alias in settings.DATABASES if alias not in secondary]
+
+
+def use_unbuffered_cursor(sender, connection, **kwargs):
+    """
+    Receptor de connection_created: con MySQL, las conexiones de
+    DATABASE_STREAMING usan SSCursor. mysqlclient guarda en memoria todo el
+    resultado con el cursor normal (también con .iterator()); con SSCursor
+    las filas se leen del servidor a medida que se recorren.
+    """
+    if connection.vendor != 'mysql':
+        return
+    if connection.alias not in set(getattr(settings, 'DATABASE_STREAMING', {}).values()):
+        return
+    from MySQLdb.cursors import SSCursor
+    connection.connection.cursorclass = SSCursor
+
+
+class TenantShardRouter:
+    """
+    Envía lecturas y escrituras de los modelos del tenant a su base de datos.
+    - Si la instancia indica su tenant (hint `instance`), se usa ese tenant.
+    - Si no, se usa el tenant activo del contexto (ver multitenant.context).
+    - Tenant, User y los modelos compartidos quedan en 'default'.
+    - Dentro de read_from_replica() las lecturas van a la réplica del shard,
+      salvo que ya se haya escrito en el mismo contexto (petición).
+    """
+
+    def _db_for_model(self, model, **hints):
+        if not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, Tenant):
+            return tenant_database(tenant_cache.get_by_id(instance.pk) or instance)
+        # Se lee de __dict__ para no cargar campos diferidos (eso volvería a consultar el router)
+        tenant_id = instance.__dict__.get('tenant_id') if instance is not None else None
+        if tenant_id is not None:
+            return tenant_id_database(tenant_id)
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return tenant_database(get_active_tenant())
+
+    def db_for_read(self, model, **hints):
+        database = self._db_for_model(model, **hints)
+        if database is not None and replica_reads_enabled() and not wrote_in_context():
+            return replica_database(database)
+        return database
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        database = self._db_for_model(model, **hints)
+        return primary_database(database) if database is not None else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Dos modelos del tenant solo se relacionan dentro del mismo shard;
+        # las relaciones con modelos compartidos (Tenant, User) se permiten.
+        if is_sharded(type(obj1)) and is_sharded(type(obj2)):
+            return primary_database(obj1._state.db) == primary_database(obj2._state.db)
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Todas las bases tienen el mismo esquema; las réplicas y las conexiones de streaming no se migran
+        if db in secondary_databases():
+            return False
+        return None
@@ -0,0 +1,78 @@
+"""
+Filas compartidas (sin tenant) de los modelos de TENANT_SHARED_LOOKUP_MODELS,
+por ejemplo los tipos de documento o de pago comunes a todas las clínicas.
+
+Se administran en 'default' y cada shard guarda una copia con el mismo id,
+porque los datos de los tenants del shard las referencian con claves
+foráneas. Las copias se escriben sin disparar señales.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .routers import primary_databases
+
+
+def shared_lookup_models():
+    """Modelos cuyas filas sin tenant se copian a todos los shards."""
+    return [apps.get_model(label) for label in getattr(settings, 'TENANT_SHARED_LOOKUP_MODELS', [])]
+
+
+def shard_databases():
+    """Bases principales distintas de 'default'."""
+    return [alias for alias in primary_databases() if alias != 'default']
+
+
+def _values(instance):
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def copy_shared_rows(model, rows, target):
+    """
+    Crea o actualiza en `target` las filas compartidas `rows` (del mismo id).
+    Si el id ya lo usa una fila de un tenant en `target` lanza IntegrityError:
+    los shards deben usar rangos de ids distintos.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    manager = model._base_manager.db_manager(target)
+    owned = list(manager.filter(pk__in=[row.pk for row in rows], tenant__isnull=False).values_list('pk', flat=True))
+    if owned:
+        raise IntegrityError(
+            f"{model._meta.label}: '{target}' usa los ids {sorted(owned)} para filas de un tenant"
+        )
+    with transaction.atomic(using=target):
+        missing = []
+        for row in rows:
+            values = _values(row)
+            pk = values.pop(model._meta.pk.attname)
+            if not manager.filter(pk=pk).update(**values):
+                missing.append(model(pk=pk, **values))
+        manager.bulk_create(missing)
+
+
+def copy_all_shared_rows(target, source='default'):
+    """Copia a `target` todas las filas compartidas de `source` (por ejemplo, al agregar un shard)."""
+    for model in shared_lookup_models():
+        copy_shared_rows(model, model._base_manager.using(source).filter(tenant__isnull=True), target)
+
+
+def sync_shared_row(sender, instance, raw=False, using=None, **kwargs):
+    """Receptor de post_save: copia a los shards una fila compartida guardada en 'default'."""
+    if raw or using != 'default' or instance.tenant_id is not None:
+        return
+    for alias in shard_databases():
+        copy_shared_rows(sender, [instance], alias)
+
+
+def delete_shared_row(sender, instance, using=None, **kwargs):
+    """
+    Receptor de post_delete: elimina las copias de una fila compartida
+    borrada en 'default'. El borrado en cada shard aplica on_delete a las
+    filas que la referencian (y sus señales), igual que en 'default'.
+    """
+    if using != 'default' or instance.tenant_id is not None:
+        return
+    for alias in shard_databases():
+        sender._base_manager.using(alias).filter(pk=instance.pk, tenant__isnull=True).delete()
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Tenant
+from .routers import primary_databases, tenant_database
+from .tenant_cache import tenant_cache
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    """Invalida la caché de tenants cuando un tenant cambia o se elimina."""
+    tenant_cache.invalidate(instance)
+
+
+@receiver(post_save, sender=Tenant)
+def sync_tenant_to_shard(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Los modelos del tenant tienen clave foránea a Tenant, por eso su shard
+    guarda una copia de la fila. Se crea o actualiza cada vez que el tenant
+    se guarda en 'default' (al crearlo, al cambiar el dominio, etc.).
+    """
+    if raw or using != 'default':
+        return
+    database = tenant_database(instance)
+    if database == 'default' or database not in primary_databases():
+        return
+    Tenant.objects.using(database).update_or_create(
+        pk=instance.pk,
+        defaults={'name': instance.name, 'domain': instance.domain, 'database': database}
+    )
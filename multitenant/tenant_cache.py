@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Tenant
+
+
+class TenantCache:
+    """
+    Caché en memoria del proceso para resolver tenants por dominio o por id.
+    - Cada entrada expira después de TENANT_CACHE_TTL segundos.
+    - Los dominios desconocidos también se guardan (como None) para no
+      consultar la base de datos en cada petición con un Host inválido.
+    - Las señales de Tenant invalidan las entradas al guardar o eliminar.
+    """
+
+    def __init__(self):
+        self._by_domain = {}
+        self._by_id = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'TENANT_CACHE_TTL', 300)
+
+    def _get(self, store, key):
+        entry = store.get(key)
+        if entry is None:
+            return False, None
+        tenant, expires_at = entry
+        if expires_at < time.monotonic():
+            return False, None
+        return True, tenant
+
+    def _store(self, tenant, domain=None):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if domain is not None:
+                self._by_domain[domain] = (tenant, expires_at)
+            if tenant is not None:
+                self._by_domain[tenant.domain.lower()] = (tenant, expires_at)
+                self._by_id[tenant.pk] = (tenant, expires_at)
+
+    def get_by_domain(self, domain):
+        """Devuelve el tenant asociado al dominio o None si no existe."""
+        domain = domain.lower()
+        found, tenant = self._get(self._by_domain, domain)
+        if found:
+            return tenant
+        tenant = Tenant.objects.filter(domain__iexact=domain).first()
+        self._store(tenant, domain=domain)
+        return tenant
+
+    def get_by_id(self, tenant_id):
+        """Devuelve el tenant con el id dado o None si no existe."""
+        if tenant_id is None:
+            return None
+        found, tenant = self._get(self._by_id, tenant_id)
+        if found:
+            return tenant
+        tenant = Tenant.objects.filter(pk=tenant_id).first()
+        if tenant is not None:
+            self._store(tenant)
+        return tenant
+
+    def invalidate(self, tenant):
+        """Elimina las entradas del tenant, incluido su dominio anterior."""
+        with self._lock:
+            self._by_id.pop(tenant.pk, None)
+            self._by_domain.pop(tenant.domain.lower(), None)
+            stale = [
+                domain for domain, (cached, _) in self._by_domain.items()
+                if cached is not None and cached.pk == tenant.pk
+            ]
+            for domain in stale:
+                del self._by_domain[domain]
+
+    def clear(self):
+        with self._lock:
+            self._by_domain.clear()
+            self._by_id.clear()
+
+
+tenant_cache = TenantCache()
@@ -1,3 +1,117 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, router
 from django.test import TestCase
 
-# Create your tests here.
+from reports.models import Appointment, DailyReportRollup, DocumentType, Patient, PaymentType
+from reports.tests import TenantDataMixin
+
+from .context import use_tenant
+from .models import Tenant
+from .routers import TenantShardRouter, primary_databases
+
+
+class ShardRoutingTests(TenantDataMixin, TestCase):
+    """El router envía los datos de cada tenant a su shard y las filas compartidas se copian a todos."""
+
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        super().setUp()
+        self.local = self.create_tenant('local')
+        self.sharded = self.create_tenant('remota', database='shard_1')
+
+    def test_tenant_row_is_kept_in_sync_on_its_shard(self):
+        copy = Tenant.objects.using('shard_1').get(pk=self.sharded.pk)
+        self.assertEqual((copy.domain, copy.database), ('remota.localhost', 'shard_1'))
+        self.assertFalse(Tenant.objects.using('shard_1').filter(pk=self.local.pk).exists())
+
+        self.sharded.domain = 'remota.example.com'
+        self.sharded.save()
+        self.assertEqual(Tenant.objects.using('shard_1').get(pk=self.sharded.pk).domain, 'remota.example.com')
+
+    def test_reads_and_writes_go_to_the_tenant_shard(self):
+        # Como en una petición: el middleware activa el tenant
+        with use_tenant(self.sharded):
+            patient = self.create_patient(self.sharded)
+            self.create_appointment(self.sharded, patient, self.create_therapist(self.sharded))
+        self.assertEqual(patient._state.db, 'shard_1')
+        self.assertFalse(Patient.objects.using('default').filter(pk=patient.pk).exists())
+        self.assertEqual(DailyReportRollup.objects.using('shard_1').filter(tenant=self.sharded).count(), 1)
+
+        with use_tenant(self.sharded):
+            self.assertEqual(router.db_for_read(Patient), 'shard_1')
+            self.assertEqual(list(Patient.objects.all()), [patient])
+        with use_tenant(self.local):
+            self.assertEqual(router.db_for_write(Patient), 'default')
+            self.assertFalse(Patient.objects.exists())
+        # Tenant y los modelos compartidos no se enrutan por tenant
+        with use_tenant(self.sharded):
+            self.assertEqual(router.db_for_read(Tenant), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        shard_router = TenantShardRouter()
+        self.assertIs(shard_router.allow_migrate('replica', 'reports'), False)
+        self.assertIsNone(shard_router.allow_migrate('shard_1', 'reports'))
+        self.assertNotIn('replica', primary_databases())
+
+    def test_shared_rows_are_copied_to_every_shard(self):
+        shared = PaymentType.objects.using('default').create(tenant=None, name='Transferencia')
+        self.assertEqual(PaymentType.objects.using('shard_1').get(pk=shared.pk).name, 'Transferencia')
+        shared.name = 'Transferencia bancaria'
+        shared.save(using='default')
+        self.assertEqual(PaymentType.objects.using('shard_1').get(pk=shared.pk).name, 'Transferencia bancaria')
+
+        shared.delete(using='default')
+        self.assertFalse(PaymentType.objects.using('shard_1').filter(pk=shared.pk).exists())
+
+    def test_shared_row_ids_must_not_collide_with_tenant_rows(self):
+        with use_tenant(self.sharded):
+            owned = self.create_payment_type(self.sharded, name='Yape')
+        with self.assertRaises(IntegrityError):
+            PaymentType.objects.using('default').create(pk=owned.pk, tenant=None, name='Efectivo')
+
+
+class MoveTenantTests(TenantDataMixin, TestCase):
+    """move_tenant copia los datos del tenant al shard destino o aborta sin cambios."""
+
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+        self.patient = self.create_patient(self.tenant, document_number='40000001')
+        self.create_appointment(self.tenant, self.patient, self.create_therapist(self.tenant), payment='30')
+
+    def move(self):
+        call_command('move_tenant', self.tenant.pk, 'shard_1', stdout=StringIO())
+
+    def test_move_copies_data_and_cleans_the_source(self):
+        shared = PaymentType.objects.using('default').create(tenant=None, name='Compartido')
+        self.move()
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.database, 'shard_1')
+        self.assertTrue(Tenant.objects.using('shard_1').filter(pk=self.tenant.pk).exists())
+        self.assertTrue(PaymentType.objects.using('shard_1').filter(pk=shared.pk, tenant=None).exists())
+        self.assertEqual(Appointment.objects.using('shard_1').filter(tenant=self.tenant).count(), 1)
+        self.assertEqual(DailyReportRollup.objects.using('shard_1').filter(tenant=self.tenant).count(), 1)
+        self.assertFalse(Appointment.objects.using('default').filter(tenant=self.tenant).exists())
+
+        # Las lecturas del tenant ya van al shard
+        self.login(self.tenant)
+        response = self.client.get('/reports/daily-cash/?date=2025-06-02')
+        self.assertEqual(response.status_code, 200)
+
+    def test_move_aborts_on_duplicated_unique_values(self):
+        other = self.create_tenant('otra', database='shard_1')
+        # Cada base valida document_number por separado: el destino ya lo usa
+        with use_tenant(other):
+            # Ids fuera del rango del origen: solo choca el documento
+            document_type = DocumentType.objects.create(pk=900, tenant=other, name='DNI')
+            self.create_patient(other, pk=900, document_number='40000001', document_type=document_type)
+        with self.assertRaisesMessage(CommandError, 'document_number'):
+            self.move()
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.database, 'default')
+        self.assertFalse(Appointment.objects.using('shard_1').exists())
@@ -0,0 +1,28 @@
+from asgiref.sync import sync_to_async
+
+from .tenant_cache import tenant_cache
+
+
+def get_request_tenant(request):
+    """
+    Obtiene el tenant activo de la petición.
+    - Un usuario normal autenticado siempre queda limitado a su propio tenant
+      (leído desde la caché, sin consultas), aunque el dominio sea otro.
+    - En otro caso (anónimo, token o superusuario) usa request.tenant,
+      resuelto por TenantMiddleware a partir del dominio.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and not user.is_superuser:
+        return tenant_cache.get_by_id(user.tenant_id)
+    tenant = getattr(request, 'tenant', None)
+    if tenant is None and user is not None and user.is_authenticated:
+        return tenant_cache.get_by_id(user.tenant_id)
+    return tenant
+
+
+async def aget_request_tenant(request):
+    """
+    Versión async de get_request_tenant. Cargar request.user y la caché de
+    tenants puede consultar la base, por eso se ejecuta fuera del event loop.
+    """
+    return await sync_to_async(get_request_tenant)(request)
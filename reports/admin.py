@@ -1,8 +1,22 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 from .models import DocumentType, Patient, Therapist, PaymentType, Appointment
 
 from multitenant.admin import TenantFilteredAdmin
 
+class LimitedCountPaginator(Paginator):
+	"""
+	Paginador que cuenta como máximo `count_limit` filas.
+	En tablas grandes evita el COUNT(*) completo: se cuenta sobre una
+	subconsulta con LIMIT, así el costo no depende del tamaño total.
+	"""
+	count_limit = 10000
+
+	@cached_property
+	def count(self):
+		return self.object_list[:self.count_limit].count()
+
 class TenantFilteredFKAdmin(TenantFilteredAdmin):
 	def formfield_for_foreignkey(self, db_field, request, **kwargs):
 		# Si el usuario no es superusuario, filtra los ForeignKey por tenant
@@ -14,8 +28,30 @@ class TenantFilteredFKAdmin(TenantFilteredAdmin):
 					kwargs['queryset'] = model.objects.filter(tenant=request.user.tenant)
 		return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+class LargeTenantTableAdmin(TenantFilteredFKAdmin):
+	# Changelists de tablas grandes: sin COUNT(*) total y con conteo limitado
+	paginator = LimitedCountPaginator
+	show_full_result_count = False
+	list_per_page = 50
+
+class PatientAdmin(LargeTenantTableAdmin):
+	list_display = ('document_number', 'paternal_lastname', 'maternal_lastname', 'name', 'primary_phone', 'created_at')
+	# Búsqueda por prefijo (^) para que use índices en lugar de LIKE '%...%'
+	search_fields = ('^document_number', '^paternal_lastname', '^name')
+
+class TherapistAdmin(LargeTenantTableAdmin):
+	list_display = ('document_number', 'last_name_paternal', 'last_name_maternal', 'first_name', 'phone')
+	search_fields = ('^document_number', '^last_name_paternal', '^first_name')
+
+class AppointmentAdmin(LargeTenantTableAdmin):
+	list_display = ('appointment_date', 'appointment_hour', 'patient', 'therapist', 'payment', 'payment_type')
+	list_select_related = ('patient', 'therapist', 'payment_type')
+	# Widgets de autocompletado: usan PatientAdmin/TherapistAdmin, que ya filtran por tenant
+	autocomplete_fields = ('patient', 'therapist')
+	search_fields = ('^patient__document_number', '^patient__paternal_lastname')
+
 admin.site.register(DocumentType, TenantFilteredFKAdmin)
-admin.site.register(Patient, TenantFilteredFKAdmin)
-admin.site.register(Therapist, TenantFilteredFKAdmin)
-admin.site.register(Appointment, TenantFilteredFKAdmin)
+admin.site.register(Patient, PatientAdmin)
+admin.site.register(Therapist, TherapistAdmin)
+admin.site.register(Appointment, AppointmentAdmin)
 admin.site.register(PaymentType, TenantFilteredFKAdmin)
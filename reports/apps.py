@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        
+        # Registrar señales que mantienen el resumen diario de citas
+        from . import signals  # noqa: F401
+        from .metrics import install_sql_wrapper
+        
+        # Medir las consultas SQL de cada conexión (ver RequestMetricsMiddleware)
+        connection_created.connect(install_sql_wrapper)
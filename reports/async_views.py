@@ -0,0 +1,286 @@
+"""
+Versiones async de los endpoints de reportes y exportaciones, para servir
+con un servidor ASGI (por ejemplo `uvicorn core.asgi:application`).
+
+- Las consultas usan el ORM async (aiterator, aaggregate, ...), así una
+  consulta lenta no ocupa un hilo del servidor mientras espera.
+- El trabajo bloqueante (render de PDFs y escritura de xlsx) corre en el
+  pool acotado de `reports.blocking`.
+- Las respuestas son idénticas a las de las vistas síncronas de `views.py`
+  (y comparten la caché de respuestas y los ETag).
+"""
+import traceback
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from multitenant.utils import aget_request_tenant
+
+from .blocking import run_blocking
+from .pagination import InvalidCursor
+from .pdf_reports import PDF_REPORTS, aget_report_data, open_cached_pdf, pdf_cache_key, render_and_cache_pdf
+from .report_cache import acache_report_response, acached_report, replica_is_current
+from .reports_serializers import (
+    DateParameterSerializer,
+    AppointmentPageParameterSerializer,
+    StatisticsParameterSerializer
+)
+from .streaming import aiter_csv, aiter_ndjson, async_file_response, streaming_response
+from .views import ReportAPIView, StreamExportView, get_report_service, tenant_required
+from .xlsx_export import AppointmentWorkbook
+
+
+async def aget_report_service(request, export=False):
+    """Versión async de get_report_service (resolver el tenant puede consultar la base)."""
+    return await sync_to_async(get_report_service)(request, export=export)
+
+
+class AsyncReportAPIView:
+    """Endpoints JSON de reportes con el ORM async."""
+
+    @staticmethod
+    @tenant_required
+    @acache_report_response('appointments_per_therapist', DateParameterSerializer)
+    async def get_number_appointments_per_therapist(request):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        service = await aget_report_service(request)
+        data = await service.aget_appointments_count_by_therapist(serializer.validated_data)
+        return ReportAPIView.appointments_per_therapist_response(data)
+
+    @staticmethod
+    @tenant_required
+    @acache_report_response('patients_by_therapist', DateParameterSerializer)
+    async def get_patients_by_therapist(request):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        service = await aget_report_service(request)
+        data = await service.aget_patients_by_therapist(serializer.validated_data)
+        return ReportAPIView.patients_by_therapist_response(data)
+
+    @staticmethod
+    @tenant_required
+    @acache_report_response('daily_cash', DateParameterSerializer)
+    async def get_daily_cash(request):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        service = await aget_report_service(request)
+        data = await service.aget_daily_cash(serializer.validated_data)
+        return ReportAPIView.daily_cash_response(data)
+
+    @staticmethod
+    @tenant_required
+    @acache_report_response('daily_dashboard', DateParameterSerializer)
+    async def get_daily_dashboard(request):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        service = await aget_report_service(request)
+        data = await service.aget_daily_dashboard(serializer.validated_data)
+        return ReportAPIView.daily_dashboard_response(data)
+
+    @staticmethod
+    @tenant_required
+    @acache_report_response('appointments_between_dates', AppointmentPageParameterSerializer)
+    async def get_appointments_between_dates(request):
+        serializer = AppointmentPageParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        params = serializer.validated_data
+        service = await aget_report_service(request)
+        try:
+            data = await service.aget_appointments_page(
+                params,
+                cursor=params.get('cursor'),
+                page_size=params.get('page_size', settings.REPORTS_PAGE_SIZE)
+            )
+        except InvalidCursor as e:
+            return JsonResponse({'cursor': [str(e)]}, status=400)
+        return ReportAPIView.appointments_page_response(data)
+
+    @staticmethod
+    @tenant_required
+    async def get_statistics(request):
+        serializer = StatisticsParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        params = serializer.validated_data
+
+        async def compute():
+            service = await aget_report_service(request)
+            return await service.aget_statistics(params)
+
+        data = await acached_report(
+            await aget_request_tenant(request),
+            "statistics",
+            (params["start"], params["end"]),
+            compute
+        )
+        return JsonResponse(data)
+
+
+class AsyncExportView:
+    """Exportaciones (PDF, xlsx, CSV y NDJSON) con el ORM async y el pool de trabajo bloqueante."""
+
+    # Filas de citas enviadas al pool en cada escritura del xlsx
+    XLSX_CHUNK_SIZE = 2000
+
+    @staticmethod
+    @tenant_required
+    async def render_pdf(request, report_type):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        params = serializer.validated_data
+        service = await aget_report_service(request, export=True)
+        key = await sync_to_async(pdf_cache_key)(report_type, service.tenant, params)
+        pdf = await run_blocking(open_cached_pdf, key)
+        if pdf is None:
+            # El PDF se cachea: si la réplica está atrasada se lee de la base principal
+            if not await sync_to_async(replica_is_current)(service.using, service.tenant.pk):
+                service = service.on_primary()
+            # Los datos se leen con el ORM async; el render corre en el pool
+            data = await aget_report_data(report_type, service, params)
+            pdf = await run_blocking(render_and_cache_pdf, report_type, key, data, params)
+        return async_file_response(pdf, PDF_REPORTS[report_type][1], 'application/pdf')
+
+    @staticmethod
+    @tenant_required
+    async def exportar_excel_citas(request):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        service = await aget_report_service(request, export=True)
+        rows = service.aiter_appointments_between_dates(serializer.validated_data)
+
+        # Se leen bloques con aiterator y cada bloque se escribe en el pool
+        workbook = await run_blocking(AppointmentWorkbook)
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= AsyncExportView.XLSX_CHUNK_SIZE:
+                await run_blocking(workbook.write_rows, chunk)
+                chunk = []
+        if chunk:
+            await run_blocking(workbook.write_rows, chunk)
+        output = await run_blocking(workbook.close)
+
+        return async_file_response(
+            output,
+            'citas.xlsx',
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    @staticmethod
+    @tenant_required
+    async def exportar_csv_citas(request):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        service = await aget_report_service(request, export=True)
+        rows = service.aiter_appointments_between_dates(serializer.validated_data)
+        return streaming_response(
+            request,
+            aiter_csv(rows, StreamExportView.APPOINTMENT_FIELDS),
+            content_type='text/csv; charset=utf-8',
+            filename='citas.csv'
+        )
+
+    @staticmethod
+    @tenant_required
+    async def exportar_ndjson_citas(request):
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        service = await aget_report_service(request, export=True)
+        rows = service.aiter_appointments_between_dates(serializer.validated_data)
+        return streaming_response(
+            request,
+            aiter_ndjson(rows),
+            content_type='application/x-ndjson',
+            filename='citas.ndjson'
+        )
+
+
+async_report_api = AsyncReportAPIView()
+async_export = AsyncExportView()
+
+
+def internal_error(view_name, error):
+    """Respuesta 500 con el mismo formato que los wrappers de views.py."""
+    print(f"Error en {view_name}: {str(error)}")
+    print(f"Traceback: {traceback.format_exc()}")
+    return JsonResponse({
+        'error': f'Error interno del servidor: {str(error)}',
+        'traceback': traceback.format_exc()
+    }, status=500)
+
+
+# Funciones wrapper (misma interfaz que las de views.py)
+async def get_number_appointments_per_therapist(request):
+    try:
+        return await async_report_api.get_number_appointments_per_therapist(request)
+    except Exception as e:
+        return internal_error('get_number_appointments_per_therapist', e)
+
+async def get_patients_by_therapist(request):
+    try:
+        return await async_report_api.get_patients_by_therapist(request)
+    except Exception as e:
+        return internal_error('get_patients_by_therapist', e)
+
+async def get_daily_cash(request):
+    try:
+        return await async_report_api.get_daily_cash(request)
+    except Exception as e:
+        return internal_error('get_daily_cash', e)
+
+async def get_daily_dashboard(request):
+    try:
+        return await async_report_api.get_daily_dashboard(request)
+    except Exception as e:
+        return internal_error('get_daily_dashboard', e)
+
+async def get_appointments_between_dates(request):
+    try:
+        return await async_report_api.get_appointments_between_dates(request)
+    except Exception as e:
+        return internal_error('get_appointments_between_dates', e)
+
+async def get_statistics(request):
+    try:
+        return await async_report_api.get_statistics(request)
+    except Exception as e:
+        return internal_error('get_statistics', e)
+
+async def pdf_citas_terapeuta(request):
+    return await async_export.render_pdf(request, 'citas_terapeuta')
+
+async def pdf_pacientes_terapeuta(request):
+    return await async_export.render_pdf(request, 'pacientes_terapeuta')
+
+async def pdf_resumen_caja(request):
+    return await async_export.render_pdf(request, 'resumen_caja')
+
+async def exportar_excel_citas(request):
+    return await async_export.exportar_excel_citas(request)
+
+async def exportar_csv_citas(request):
+    return await async_export.exportar_csv_citas(request)
+
+async def exportar_ndjson_citas(request):
+    return await async_export.exportar_ndjson_citas(request)
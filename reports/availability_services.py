@@ -0,0 +1,99 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import router
+
+from .models import Appointment, Therapist
+
+
+def to_minutes(value):
+    """Minutos desde la medianoche de un `time`."""
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    """Formatea minutos desde la medianoche como 'HH:MM'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def free_slots(busy, start, end, slot_minutes):
+    """
+    Turnos libres de un día entre `start` y `end` (minutos), de `slot_minutes`
+    cada uno. `busy` son los inicios ordenados de las citas del día; cada cita
+    ocupa `slot_minutes` desde su hora, así una cita a las 10:30 bloquea los
+    turnos de 10:00 y 11:00 si los turnos son de una hora.
+    """
+    slots = []
+    for slot in range(start, end - slot_minutes + 1, slot_minutes):
+        # Primera cita que termina después del inicio del turno
+        index = bisect_right(busy, slot - slot_minutes)
+        if index == len(busy) or busy[index] >= slot + slot_minutes:
+            slots.append(slot)
+    return slots
+
+
+class AvailabilityService:
+    """Turnos libres de los terapeutas del tenant en un rango de fechas."""
+
+    def __init__(self, tenant, using=None):
+        self.tenant = tenant
+        # Base principal del tenant: una réplica atrasada mostraría libres turnos recién reservados
+        self.using = using or router.db_for_read(Appointment, instance=tenant) or 'default'
+
+    def get_free_slots(self, start_date, end_date, start_time, end_time, slot_minutes,
+                       working_days, therapist_id=None):
+        """
+        Devuelve, por terapeuta y por día laborable del rango, las horas de
+        inicio de los turnos libres. Usa una consulta para los terapeutas y
+        otra para todas las citas del rango; el resto se resuelve en memoria.
+        """
+        therapists = Therapist.objects.using(self.using).filter(tenant=self.tenant)
+        if therapist_id is not None:
+            therapists = therapists.filter(id=therapist_id)
+        therapists = list(
+            therapists
+            .order_by('last_name_paternal', 'first_name', 'id')
+            .values('id', 'first_name', 'last_name_paternal', 'last_name_maternal')
+        )
+
+        appointments = Appointment.objects.using(self.using).filter(
+            tenant=self.tenant,
+            appointment_date__range=(start_date, end_date)
+        )
+        if therapist_id is not None:
+            appointments = appointments.filter(therapist_id=therapist_id)
+
+        # Inicios ocupados por (terapeuta, fecha), ya ordenados por la consulta
+        busy = defaultdict(list)
+        for therapist, day, hour in (
+            appointments
+            .order_by('therapist_id', 'appointment_date', 'appointment_hour')
+            .values_list('therapist_id', 'appointment_date', 'appointment_hour')
+        ):
+            busy[(therapist, day)].append(to_minutes(hour))
+
+        days = []
+        day = start_date
+        while day <= end_date:
+            if day.weekday() in working_days:
+                days.append(day)
+            day += timedelta(days=1)
+
+        start = to_minutes(start_time)
+        end = to_minutes(end_time)
+        # Los días sin citas comparten la misma lista de turnos
+        all_slots = [format_minutes(slot) for slot in free_slots([], start, end, slot_minutes)]
+
+        for therapist in therapists:
+            therapist['days'] = [
+                {
+                    'date': day.strftime('%Y-%m-%d'),
+                    'free': (
+                        [format_minutes(slot) for slot in free_slots(busy[(therapist['id'], day)], start, end, slot_minutes)]
+                        if (therapist['id'], day) in busy else all_slots
+                    ),
+                }
+                for day in days
+            ]
+        return therapists
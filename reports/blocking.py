@@ -0,0 +1,49 @@
+"""
+Pool acotado de hilos para el trabajo bloqueante de las vistas async
+(render de PDFs y escritura de xlsx). Así ese trabajo no bloquea el event
+loop y, como máximo, REPORTS_BLOCKING_WORKERS tareas corren a la vez; el
+resto espera en la cola del pool sin ocupar hilos del servidor.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool del proceso, creado al primer uso."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'REPORTS_BLOCKING_WORKERS', 4),
+                    thread_name_prefix='reports-blocking',
+                )
+    return _executor
+
+
+def _call(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Los hilos del pool no reciben request_finished: cerrar conexiones vencidas
+        close_old_connections()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Ejecuta func en el pool acotado y espera su resultado. Se copia el
+    contexto para conservar el tenant activo y las métricas de la petición.
+    """
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _call, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
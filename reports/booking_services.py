@@ -0,0 +1,345 @@
+import copy
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import DateField, ExpressionWrapper, F, Max, Min
+from django.utils import timezone
+
+from multitenant.routers import tenant_database
+
+from .models import Appointment, Patient, PaymentType, Therapist
+from .report_cache import bump_data_version, bump_date_versions
+from .rollups import add_appointments
+
+
+def slot_key(therapist_id, appointment_date, appointment_hour):
+    """Turno de un terapeuta: la clave de la restricción unique_therapist_appointment_slot."""
+    return therapist_id, appointment_date, appointment_hour
+
+
+def taken_slots(tenant, slots, using=None):
+    """
+    Devuelve cuáles de los turnos `slots` (terapeuta, fecha, hora) ya tienen
+    cita, con una sola consulta sobre el índice de la restricción única.
+    """
+    slots = set(slots)
+    if not slots:
+        return set()
+    existing = (
+        Appointment.objects.using(using or tenant_database(tenant) or 'default')
+        .filter(
+            tenant=tenant,
+            therapist_id__in={therapist for therapist, _, _ in slots},
+            appointment_date__in={day for _, day, _ in slots},
+        )
+        .values_list('therapist_id', 'appointment_date', 'appointment_hour')
+    )
+    return slots.intersection(existing)
+
+
+class SeriesError(ValueError):
+    """Datos inválidos para crear o modificar una serie de tratamiento."""
+
+
+class SeriesNotFound(SeriesError):
+    """La serie no tiene sesiones en el tenant."""
+
+
+def recurring_dates(start_date, weekdays, sessions, final_date=None):
+    """
+    Fechas de `sessions` sesiones desde `start_date` en los días de la semana
+    `weekdays` (0 = lunes), sin pasar de `final_date` si se indica.
+    """
+    weekdays = set(weekdays)
+    if not weekdays:
+        raise SeriesError("Indique al menos un día de la semana")
+    dates = []
+    day = start_date
+    while len(dates) < sessions:
+        if final_date is not None and day > final_date:
+            raise SeriesError(f"Las {sessions} sesiones no caben antes de {final_date:%Y-%m-%d}")
+        if day.weekday() in weekdays:
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def describe_slot(slot):
+    _, day, hour = slot
+    return f"El terapeuta ya tiene una cita el {day:%Y-%m-%d} a las {hour:%H:%M}"
+
+
+class BookingService:
+    """Reserva de citas en bloque para el tenant, sin turnos duplicados por terapeuta."""
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+        # Las reservas se escriben (y se verifican) en la base principal del tenant
+        self.using = tenant_database(tenant) or 'default'
+
+    def _tenant_ids(self, model, ids):
+        ids = {pk for pk in ids if pk is not None}
+        if not ids:
+            return set()
+        return set(
+            model.objects.using(self.using)
+            .filter(tenant=self.tenant, id__in=ids)
+            .values_list('id', flat=True)
+        )
+
+    def book(self, items, partial=False):
+        """
+        Crea las citas `items` (datos validados) en una transacción con un
+        solo bulk_create. Los ítems None (rechazados al validar) se informan
+        como inválidos. Devuelve (creadas, resultados por ítem). Si algún
+        ítem falla y `partial` es False no se crea ninguna cita.
+        """
+        valid = [item for item in items if item is not None]
+        patients = self._tenant_ids(Patient, [item['patient'] for item in valid])
+        therapists = self._tenant_ids(Therapist, [item['therapist'] for item in valid])
+        payment_types = self._tenant_ids(PaymentType, [item.get('payment_type') for item in valid])
+
+        results = [{'index': index, 'status': 'created'} for index in range(len(items))]
+        pending = {}
+        for index, item in enumerate(items):
+            if item is None:
+                results[index] = {'index': index, 'status': 'invalid'}
+            elif item['patient'] not in patients:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'patient': ["No existe el paciente en el tenant."]}}
+            elif item['therapist'] not in therapists:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'therapist': ["No existe el terapeuta en el tenant."]}}
+            elif item.get('payment_type') is not None and item['payment_type'] not in payment_types:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'payment_type': ["No existe el tipo de pago en el tenant."]}}
+            else:
+                slot = slot_key(item['therapist'], item['appointment_date'], item['appointment_hour'])
+                if slot in pending:
+                    results[index] = {
+                        'index': index,
+                        'status': 'conflict',
+                        'error': f"Turno repetido en la solicitud (ítem {pending[slot]})",
+                    }
+                else:
+                    pending[slot] = index
+
+        for slot in taken_slots(self.tenant, pending, using=self.using):
+            index = pending.pop(slot)
+            results[index] = {'index': index, 'status': 'conflict', 'error': describe_slot(slot)}
+
+        if not pending or (len(pending) < len(items) and not partial):
+            for index in pending.values():
+                results[index]['status'] = 'skipped'
+            return [], results
+
+        while True:
+            appointments = [self.build(items[index]) for index in pending.values()]
+            try:
+                with transaction.atomic(using=self.using):
+                    Appointment.objects.using(self.using).bulk_create(appointments)
+                    # bulk_create no dispara señales: actualizar el resumen en la misma transacción
+                    add_appointments(appointments)
+                break
+            except IntegrityError:
+                # Otra petición tomó alguno de los turnos entre la verificación y la inserción
+                taken = taken_slots(self.tenant, pending, using=self.using)
+                for slot in taken:
+                    index = pending.pop(slot)
+                    results[index] = {'index': index, 'status': 'conflict', 'error': describe_slot(slot)}
+                # Con `partial` se reintenta sin esos turnos; si ninguno está tomado el error es otro
+                if not taken or not pending or not partial:
+                    for index in pending.values():
+                        results[index]['status'] = 'skipped'
+                    return [], results
+
+        # Invalidar las cachés ya confirmada la transacción
+        bump_data_version(self.tenant.pk)
+        bump_date_versions(self.tenant.pk, {appointment.appointment_date for appointment in appointments})
+        self.load_ids(appointments)
+        for appointment, index in zip(appointments, pending.values()):
+            results[index]['id'] = appointment.pk
+        return appointments, results
+
+    def build(self, item):
+        return Appointment(
+            tenant=self.tenant,
+            patient_id=item['patient'],
+            therapist_id=item['therapist'],
+            appointment_date=item['appointment_date'],
+            appointment_hour=item['appointment_hour'],
+            initial_date=item.get('initial_date'),
+            final_date=item.get('final_date'),
+            appointment_type=item.get('appointment_type'),
+            payment=item.get('payment'),
+            payment_type_id=item.get('payment_type'),
+        )
+
+    def load_ids(self, appointments):
+        """bulk_create no devuelve ids en todas las bases (MySQL): leerlos por turno."""
+        missing = {
+            slot_key(appointment.therapist_id, appointment.appointment_date, appointment.appointment_hour): appointment
+            for appointment in appointments if appointment.pk is None
+        }
+        if not missing:
+            return
+        rows = (
+            Appointment.objects.using(self.using)
+            .filter(
+                tenant=self.tenant,
+                therapist_id__in={therapist for therapist, _, _ in missing},
+                appointment_date__in={day for _, day, _ in missing},
+            )
+            .values_list('id', 'therapist_id', 'appointment_date', 'appointment_hour')
+        )
+        for pk, *slot in rows:
+            appointment = missing.get(tuple(slot))
+            if appointment is not None:
+                appointment.pk = pk
+
+
+class TreatmentSeriesService(BookingService):
+    """Series de sesiones de un tratamiento: creación y cambios en bloque."""
+
+    def _check_ids(self, patient=None, therapist=None, payment_type=None):
+        for model, pk, field, label in (
+            (Patient, patient, 'patient', 'el paciente'),
+            (Therapist, therapist, 'therapist', 'el terapeuta'),
+            (PaymentType, payment_type, 'payment_type', 'el tipo de pago'),
+        ):
+            if pk is not None and not self._tenant_ids(model, [pk]):
+                raise SeriesError(f"No existe {label} en el tenant ({field}={pk})")
+
+    def create(self, data, skip_conflicts=False):
+        """
+        Genera todas las sesiones del tratamiento con una verificación de
+        turnos y un bulk_create. Devuelve (serie, citas creadas, conflictos);
+        con conflictos y sin `skip_conflicts` no se crea nada.
+        """
+        self._check_ids(data['patient'], data['therapist'], data.get('payment_type'))
+        dates = recurring_dates(data['initial_date'], data['weekdays'], data['sessions'], data.get('final_date'))
+        hour = data['appointment_hour']
+
+        slots = {slot_key(data['therapist'], day, hour): day for day in dates}
+        taken = taken_slots(self.tenant, slots, using=self.using)
+        conflicts = [describe_slot(slot) for slot in sorted(taken)]
+        if conflicts and not skip_conflicts:
+            return None, [], conflicts
+        dates = [day for slot, day in slots.items() if slot not in taken]
+        if not dates:
+            return None, [], conflicts
+
+        series = uuid.uuid4()
+        appointments = [
+            Appointment(
+                tenant=self.tenant,
+                patient_id=data['patient'],
+                therapist_id=data['therapist'],
+                appointment_date=day,
+                appointment_hour=hour,
+                initial_date=dates[0],
+                final_date=dates[-1],
+                appointment_type=data.get('appointment_type'),
+                payment=data.get('payment'),
+                payment_type_id=data.get('payment_type'),
+                series=series,
+            )
+            for day in dates
+        ]
+        try:
+            with transaction.atomic(using=self.using):
+                Appointment.objects.using(self.using).bulk_create(appointments)
+                # bulk_create no dispara señales: actualizar el resumen en la misma transacción
+                add_appointments(appointments)
+        except IntegrityError:
+            # Otra petición tomó alguno de los turnos entre la verificación y la inserción
+            taken = taken_slots(self.tenant, slots, using=self.using)
+            return None, [], [describe_slot(slot) for slot in sorted(taken)]
+
+        bump_data_version(self.tenant.pk)
+        bump_date_versions(self.tenant.pk, dates)
+        self.load_ids(appointments)
+        return series, appointments, conflicts
+
+    def update(self, series, from_date, days=0, appointment_hour=None, therapist=None):
+        """
+        Mueve las sesiones de la serie desde `from_date`: `days` días, a otra
+        hora y/o a otro terapeuta, con un solo UPDATE. Devuelve (sesiones
+        modificadas, conflictos); con conflictos no se modifica nada. Lanza
+        SeriesNotFound si la serie no tiene sesiones en el tenant.
+        """
+        self._check_ids(therapist=therapist)
+        sessions = Appointment.objects.using(self.using).filter(
+            tenant=self.tenant, series=series, appointment_date__gte=from_date
+        )
+        old_rows = list(sessions.only(
+            'id', 'tenant_id', 'therapist_id', 'appointment_date', 'appointment_hour', 'payment', 'payment_type_id'
+        ))
+        if not old_rows:
+            if not Appointment.objects.using(self.using).filter(tenant=self.tenant, series=series).exists():
+                raise SeriesNotFound(f"No existe la serie {series} en el tenant")
+            return 0, []
+
+        new_rows = []
+        for row in old_rows:
+            new_row = copy.copy(row)
+            new_row.appointment_date = row.appointment_date + timedelta(days=days)
+            if appointment_hour is not None:
+                new_row.appointment_hour = appointment_hour
+            if therapist is not None:
+                new_row.therapist_id = therapist
+            new_rows.append(new_row)
+
+        def slots(rows):
+            return {slot_key(row.therapist_id, row.appointment_date, row.appointment_hour) for row in rows}
+
+        # Los turnos que la propia serie libera no cuentan como conflicto
+        own = slots(old_rows)
+        taken = taken_slots(self.tenant, slots(new_rows) - own, using=self.using)
+        if taken:
+            return 0, [describe_slot(slot) for slot in sorted(taken)]
+
+        changes = {'updated_at': timezone.now()}
+        if days:
+            changes['appointment_date'] = ExpressionWrapper(
+                F('appointment_date') + timedelta(days=days), output_field=DateField()
+            )
+        if appointment_hour is not None:
+            changes['appointment_hour'] = appointment_hour
+        if therapist is not None:
+            changes['therapist_id'] = therapist
+        # Al correr las fechas, primero las sesiones que van hacia turnos que nadie ocupa
+        order = '-appointment_date' if days > 0 else 'appointment_date'
+
+        try:
+            with transaction.atomic(using=self.using):
+                moved = sessions.filter(id__in=[row.pk for row in old_rows])
+                try:
+                    with transaction.atomic(using=self.using):
+                        # MySQL respeta el orden en el UPDATE; así una sesión no choca con la siguiente
+                        updated = moved.order_by(order).update(**changes)
+                except IntegrityError:
+                    if not slots(new_rows) & own:
+                        raise
+                    # Otras bases verifican la restricción fila por fila sin ese orden
+                    updated = 0
+                    for row in sorted(old_rows, key=lambda row: row.appointment_date, reverse=days > 0):
+                        updated += moved.filter(id=row.pk).update(**changes)
+
+                # El periodo del tratamiento abarca todas las sesiones de la serie
+                period = Appointment.objects.using(self.using).filter(
+                    tenant=self.tenant, series=series
+                ).aggregate(initial_date=Min('appointment_date'), final_date=Max('appointment_date'))
+                Appointment.objects.using(self.using).filter(tenant=self.tenant, series=series).update(**period)
+
+                add_appointments(old_rows, sign=-1)
+                add_appointments(new_rows)
+        except IntegrityError:
+            # Otra petición tomó alguno de los turnos nuevos mientras tanto
+            taken = taken_slots(self.tenant, slots(new_rows) - own, using=self.using)
+            return 0, [describe_slot(slot) for slot in sorted(taken)]
+
+        bump_data_version(self.tenant.pk)
+        bump_date_versions(
+            self.tenant.pk,
+            {row.appointment_date for row in old_rows} | {row.appointment_date for row in new_rows},
+        )
+        return updated, []
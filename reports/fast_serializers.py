@@ -0,0 +1,141 @@
+"""
+Ruta rápida de serialización para los endpoints de reportes.
+
+Los serializers DRF de `reports_serializers` vuelven a formatear cada campo
+de cada fila. Aquí se definen formateadores equivalentes (misma salida) que
+trabajan directamente sobre los diccionarios del ReportService, y una
+respuesta JSON que usa orjson cuando está instalado.
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from .metrics import phase
+from .reports_serializers import (
+    TherapistAppointmentSerializer,
+    PatientByTherapistSerializer,
+    DailyCashSerializer,
+    AppointmentRangeSerializer,
+)
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+
+def _str_or_none(value):
+    return None if value is None else str(value)
+
+
+def _int_or_none(value):
+    return None if value is None else int(value)
+
+
+def format_therapist_appointments(rows, context):
+    total = context.get('total_appointments', 1)
+    return [
+        {
+            'id': _int_or_none(row['id']),
+            'first_name': _str_or_none(row['first_name']),
+            'last_name_paternal': _str_or_none(row['last_name_paternal']),
+            'last_name_maternal': _str_or_none(row['last_name_maternal']),
+            'appointments_count': int(row['appointments_count']),
+            'percentage': (
+                float(row['percentage']) if 'percentage' in row
+                else (row['appointments_count'] / total) * 100 if total > 0 else 0
+            ),
+        }
+        for row in rows
+    ]
+
+
+def format_patients_by_therapist(rows, context):
+    return [
+        {
+            'therapist_id': _str_or_none(row['therapist_id']),
+            'therapist': _str_or_none(row['therapist']),
+            'patients': [dict(patient) for patient in row['patients']],
+        }
+        for row in rows
+    ]
+
+
+def format_daily_cash(rows, context):
+    return [
+        {
+            'id_cita': _int_or_none(row['id_cita']),
+            'payment': _str_or_none(row['payment']),
+            'payment_type': _int_or_none(row['payment_type']),
+            'payment_type_name': _str_or_none(row['payment_type_name']),
+        }
+        for row in rows
+    ]
+
+
+def format_appointment_range(rows, context):
+    # ReportService ya entrega fecha y hora como texto con el formato final
+    return [
+        {
+            'appointment_id': _int_or_none(row['appointment_id']),
+            'patient_id': _int_or_none(row['patient_id']),
+            'document_number_patient': _str_or_none(row['document_number_patient']),
+            'patient': _str_or_none(row['patient']),
+            'primary_phone_patient': _str_or_none(row['primary_phone_patient']),
+            'appointment_date': row['appointment_date'],
+            'appointment_hour': row['appointment_hour'],
+        }
+        for row in rows
+    ]
+
+
+FAST_FORMATTERS = {
+    TherapistAppointmentSerializer: format_therapist_appointments,
+    PatientByTherapistSerializer: format_patients_by_therapist,
+    DailyCashSerializer: format_daily_cash,
+    AppointmentRangeSerializer: format_appointment_range,
+}
+
+
+def fast_serialization_enabled():
+    return getattr(settings, 'REPORTS_FAST_SERIALIZATION', False)
+
+
+def serialize_many(serializer_class, rows, context=None, fast=None):
+    """
+    Serializa una lista de filas con el serializer indicado.
+    Si la ruta rápida está activa y existe un formateador equivalente, se usa
+    en lugar de instanciar el serializer DRF.
+    """
+    context = context or {}
+    if fast is None:
+        fast = fast_serialization_enabled()
+    formatter = FAST_FORMATTERS.get(serializer_class) if fast else None
+    with phase('serialize'):
+        if formatter is not None:
+            return formatter(rows, context)
+        return serializer_class(rows, many=True, context=context).data
+
+
+def _orjson_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError
+
+
+def dumps(data, fast=None):
+    """Codifica a JSON (bytes) con orjson si está disponible y activo."""
+    if fast is None:
+        fast = fast_serialization_enabled()
+    with phase('serialize'):
+        if fast and orjson is not None:
+            return orjson.dumps(data, default=_orjson_default)
+        return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def json_response(data, status=200):
+    """Equivalente a JsonResponse(data, safe=False) usando `dumps`."""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
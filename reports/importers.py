@@ -0,0 +1,283 @@
+"""
+Importación masiva de pacientes, terapeutas y citas de un tenant desde CSV o JSONL.
+
+Las filas se leen de forma incremental y se insertan por lotes con
+`bulk_create`. Las claves foráneas se resuelven por clave natural
+(nombre del tipo de documento/pago, `document_number` del paciente o
+terapeuta) con cachés en memoria cargadas una sola vez por importación.
+Las filas inválidas no detienen la importación: se reportan con su número.
+"""
+import csv
+import io
+import json
+from datetime import date, time
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from multitenant.context import use_tenant
+from multitenant.routers import tenant_database
+
+from .booking_services import describe_slot, slot_key, taken_slots
+from .models import Appointment, DocumentType, Patient, PaymentType, Therapist
+from .report_cache import bump_data_version, bump_tenant_date_versions
+from .rollups import rebuild_rollups
+
+
+IMPORT_KINDS = ['patients', 'therapists', 'appointments']
+
+
+class RowError(ValueError):
+    """Error de validación de una fila."""
+
+
+def read_rows(file, file_format):
+    """Itera las filas (diccionarios) de un archivo de texto CSV o JSONL."""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+    elif file_format == 'jsonl':
+        for line in file:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {'__invalid__': line}
+    else:
+        raise ValueError(f"Formato no soportado: {file_format}")
+
+
+def open_text(binary_file):
+    """Envuelve un archivo binario (por ejemplo, uno subido) como texto UTF-8."""
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def _required(row, field):
+    value = row.get(field)
+    if value is None or str(value).strip() == '':
+        raise RowError(f"El campo '{field}' es obligatorio")
+    return str(value).strip()
+
+
+def _optional(row, field):
+    value = row.get(field)
+    if value is None or str(value).strip() == '':
+        return None
+    return str(value).strip()
+
+
+def _parse(parser, value, field):
+    if value is None:
+        return None
+    try:
+        return parser(value)
+    except (ValueError, InvalidOperation):
+        raise RowError(f"Valor inválido en '{field}': {value}")
+
+
+class TenantImporter:
+    """Importa registros de un tenant por lotes y acumula los errores por fila."""
+
+    def __init__(self, tenant, batch_size=2000):
+        self.tenant = tenant
+        self.database = tenant_database(tenant)
+        self.batch_size = batch_size
+        self.created = 0
+        self.errors = []
+        self._document_types = None
+        self._payment_types = None
+        self._patients = None
+        self._therapists = None
+
+    # ---------- cachés de claves naturales ----------
+    def _load(self, model, key_field):
+        return {
+            str(key).strip().lower() if key_field == 'name' else key: pk
+            for key, pk in model.objects.filter(tenant=self.tenant).values_list(key_field, 'id')
+        }
+
+    @property
+    def document_types(self):
+        if self._document_types is None:
+            self._document_types = self._load(DocumentType, 'name')
+        return self._document_types
+
+    @property
+    def payment_types(self):
+        if self._payment_types is None:
+            self._payment_types = self._load(PaymentType, 'name')
+        return self._payment_types
+
+    @property
+    def patients(self):
+        if self._patients is None:
+            self._patients = self._load(Patient, 'document_number')
+        return self._patients
+
+    @property
+    def therapists(self):
+        if self._therapists is None:
+            self._therapists = self._load(Therapist, 'document_number')
+        return self._therapists
+
+    def _named_id(self, cache, model, name):
+        """Resuelve un tipo por nombre; si no existe lo crea una sola vez."""
+        key = name.lower()
+        if key not in cache:
+            cache[key] = model.objects.create(tenant=self.tenant, name=name).pk
+        return cache[key]
+
+    # ---------- construcción de objetos por tipo ----------
+    def build_patient(self, row):
+        document_number = _required(row, 'document_number')
+        if document_number in self.patients:
+            raise RowError(f"El paciente {document_number} ya existe")
+        sex = _required(row, 'sex').upper()[:1]
+        if sex not in ('M', 'F', 'O'):
+            raise RowError(f"Valor inválido en 'sex': {row.get('sex')}")
+        patient = Patient(
+            tenant=self.tenant,
+            document_number=document_number,
+            document_type_id=self._named_id(self.document_types, DocumentType, _required(row, 'document_type')),
+            name=_required(row, 'name'),
+            paternal_lastname=_required(row, 'paternal_lastname'),
+            maternal_lastname=_optional(row, 'maternal_lastname') or '',
+            sex=sex,
+            primary_phone=_required(row, 'primary_phone'),
+        )
+        # bulk_create no llama a save(): completar las columnas de búsqueda
+        patient.update_search_fields()
+        return document_number, patient
+
+    def build_therapist(self, row):
+        document_number = _required(row, 'document_number')
+        if document_number in self.therapists:
+            raise RowError(f"El terapeuta {document_number} ya existe")
+        gender = _required(row, 'gender').upper()[:1]
+        if gender not in ('M', 'F', 'O'):
+            raise RowError(f"Valor inválido en 'gender': {row.get('gender')}")
+        return document_number, Therapist(
+            tenant=self.tenant,
+            document_number=document_number,
+            document_type_id=self._named_id(self.document_types, DocumentType, _required(row, 'document_type')),
+            first_name=_required(row, 'first_name'),
+            last_name_paternal=_required(row, 'last_name_paternal'),
+            last_name_maternal=_optional(row, 'last_name_maternal'),
+            gender=gender,
+            phone=_required(row, 'phone'),
+            email=_optional(row, 'email'),
+        )
+
+    def build_appointment(self, row):
+        patient_document = _required(row, 'patient_document')
+        therapist_document = _required(row, 'therapist_document')
+        if patient_document not in self.patients:
+            raise RowError(f"No existe el paciente {patient_document}")
+        if therapist_document not in self.therapists:
+            raise RowError(f"No existe el terapeuta {therapist_document}")
+        payment_type = _optional(row, 'payment_type')
+        return None, Appointment(
+            tenant=self.tenant,
+            patient_id=self.patients[patient_document],
+            therapist_id=self.therapists[therapist_document],
+            appointment_date=_parse(date.fromisoformat, _required(row, 'appointment_date'), 'appointment_date'),
+            appointment_hour=_parse(time.fromisoformat, _required(row, 'appointment_hour'), 'appointment_hour'),
+            initial_date=_parse(date.fromisoformat, _optional(row, 'initial_date'), 'initial_date'),
+            final_date=_parse(date.fromisoformat, _optional(row, 'final_date'), 'final_date'),
+            appointment_type=_optional(row, 'appointment_type'),
+            payment=_parse(Decimal, _optional(row, 'payment'), 'payment'),
+            payment_type_id=self._named_id(self.payment_types, PaymentType, payment_type) if payment_type else None,
+        )
+
+    # ---------- importación ----------
+    def run(self, kind, rows):
+        """Importa las filas del tipo indicado y devuelve el resumen."""
+        with use_tenant(self.tenant):
+            return self._run(kind, rows)
+
+    def _run(self, kind, rows):
+        model, build, cache = {
+            'patients': (Patient, self.build_patient, lambda: self.patients),
+            'therapists': (Therapist, self.build_therapist, lambda: self.therapists),
+            'appointments': (Appointment, self.build_appointment, lambda: None),
+        }[kind]
+
+        batch = []
+        for number, row in enumerate(rows, start=1):
+            try:
+                if not isinstance(row, dict) or '__invalid__' in row:
+                    raise RowError("Fila con formato inválido")
+                key, obj = build(row)
+            except RowError as e:
+                self.errors.append({'row': number, 'error': str(e)})
+                continue
+            if key is not None:
+                # Reservar la clave para detectar duplicados dentro del mismo archivo
+                cache()[key] = None
+            batch.append((number, key, obj))
+            if len(batch) >= self.batch_size:
+                self._flush(model, batch, cache())
+                batch = []
+        if batch:
+            self._flush(model, batch, cache())
+
+        if kind == 'appointments':
+            # bulk_create no dispara señales: recalcular el resumen e invalidar cachés
+            rebuild_rollups(tenant=self.tenant)
+            bump_data_version(self.tenant.pk)
+            bump_tenant_date_versions(self.tenant.pk)
+        return self.summary()
+
+    def _flush(self, model, batch, cache):
+        if model is Appointment:
+            batch = self._drop_taken_slots(batch)
+        objs = [obj for _, _, obj in batch]
+        try:
+            with transaction.atomic(using=self.database):
+                model.objects.bulk_create(objs)
+            self.created += len(objs)
+        except IntegrityError:
+            # Un document_number ya usado o un turno que otra petición tomó después de
+            # _drop_taken_slots: insertar uno por uno para reportar solo esas filas
+            for number, key, obj in batch:
+                try:
+                    with transaction.atomic(using=self.database):
+                        obj.save(force_insert=True)
+                    self.created += 1
+                except IntegrityError as e:
+                    self.errors.append({'row': number, 'error': f"Error de integridad: {e}"})
+                    if cache is not None:
+                        cache.pop(key, None)
+                    batch = [item for item in batch if item[0] != number]
+        if cache is not None:
+            # bulk_create no devuelve ids en todas las bases: leerlos por clave natural
+            keys = [key for _, key, _ in batch if key is not None]
+            cache.update(
+                model.objects.filter(tenant=self.tenant, document_number__in=keys)
+                .values_list('document_number', 'id')
+            )
+
+    def _drop_taken_slots(self, batch):
+        """
+        Descarta (y reporta) las citas cuyo turno del terapeuta ya está ocupado
+        en la base o repetido en el lote, con una consulta por lote en lugar de
+        dejar que la restricción única obligue a insertar fila por fila.
+        """
+        slots = {}
+        for number, _, obj in batch:
+            slots.setdefault(slot_key(obj.therapist_id, obj.appointment_date, obj.appointment_hour), number)
+        taken = taken_slots(self.tenant, slots, using=self.database)
+
+        kept = []
+        for number, key, obj in batch:
+            slot = slot_key(obj.therapist_id, obj.appointment_date, obj.appointment_hour)
+            if slot in taken:
+                self.errors.append({'row': number, 'error': describe_slot(slot)})
+            elif slots[slot] != number:
+                self.errors.append({'row': number, 'error': f"Turno repetido en el archivo (fila {slots[slot]})"})
+            else:
+                kept.append((number, key, obj))
+        return kept
+
+    def summary(self):
+        return {'created': self.created, 'errors': self.errors}
@@ -0,0 +1,201 @@
+import asyncio
+import io
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+
+from multitenant.models import Tenant, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el rendimiento de un endpoint de reportes servido en modo síncrono "
+        "(un pool fijo de hilos, como los workers WSGI) y en modo async (aplicación ASGI "
+        "con muchas peticiones concurrentes), agregando una latencia artificial a cada "
+        "consulta para simular una base de datos en red."
+    )
+    requires_system_checks = []
+
+    MODES = ('sync', 'asgi-sync', 'async')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/reports/daily-dashboard/?date=2025-06-02',
+                            help="Endpoint síncrono a medir; la versión async se busca bajo /async.")
+        parser.add_argument('--modes', default='sync,async',
+                            help="Modos separados por comas: sync, asgi-sync (vista síncrona bajo ASGI), async.")
+        parser.add_argument('--requests', type=int, default=400, help="Peticiones por modo.")
+        parser.add_argument('--threads', type=int, default=8, help="Hilos del modo sync (workers WSGI).")
+        parser.add_argument('--concurrency', type=int, default=200, help="Peticiones simultáneas bajo ASGI.")
+        parser.add_argument('--db-latency-ms', type=float, default=5.0,
+                            help="Latencia agregada a cada consulta SQL (0 para desactivarla).")
+        parser.add_argument('--appointments', type=int, default=10000, help="Citas del tenant medido.")
+        parser.add_argument('--no-seed', action='store_true', help="Reutilizar los datos existentes.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                "El benchmark borra y regenera la base de datos; ejecútelo con "
+                "--settings=core.settings_benchmark (SQLite)."
+            )
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(self.MODES)
+        if unknown:
+            raise CommandError(f"Modos desconocidos: {', '.join(sorted(unknown))}")
+
+        if not options['no_seed']:
+            self.seed(options['appointments'])
+        tenant = Tenant.objects.order_by('pk').first()
+        if tenant is None:
+            raise CommandError("No hay datos; ejecútelo sin --no-seed.")
+        session = self.login(User.objects.filter(tenant=tenant).order_by('pk').first())
+
+        path = options['path']
+        urls = {'sync': path, 'asgi-sync': path, 'async': '/async' + path}
+
+        # Sin caché de respuestas: cada petición ejecuta las consultas
+        dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(CACHES=dummy_cache), self.db_latency(options['db_latency_ms']):
+            for mode in modes:
+                if mode == 'sync':
+                    elapsed, latencies = self.run_sync(urls[mode], session, options)
+                else:
+                    elapsed, latencies = asyncio.run(self.run_asgi(urls[mode], session, options))
+                self.report(mode, urls[mode], elapsed, latencies)
+
+    def seed(self, appointments):
+        call_command('migrate', run_syncdb=True, verbosity=0)
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        call_command(
+            'seed_report_data',
+            tenants=1,
+            patients=max(50, appointments // 20),
+            therapists=max(5, appointments // 1000),
+            appointments=appointments,
+            end=date(2025, 6, 30),
+            stdout=io.StringIO(),
+        )
+
+    def login(self, user):
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    @contextmanager
+    def db_latency(self, latency_ms):
+        """Agrega `latency_ms` a cada consulta de las conexiones del proceso."""
+        self.delay_seconds = latency_ms / 1000
+        if latency_ms <= 0:
+            yield
+            return
+        connection_created.connect(self.install_delay)
+        for conn in connections.all(initialized_only=True):
+            self.install_delay(None, conn)
+        try:
+            yield
+        finally:
+            connection_created.disconnect(self.install_delay)
+
+    def install_delay(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self.delay_execute)
+
+    def delay_execute(self, execute, sql, params, many, context):
+        time.sleep(self.delay_seconds)
+        return execute(sql, params, many, context)
+
+    def run_sync(self, url, session, options):
+        """Un Client por hilo: cada hilo atiende una petición a la vez, como un worker WSGI."""
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client(HTTP_HOST='localhost')
+                local.client.cookies[settings.SESSION_COOKIE_NAME] = session
+            started = time.perf_counter()
+            response = local.client.get(url)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            self.check_status(response.status_code)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            latencies = list(pool.map(request, range(options['requests'])))
+        return time.perf_counter() - started, latencies
+
+    async def run_asgi(self, url, session, options):
+        """Peticiones directas a la aplicación ASGI, con a lo sumo --concurrency en curso."""
+        application = get_asgi_application()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': parts.path,
+            'raw_path': parts.path.encode(),
+            'query_string': parts.query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+
+        async def request():
+            async with semaphore:
+                status = None
+                received = False
+
+                async def receive():
+                    nonlocal received
+                    if not received:
+                        received = True
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    # Sin desconexión del cliente: Django cancela esta espera al terminar
+                    await asyncio.Future()
+
+                async def send(message):
+                    nonlocal status
+                    if message['type'] == 'http.response.start':
+                        status = message['status']
+
+                started = time.perf_counter()
+                await application(dict(scope), receive, send)
+                self.check_status(status)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(options['requests'])))
+        return time.perf_counter() - started, latencies
+
+    def check_status(self, status):
+        if status != 200:
+            raise CommandError(f"Respuesta inesperada {status}")
+
+    def report(self, mode, url, elapsed, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"  {mode:<10} {url:<52} {len(latencies) / elapsed:>8.1f} req/s  "
+            f"p50 {statistics.median(latencies) * 1000:>8.1f} ms  p95 {p95 * 1000:>8.1f} ms"
+        )
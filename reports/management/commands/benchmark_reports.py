@@ -0,0 +1,157 @@
+import io
+import json
+import shutil
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from multitenant.models import Tenant, User
+from reports.reports_services import ReportService
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cada método de ReportService y cada endpoint de exportación sobre SQLite "
+        "con distintos tamaños de datos. Guarda los resultados en JSON y falla si algún "
+        "tiempo supera al de la línea base en más del umbral indicado."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000',
+                            help="Citas por tenant en cada ronda, separadas por comas.")
+        parser.add_argument('--tenants', type=int, default=2, help="Tenants por ronda.")
+        parser.add_argument('--repeat', type=int, default=3, help="Repeticiones; se guarda el mejor tiempo.")
+        parser.add_argument('--output', default='benchmark_results.json', help="Archivo JSON de resultados.")
+        parser.add_argument('--baseline', help="JSON de resultados previos con el que comparar.")
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help="Falla si un tiempo supera baseline × threshold (por defecto 1.25).")
+        parser.add_argument('--min-ms', type=float, default=5.0,
+                            help="No se comparan mediciones de la línea base menores a este valor.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                "El benchmark borra y regenera la base de datos; ejecútelo con "
+                "--settings=core.settings_benchmark (SQLite)."
+            )
+
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        results = {}
+        for size in sizes:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Ronda con {size} citas por tenant"))
+            self.reset_database()
+            call_command(
+                'seed_report_data',
+                tenants=options['tenants'],
+                patients=max(50, size // 20),
+                therapists=max(5, size // 1000),
+                appointments=size,
+                end=date(2025, 6, 30),
+                stdout=self.stdout if options['verbosity'] > 1 else io.StringIO(),
+            )
+            results[str(size)] = self.run_round(options['repeat'])
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        self.stdout.write(f"Resultados guardados en {options['output']}")
+
+        if options['baseline']:
+            self.compare(results, options)
+
+    def reset_database(self):
+        call_command('migrate', run_syncdb=True, verbosity=0)
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+
+    def measure(self, func, repeat, before=None):
+        best = None
+        for _ in range(repeat):
+            if before:
+                before()
+            started = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best, 2)
+
+    def run_round(self, repeat):
+        tenant = Tenant.objects.order_by('pk').first()
+        service = ReportService(tenant)
+        day = date(2025, 6, 2)  # lunes con actividad
+        month = {'start_date': date(2025, 6, 1), 'end_date': date(2025, 6, 30)}
+        year = {'start': date(2024, 7, 1), 'end': date(2025, 6, 30)}
+
+        timings = {}
+        service_calls = {
+            'service.get_appointments_count_by_therapist': lambda: service.get_appointments_count_by_therapist({'date': day}),
+            'service.get_patients_by_therapist': lambda: service.get_patients_by_therapist({'date': day}),
+            'service.get_daily_cash': lambda: service.get_daily_cash({'date': day}),
+            'service.get_daily_cash_summary': lambda: service.get_daily_cash_summary({'date': day}),
+            'service.get_daily_dashboard': lambda: service.get_daily_dashboard({'date': day}),
+            'service.get_appointments_between_dates': lambda: service.get_appointments_between_dates(month),
+            'service.get_appointments_page': lambda: service.get_appointments_page(month, page_size=100),
+            'service.get_statistics': lambda: service.get_statistics(year),
+        }
+        for name, func in service_calls.items():
+            timings[name] = self.measure(func, repeat)
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(User.objects.get(tenant=tenant))
+        range_params = '?start_date=2025-01-01&end_date=2025-06-30'
+        day_params = f'?date={day.isoformat()}'
+        endpoints = {
+            'export.excel': '/exports/excel/citas-rango/' + range_params,
+            'export.csv': '/exports/csv/citas-rango/' + range_params,
+            'export.ndjson': '/exports/ndjson/citas-rango/' + range_params,
+            'export.pdf_citas_terapeuta': '/exports/pdf/citas-terapeuta/' + day_params,
+            'export.pdf_pacientes_terapeuta': '/exports/pdf/pacientes-terapeuta/' + day_params,
+            'export.pdf_resumen_caja': '/exports/pdf/resumen-caja/' + day_params,
+        }
+        for name, url in endpoints.items():
+            timings[name] = self.measure(
+                lambda: self.consume(client.get(url)),
+                repeat,
+                # Medir siempre el render completo, sin la caché de PDFs
+                before=self.clear_pdf_cache,
+            )
+
+        for name, elapsed in timings.items():
+            self.stdout.write(f"  {name:<48}{elapsed:>10.2f} ms")
+        return timings
+
+    def consume(self, response):
+        if response.status_code != 200:
+            raise CommandError(f"Respuesta inesperada {response.status_code}")
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        response.close()
+
+    def clear_pdf_cache(self):
+        shutil.rmtree(settings.REPORTS_PDF_CACHE_DIR, ignore_errors=True)
+
+    def compare(self, results, options):
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        for size, timings in results.items():
+            for name, elapsed in timings.items():
+                previous = baseline.get(size, {}).get(name)
+                if previous is None or previous < options['min_ms']:
+                    continue
+                if elapsed > previous * options['threshold']:
+                    regressions.append(f"{size} citas / {name}: {previous:.2f} ms -> {elapsed:.2f} ms")
+
+        if regressions:
+            raise CommandError(
+                "Regresiones por encima del umbral de %.2fx:\n  %s" % (options['threshold'], "\n  ".join(regressions))
+            )
+        self.stdout.write(self.style.SUCCESS("Sin regresiones respecto de la línea base."))
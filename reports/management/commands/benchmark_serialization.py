@@ -0,0 +1,106 @@
+import json
+import time
+from datetime import date, time as dtime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from reports.fast_serializers import dumps, orjson, serialize_many
+from reports.reports_serializers import (
+    TherapistAppointmentSerializer,
+    PatientByTherapistSerializer,
+    DailyCashSerializer,
+    AppointmentRangeSerializer,
+)
+
+
+def build_rows(rows):
+    """Genera filas sintéticas con la forma que entrega ReportService."""
+    start = date(2024, 1, 1)
+    therapists = [
+        {
+            'id': i,
+            'first_name': f'Nombre{i}',
+            'last_name_paternal': f'Paterno{i}',
+            'last_name_maternal': f'Materno{i}',
+            'appointments_count': i % 17 + 1,
+        }
+        for i in range(rows)
+    ]
+    patients = [
+        {
+            'therapist_id': i,
+            'therapist': f'Paterno{i} Materno{i} Nombre{i}',
+            'patients': [
+                {'patient_id': i * 10 + j, 'patient': f'Paciente {i}-{j}', 'appointments': j + 1}
+                for j in range(3)
+            ],
+        }
+        for i in range(rows // 3)
+    ]
+    cash = [
+        {
+            'id_cita': i,
+            'payment': Decimal('50.00') + i % 100,
+            'payment_type': i % 4 + 1,
+            'payment_type_name': 'Efectivo',
+        }
+        for i in range(rows)
+    ]
+    appointments = [
+        {
+            'appointment_id': i,
+            'patient_id': i % 5000,
+            'document_number_patient': f'{40000000 + i}',
+            'patient': f'Paterno{i} Materno{i} Nombre{i}',
+            'primary_phone_patient': '987654321',
+            'appointment_date': (start + timedelta(days=i % 365)).strftime('%Y-%m-%d'),
+            'appointment_hour': dtime(8 + i % 10).strftime('%H:%M'),
+        }
+        for i in range(rows)
+    ]
+    return [
+        ('citas por terapeuta', TherapistAppointmentSerializer, therapists, {'total_appointments': rows * 9}),
+        ('pacientes por terapeuta', PatientByTherapistSerializer, patients, {}),
+        ('caja diaria', DailyCashSerializer, cash, {}),
+        ('citas entre fechas', AppointmentRangeSerializer, appointments, {}),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compara el tiempo de serialización DRF + JsonResponse contra la ruta rápida."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Filas por reporte (por defecto 10000).")
+        parser.add_argument('--repeat', type=int, default=3, help="Repeticiones; se reporta el mejor tiempo.")
+
+    def measure(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        encoder = 'orjson' if orjson is not None else 'json (orjson no instalado)'
+        self.stdout.write(f"Filas por reporte: {rows} | codificador rápido: {encoder}")
+        self.stdout.write(f"{'reporte':<26}{'DRF (ms)':>12}{'rápido (ms)':>14}{'mejora':>9}")
+
+        for name, serializer_class, data, context in build_rows(rows):
+            slow, slow_body = self.measure(
+                lambda: dumps(serialize_many(serializer_class, data, context, fast=False), fast=False),
+                repeat,
+            )
+            fast, fast_body = self.measure(
+                lambda: dumps(serialize_many(serializer_class, data, context, fast=True), fast=True),
+                repeat,
+            )
+            if json.loads(slow_body) != json.loads(fast_body):
+                self.stderr.write(self.style.ERROR(f"La salida de '{name}' no coincide entre ambas rutas"))
+            self.stdout.write(
+                f"{name:<26}{slow * 1000:>12.1f}{fast * 1000:>14.1f}{slow / fast:>8.1f}x"
+            )
@@ -0,0 +1,49 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from multitenant.models import Tenant
+from reports.importers import IMPORT_KINDS, TenantImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa pacientes, terapeutas o citas de un tenant desde un archivo CSV o JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=IMPORT_KINDS, help="Tipo de registros a importar.")
+        parser.add_argument('path', help="Archivo .csv o .jsonl a importar.")
+        parser.add_argument('--tenant', type=int, required=True, help="ID del tenant destino.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="Formato del archivo (por defecto se deduce de la extensión).")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Filas por bulk_create.")
+        parser.add_argument('--errors', help="Archivo CSV donde guardar los errores por fila.")
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(pk=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"No existe el tenant con id {options['tenant']}")
+
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError("Indique --format csv o jsonl")
+
+        importer = TenantImporter(tenant, batch_size=options['batch_size'])
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            result = importer.run(options['kind'], read_rows(f, file_format))
+
+        if options['errors'] and result['errors']:
+            with open(options['errors'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=['row', 'error'])
+                writer.writeheader()
+                writer.writerows(result['errors'])
+
+        for error in result['errors'][:20]:
+            self.stderr.write(f"Fila {error['row']}: {error['error']}")
+        if len(result['errors']) > 20:
+            self.stderr.write(f"... y {len(result['errors']) - 20} errores más")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} registros importados, {len(result['errors'])} filas con error."
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from multitenant.models import Tenant
+from multitenant.routers import primary_databases, tenant_database
+from reports.models import Patient
+
+SEARCH_FIELDS = ['search_name', 'search_paternal_lastname', 'search_maternal_lastname']
+
+
+class Command(BaseCommand):
+    help = "Recalcula las columnas normalizadas de búsqueda de pacientes (por ejemplo, tras un bulk_create o update())."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=int,
+            help="ID del tenant a recalcular. Si se omite, se recalculan todos.",
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help="Pacientes por bulk_update.")
+
+    def handle(self, *args, **options):
+        if options['tenant'] is not None:
+            try:
+                tenant = Tenant.objects.get(pk=options['tenant'])
+            except Tenant.DoesNotExist:
+                raise CommandError(f"No existe el tenant con id {options['tenant']}")
+            targets = [(tenant_database(tenant), Patient.objects.filter(tenant=tenant))]
+        else:
+            targets = [(alias, Patient.objects.all()) for alias in primary_databases()]
+
+        updated = 0
+        for alias, patients in targets:
+            patients = patients.using(alias).only('id', 'name', 'paternal_lastname', 'maternal_lastname', *SEARCH_FIELDS)
+            batch = []
+            for patient in patients.order_by('pk').iterator(chunk_size=options['batch_size']):
+                patient.update_search_fields()
+                batch.append(patient)
+                if len(batch) >= options['batch_size']:
+                    Patient.objects.using(alias).bulk_update(batch, SEARCH_FIELDS)
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                Patient.objects.using(alias).bulk_update(batch, SEARCH_FIELDS)
+                updated += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Columnas de búsqueda recalculadas para {updated} pacientes."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from multitenant.models import Tenant
+from multitenant.routers import primary_databases
+from reports.report_cache import bump_tenant_date_versions
+from reports.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero el resumen diario de citas (DailyReportRollup)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=int,
+            help="ID del tenant a reconstruir. Si se omite, se reconstruyen todos.",
+        )
+
+    def handle(self, *args, **options):
+        tenant = None
+        if options['tenant'] is not None:
+            try:
+                tenant = Tenant.objects.get(pk=options['tenant'])
+            except Tenant.DoesNotExist:
+                raise CommandError(f"No existe el tenant con id {options['tenant']}")
+
+        if tenant is not None:
+            created = rebuild_rollups(tenant=tenant)
+        else:
+            # Sin tenant: reconstruir cada base de datos (shard) por separado
+            created = sum(rebuild_rollups(using=alias) for alias in primary_databases())
+        # Lo cacheado por fecha (por ejemplo, los meses de la serie diaria) salió del resumen anterior
+        bump_tenant_date_versions(tenant.pk if tenant is not None else None)
+        scope = f"tenant {tenant}" if tenant else "todos los tenants"
+        self.stdout.write(self.style.SUCCESS(
+            f"Resumen diario reconstruido para {scope}: {created} filas."
+        ))
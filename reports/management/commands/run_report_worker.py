@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from reports.pdf_cache import pdf_cache
+from reports.pdf_reports import html_to_pdf
+from reports.report_jobs import claim_pending_jobs, finish_job, prepare_job, requeue_stale_jobs
+
+
+def init_render_process():
+    """Inicializa Django en los procesos hijos (necesario con el método spawn)."""
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Procesa en segundo plano los trabajos de reportes PDF usando un pool de procesos local."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=getattr(settings, 'REPORT_WORKER_PROCESSES', 2),
+                            help="Cantidad de procesos que renderizan PDFs.")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Segundos de espera cuando no hay trabajos pendientes.")
+        parser.add_argument('--once', action='store_true',
+                            help="Procesa los trabajos pendientes y termina.")
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        requeued = requeue_stale_jobs(getattr(settings, 'REPORT_JOB_TIMEOUT', 600))
+        if requeued:
+            self.stdout.write(f"{requeued} trabajos bloqueados devueltos a la cola.")
+
+        # Los hijos no usan la base de datos; se cierran las conexiones antes de crearlos
+        connections.close_all()
+        running = {}
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_render_process) as pool:
+            while True:
+                # Tomar trabajos mientras haya procesos libres
+                for job in claim_pending_jobs(processes - len(running)):
+                    try:
+                        key, pdf, html = prepare_job(job)
+                    except Exception as e:
+                        finish_job(job, error=str(e))
+                        self.stderr.write(f"Trabajo {job.pk} fallido: {e}")
+                        continue
+                    if pdf is not None:
+                        # Ya estaba en la caché de PDFs: no hace falta renderizar
+                        finish_job(job, pdf=pdf)
+                        self.stdout.write(f"Trabajo {job.pk} terminado (caché).")
+                        continue
+                    running[pool.submit(html_to_pdf, html)] = (job, key)
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, key = running.pop(future)
+                    try:
+                        pdf = future.result()
+                        pdf_cache.set(key, pdf)
+                        finish_job(job, pdf=pdf)
+                        self.stdout.write(f"Trabajo {job.pk} terminado.")
+                    except Exception as e:
+                        finish_job(job, error=str(e))
+                        self.stderr.write(f"Trabajo {job.pk} fallido: {e}")
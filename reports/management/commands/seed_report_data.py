@@ -0,0 +1,145 @@
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from multitenant.models import Tenant, User
+from reports.models import Appointment, DocumentType, Patient, PaymentType, Therapist
+from reports.rollups import rebuild_rollups
+
+
+BATCH_SIZE = 2000
+
+FIRST_NAMES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Rosa', 'Carlos', 'Lucía', 'Miguel', 'Elena', 'Pedro']
+LAST_NAMES = ['Quispe', 'Flores', 'Sánchez', 'Rodríguez', 'García', 'Rojas', 'Díaz', 'Torres', 'Vargas', 'Ramos', 'Castillo', 'Mendoza']
+PAYMENT_TYPES = [('Efectivo', 45), ('Yape', 30), ('Tarjeta', 15), ('Transferencia', 10)]
+PAYMENT_AMOUNTS = [(Decimal('40.00'), 10), (Decimal('50.00'), 35), (Decimal('60.00'), 25), (Decimal('80.00'), 15), (Decimal('100.00'), 10), (Decimal('120.00'), 5)]
+# Lunes a domingo: los fines de semana tienen menos citas
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.0, 0.5, 0.05]
+HOUR_WEIGHTS = {8: 6, 9: 9, 10: 10, 11: 9, 12: 5, 13: 3, 14: 5, 15: 8, 16: 9, 17: 9, 18: 7, 19: 4}
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos de N tenants × M pacientes/terapeutas × K citas "
+        "con distribuciones realistas, usando bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=2, help="Cantidad de tenants.")
+        parser.add_argument('--patients', type=int, default=500, help="Pacientes por tenant.")
+        parser.add_argument('--therapists', type=int, default=10, help="Terapeutas por tenant.")
+        parser.add_argument('--appointments', type=int, default=10000, help="Citas por tenant.")
+        parser.add_argument('--days', type=int, default=365, help="Días de historia hacia atrás desde --end.")
+        parser.add_argument('--end', type=date.fromisoformat, default=date.today(), help="Última fecha con citas (AAAA-MM-DD).")
+        parser.add_argument('--seed', type=int, default=42, help="Semilla del generador aleatorio.")
+        parser.add_argument('--prefix', default='bench', help="Prefijo de nombres, dominios y documentos.")
+
+    def handle(self, *args, **options):
+        # Cada terapeuta tiene un turno por media hora de HOUR_WEIGHTS y por día
+        capacity = options['therapists'] * options['days'] * len(HOUR_WEIGHTS) * 2
+        if options['appointments'] > capacity:
+            raise CommandError(
+                f"{options['appointments']} citas no caben en {capacity} turnos libres; "
+                "aumente --therapists o --days."
+            )
+        rnd = random.Random(options['seed'])
+        days = [options['end'] - timedelta(days=i) for i in range(options['days'])]
+        day_weights = [WEEKDAY_WEIGHTS[d.weekday()] for d in days]
+
+        existing = Tenant.objects.filter(name__startswith=f"{options['prefix']}-").count()
+        for n in range(existing, existing + options['tenants']):
+            with transaction.atomic():
+                tenant = self.seed_tenant(rnd, n, days, day_weights, options)
+            rebuild_rollups(tenant=tenant)
+            self.stdout.write(self.style.SUCCESS(
+                f"Tenant {tenant.name}: {options['patients']} pacientes, "
+                f"{options['therapists']} terapeutas, {options['appointments']} citas."
+            ))
+
+    def seed_tenant(self, rnd, n, days, day_weights, options):
+        prefix = f"{options['prefix']}-{n}"
+        tenant = Tenant.objects.create(name=prefix, domain=f"{prefix}.localhost")
+        User.objects.create_user(username=f"{prefix}-admin", password=prefix, tenant=tenant)
+
+        document_type = DocumentType.objects.create(name='DNI', tenant=tenant)
+        payment_types = PaymentType.objects.bulk_create([
+            PaymentType(name=name, tenant=tenant) for name, _ in PAYMENT_TYPES
+        ])
+        payment_type_weights = [weight for _, weight in PAYMENT_TYPES]
+
+        therapists = Therapist.objects.bulk_create([
+            Therapist(
+                tenant=tenant,
+                document_type=document_type,
+                document_number=f"{prefix}-T{i}",
+                first_name=rnd.choice(FIRST_NAMES),
+                last_name_paternal=rnd.choice(LAST_NAMES),
+                last_name_maternal=rnd.choice(LAST_NAMES),
+                gender=rnd.choice('MF'),
+                phone=f"9{rnd.randrange(10**8):08d}",
+            )
+            for i in range(options['therapists'])
+        ], batch_size=BATCH_SIZE)
+
+        patients = [
+            Patient(
+                tenant=tenant,
+                document_type=document_type,
+                document_number=f"{prefix}-P{i}",
+                name=rnd.choice(FIRST_NAMES),
+                paternal_lastname=rnd.choice(LAST_NAMES),
+                maternal_lastname=rnd.choice(LAST_NAMES),
+                sex=rnd.choice('MF'),
+                primary_phone=f"9{rnd.randrange(10**8):08d}",
+            )
+            for i in range(options['patients'])
+        ]
+        for patient in patients:
+            patient.update_search_fields()
+        patients = Patient.objects.bulk_create(patients, batch_size=BATCH_SIZE)
+        # Pocos pacientes concentran muchas sesiones (tratamientos largos)
+        patient_weights = [1 / (i + 1) ** 0.6 for i in range(len(patients))]
+
+        hours = list(HOUR_WEIGHTS)
+        hour_weights = list(HOUR_WEIGHTS.values())
+        amounts = [amount for amount, _ in PAYMENT_AMOUNTS]
+        amount_weights = [weight for _, weight in PAYMENT_AMOUNTS]
+
+        # Turnos (terapeuta, fecha, hora) ya usados: un terapeuta no tiene dos citas a la vez
+        taken = set()
+        remaining = options['appointments']
+        while remaining > 0:
+            size = min(BATCH_SIZE, remaining)
+            batch = []
+            for appointment_date, hour, patient, therapist, amount, payment_type, paid in zip(
+                rnd.choices(days, day_weights, k=size),
+                rnd.choices(hours, hour_weights, k=size),
+                rnd.choices(patients, patient_weights, k=size),
+                rnd.choices(therapists, k=size),
+                rnd.choices(amounts, amount_weights, k=size),
+                rnd.choices(payment_types, payment_type_weights, k=size),
+                (rnd.random() < 0.85 for _ in range(size)),
+            ):
+                appointment_hour = time(hour, rnd.choice((0, 30)))
+                while (therapist.pk, appointment_date, appointment_hour) in taken:
+                    # Turno ocupado: sortear otro con las mismas distribuciones
+                    appointment_date = rnd.choices(days, day_weights)[0]
+                    appointment_hour = time(rnd.choices(hours, hour_weights)[0], rnd.choice((0, 30)))
+                    therapist = rnd.choice(therapists)
+                taken.add((therapist.pk, appointment_date, appointment_hour))
+                batch.append(Appointment(
+                    tenant=tenant,
+                    patient=patient,
+                    therapist=therapist,
+                    appointment_date=appointment_date,
+                    appointment_hour=appointment_hour,
+                    appointment_type='Terapia',
+                    payment=amount if paid else None,
+                    payment_type=payment_type if paid else None,
+                ))
+            Appointment.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+            remaining -= size
+        return tenant
@@ -0,0 +1,214 @@
+"""
+Métricas por petición: cantidad de consultas SQL, tiempo SQL, tiempo de las
+fases de reportes (serialización, render de PDF, escritura de xlsx) y
+contadores como los aciertos y fallos de la caché de PDFs.
+
+`RequestMetricsMiddleware` abre un registro por petición; el código de
+reportes marca sus fases con `with phase('pdf'): ...` y sus eventos con
+`count('pdf_cache_hit')`. Al terminar, los
+valores se envían en el header `Server-Timing` y se acumulan en ventanas
+por tenant y endpoint para calcular percentiles en memoria. En las
+respuestas en streaming se acumulan al terminar de enviar el contenido.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Valores medidos durante una petición."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_queries = 0
+        self.sql_ms = 0.0
+        self.phases = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    def record_query(self, elapsed_ms):
+        self.sql_queries += 1
+        self.sql_ms += elapsed_ms
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Valor del header Server-Timing."""
+        entries = [f'sql;dur={self.sql_ms:.1f};desc="{self.sql_queries} queries"']
+        entries += [f'{name};dur={ms:.1f}' for name, ms in self.phases.items()]
+        entries += [f'{name};desc="{value}"' for name, value in self.counters.items()]
+        entries.append(f'total;dur={self.total_ms:.1f}')
+        return ', '.join(entries)
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def track_request():
+    """Activa un registro de métricas para el contexto actual."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Acumula el tiempo del bloque en la fase `name` de la petición actual."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.phases[name] += (time.perf_counter() - started) * 1000
+
+
+def count(name, amount=1):
+    """Suma `amount` al contador `name` de la petición actual."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counters[name] += amount
+
+
+def track_stream(chunks, metrics, on_finish):
+    """
+    Recorre el contenido de una respuesta en streaming con `metrics` activo:
+    las consultas que corren al generar cada bloque (después de que la vista
+    devolvió la respuesta) se cuentan en la petición. Al terminar, o si el
+    cliente corta la descarga, llama a `on_finish()`.
+    """
+    chunks = iter(chunks)
+    try:
+        while True:
+            token = _current.set(metrics)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield chunk
+    finally:
+        on_finish()
+
+
+async def atrack_stream(chunks, metrics, on_finish):
+    """Versión de track_stream para contenido async."""
+    chunks = aiter(chunks)
+    try:
+        while True:
+            token = _current.set(metrics)
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield chunk
+    finally:
+        on_finish()
+
+
+def sql_execute_wrapper(execute, sql, params, many, context):
+    """execute_wrapper de Django que cuenta y cronometra cada consulta."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query((time.perf_counter() - started) * 1000)
+
+
+def install_sql_wrapper(sender, connection, **kwargs):
+    """
+    Receptor de connection_created: registra sql_execute_wrapper en cada
+    conexión nueva. Así también se miden las consultas del ORM async, que
+    corren en hilos distintos al de la petición.
+    """
+    if sql_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_execute_wrapper)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index], 2)
+
+
+class MetricsStore:
+    """Ventanas deslizantes de métricas por (tenant, endpoint), en memoria del proceso."""
+
+    FIELDS = ('total_ms', 'sql_ms', 'sql_queries')
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    @property
+    def window(self):
+        return getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)
+
+    def record(self, tenant, endpoint, metrics):
+        sample = (metrics.total_ms, metrics.sql_ms, metrics.sql_queries, dict(metrics.phases), dict(metrics.counters))
+        with self._lock:
+            key = (tenant, endpoint)
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.window)
+            self._samples[key].append(sample)
+
+    def summary(self, tenant=None):
+        """
+        Percentiles p50/p90/p99 por tenant y endpoint (solo del tenant indicado,
+        si se pasa) y el total de cada contador en la ventana.
+        """
+        with self._lock:
+            snapshot = {
+                key: list(samples) for key, samples in self._samples.items()
+                if tenant is None or key[0] == tenant
+            }
+
+        result = defaultdict(dict)
+        for (tenant, endpoint), samples in snapshot.items():
+            stats = {'count': len(samples)}
+            columns = {field: [s[i] for s in samples] for i, field in enumerate(self.FIELDS)}
+            for s in samples:
+                for name, ms in s[3].items():
+                    columns.setdefault(f'{name}_ms', []).append(ms)
+            for field, values in columns.items():
+                values.sort()
+                stats[field] = {
+                    'p50': _percentile(values, 50),
+                    'p90': _percentile(values, 90),
+                    'p99': _percentile(values, 99),
+                    'max': round(values[-1], 2),
+                }
+            for s in samples:
+                for name, value in s[4].items():
+                    stats[name] = stats.get(name, 0) + value
+            result[tenant][endpoint] = stats
+        return dict(result)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+metrics_store = MetricsStore()
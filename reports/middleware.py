@@ -0,0 +1,54 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import FileResponse
+
+from multitenant.utils import aget_request_tenant, get_request_tenant
+
+from .metrics import atrack_stream, metrics_store, track_request, track_stream
+
+
+class RequestMetricsMiddleware:
+    """
+    Mide cada petición (consultas SQL, tiempo SQL y fases de reportes),
+    agrega el header Server-Timing y acumula los valores por tenant y endpoint.
+    Las consultas se cuentan con el execute_wrapper que reports.apps registra
+    en cada conexión. Funciona tanto con vistas síncronas (WSGI) como async (ASGI).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with track_request() as metrics:
+            response = self.get_response(request)
+        self.record(request, response, metrics, get_request_tenant(request))
+        return response
+
+    async def __acall__(self, request):
+        with track_request() as metrics:
+            response = await self.get_response(request)
+        self.record(request, response, metrics, await aget_request_tenant(request))
+        return response
+
+    def record(self, request, response, metrics, tenant):
+        response['Server-Timing'] = metrics.server_timing()
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match else 'unresolved'
+
+        def store():
+            metrics_store.record(tenant.name if tenant else '-', endpoint, metrics)
+
+        if response.streaming and not isinstance(response, FileResponse):
+            # Las exportaciones consultan la base mientras se envía el contenido:
+            # esas consultas se cuentan y la muestra se guarda al terminar
+            # (el header Server-Timing solo incluye lo medido hasta aquí).
+            track = atrack_stream if response.is_async else track_stream
+            response.streaming_content = track(response.streaming_content, metrics, store)
+        else:
+            store()
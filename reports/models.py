@@ -1,6 +1,9 @@
+import uuid
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from multitenant.models import Tenant
+from .search import normalize_search
 #===============tipo de documento================
 class DocumentType(models.Model):
     name = models.CharField(max_length=255)
@@ -28,12 +31,44 @@ class Patient(models.Model):
     primary_phone = models.CharField(max_length=15)
     document_type = models.ForeignKey(DocumentType, on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Columnas normalizadas (minúsculas, sin tildes) para la búsqueda; se actualizan al guardar
+    search_name = models.CharField(max_length=100, blank=True, default='', editable=False)
+    search_paternal_lastname = models.CharField(max_length=100, blank=True, default='', editable=False)
+    search_maternal_lastname = models.CharField(max_length=100, blank=True, default='', editable=False)
     
     class Meta:
         db_table = 'patients'
         verbose_name = 'Paciente'
         verbose_name_plural = 'Pacientes'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'created_at']),
+            models.Index(fields=['tenant', 'paternal_lastname', 'maternal_lastname', 'name']),
+            models.Index(fields=['tenant', 'name']),
+            models.Index(fields=['tenant', 'document_number']),
+            models.Index(fields=['tenant', 'search_paternal_lastname', 'search_maternal_lastname']),
+            models.Index(fields=['tenant', 'search_maternal_lastname']),
+            models.Index(fields=['tenant', 'search_name']),
+        ]
+
+    def update_search_fields(self):
+        """
+        Recalcula las columnas de búsqueda. save() lo hace solo; quien use
+        bulk_create o update() debe llamarlo (o ejecutar rebuild_patient_search).
+        """
+        self.search_name = normalize_search(self.name)[:100]
+        self.search_paternal_lastname = normalize_search(self.paternal_lastname)[:100]
+        self.search_maternal_lastname = normalize_search(self.maternal_lastname)[:100]
+
+    def save(self, *args, **kwargs):
+        self.update_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                'search_name', 'search_paternal_lastname', 'search_maternal_lastname'
+            }
+        super().save(*args, **kwargs)
     
     def get_full_name(self):
         """Obtiene el nombre completo del paciente."""
@@ -63,6 +98,11 @@ class Therapist(models.Model):
     phone = models.CharField(max_length=15)
     email = models.EmailField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'last_name_paternal', 'first_name']),
+            models.Index(fields=['tenant', 'first_name']),
+        ]
 
     def get_full_name(self):
         """Obtiene el nombre completo del terapeuta."""
@@ -98,6 +138,9 @@ class Appointment(models.Model):
     initial_date = models.DateField(blank=True, null=True, verbose_name="Fecha inicial")
     final_date = models.DateField(blank=True, null=True, verbose_name="Fecha final")
     
+    # Sesiones generadas juntas para un tratamiento (citas recurrentes)
+    series = models.UUIDField(blank=True, null=True, editable=False, verbose_name="Serie de tratamiento")
+    
     # Configuración de la cita
     appointment_type = models.CharField(max_length=100, blank=True, null=True, verbose_name="Tipo de cita")
     payment = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name="Pago")
@@ -113,8 +156,19 @@ class Appointment(models.Model):
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
         ordering = ['-appointment_date', '-appointment_hour']
+        constraints = [
+            # Un terapeuta pertenece a un solo tenant: la restricción ya es por tenant
+            models.UniqueConstraint(
+                fields=['therapist', 'appointment_date', 'appointment_hour'],
+                name='unique_therapist_appointment_slot',
+                violation_error_message="El terapeuta ya tiene una cita en esa fecha y hora.",
+            ),
+        ]
         indexes = [
             models.Index(fields=['appointment_date', 'appointment_hour']),
+            models.Index(fields=['tenant', 'appointment_date', 'appointment_hour']),
+            models.Index(fields=['tenant', 'therapist', 'appointment_date']),
+            models.Index(fields=['tenant', 'series', 'appointment_date']),
         ]
     
     def __str__(self):
@@ -129,3 +183,126 @@ class Appointment(models.Model):
 
 
 
+#===============resumen diario (rollup)================
+class DailyReportRollup(models.Model):
+    """
+    Agregado diario de citas por (tenant, fecha, terapeuta, tipo de pago).
+    Se mantiene de forma incremental desde las señales de Appointment y se
+    puede reconstruir con el comando `rebuild_report_rollups`.
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField(verbose_name="Fecha")
+    therapist = models.ForeignKey(Therapist, on_delete=models.CASCADE, related_name="daily_rollups", verbose_name="Terapeuta")
+    payment_type = models.ForeignKey(PaymentType, on_delete=models.CASCADE, null=True, blank=True, related_name="daily_rollups", verbose_name="Tipo de pago")
+
+    appointments_count = models.PositiveIntegerField(default=0, verbose_name="Citas")
+    payments_count = models.PositiveIntegerField(default=0, verbose_name="Citas con pago")
+    payment_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total pagado")
+
+    class Meta:
+        db_table = 'daily_report_rollups'
+        verbose_name = "Resumen diario"
+        verbose_name_plural = "Resúmenes diarios"
+        constraints = [
+            # tenant y payment_type pueden ser NULL: con Coalesce el NULL cuenta como
+            # un valor más de la clave y no se pueden crear dos filas iguales sin tipo de pago
+            models.UniqueConstraint(
+                Coalesce('tenant', 0, output_field=models.BigIntegerField()),
+                'date',
+                'therapist',
+                Coalesce('payment_type', 0, output_field=models.BigIntegerField()),
+                name='unique_daily_report_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['tenant', 'date']),
+        ]
+
+    def __str__(self):
+        return f"Resumen - {self.date} {self.therapist_id} {self.payment_type_id}"
+
+#===============trabajos de reportes PDF================
+class ReportJob(models.Model):
+    """
+    Trabajo de generación de un reporte PDF en segundo plano.
+    La tabla funciona como cola: el comando `run_report_worker` toma los
+    trabajos pendientes y guarda el PDF generado en `result`.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En proceso'),
+        (STATUS_DONE, 'Terminado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+    REPORT_TYPES = [
+        ('citas_terapeuta', 'Citas por terapeuta'),
+        ('pacientes_terapeuta', 'Pacientes por terapeuta'),
+        ('resumen_caja', 'Resumen de caja'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True)
+    report_type = models.CharField(max_length=50, choices=REPORT_TYPES, verbose_name="Tipo de reporte")
+    params = models.JSONField(default=dict, verbose_name="Parámetros")
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING, verbose_name="Estado")
+    result = models.BinaryField(null=True, blank=True, verbose_name="PDF generado")
+    error = models.TextField(blank=True, default='', verbose_name="Error")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Inicio")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+
+    class Meta:
+        db_table = 'report_jobs'
+        verbose_name = "Trabajo de reporte"
+        verbose_name_plural = "Trabajos de reportes"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['tenant', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} - {self.status}"
+
+#===============versión de datos por fecha================
+class ReportDataVersion(models.Model):
+    """
+    Contador de cambios de citas por (tenant, fecha). Las escrituras de
+    Appointment lo incrementan y la caché de PDFs lo usa como parte de la
+    clave, así un reporte de una fecha sin cambios se reutiliza tal cual.
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField(verbose_name="Fecha")
+    version = models.PositiveIntegerField(default=1, verbose_name="Versión")
+
+    class Meta:
+        db_table = 'report_data_versions'
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'date'], name='unique_report_data_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.date} v{self.version}"
+
+
+class TenantDataVersion(models.Model):
+    """
+    Versión de los datos de reportes de un tenant. Las escrituras de citas,
+    pacientes, terapeutas y tipos de pago la incrementan; las respuestas
+    cacheadas y los ETag la incluyen en la clave. Vive en la base del tenant
+    y no en la caché local, para que todos los procesos vean el mismo valor.
+    Un tenant sin fila tiene versión 1.
+    """
+    tenant = models.OneToOneField(Tenant, on_delete=models.CASCADE, related_name='report_data_version')
+    version = models.PositiveIntegerField(default=1, verbose_name="Versión")
+
+    class Meta:
+        db_table = 'report_tenant_data_versions'
+
+    def __str__(self):
+        return f"{self.tenant_id} v{self.version}"
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import date, time
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """El cursor recibido no se puede decodificar."""
+
+
+def encode_cursor(row, reverse=False):
+    """
+    Codifica la posición (fecha, hora, id) de una fila como cursor opaco.
+    `reverse` indica que el cursor pide la página anterior a esa posición.
+    """
+    payload = [
+        row["appointment_date"].isoformat(),
+        row["appointment_hour"].isoformat(),
+        row["id"],
+        1 if reverse else 0,
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decodifica un cursor y devuelve (fecha, hora, id, reverse)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        day, hour, pk, reverse = json.loads(raw)
+        return date.fromisoformat(day), time.fromisoformat(hour), int(pk), bool(reverse)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Cursor inválido")
+
+
+def keyset_filter(day, hour, pk, reverse=False):
+    """
+    Condición para las filas posteriores (o anteriores si `reverse`) a la
+    posición (fecha, hora, id) según el orden del índice compuesto.
+    """
+    op = "lt" if reverse else "gt"
+    return (
+        Q(**{f"appointment_date__{op}": day})
+        | Q(appointment_date=day, **{f"appointment_hour__{op}": hour})
+        | Q(appointment_date=day, appointment_hour=hour, **{f"id__{op}": pk})
+    )
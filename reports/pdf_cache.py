@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from .metrics import count
+
+
+class PDFCache:
+    """
+    Caché en disco de PDFs generados, direccionada por contenido.
+    - La clave es un hash de (tenant, tipo de reporte, parámetros, versión de datos),
+      por lo que un cambio en los datos produce una clave nueva y nunca se
+      sirve un PDF obsoleto.
+    - El tamaño total se limita con REPORTS_PDF_CACHE_MAX_BYTES, eliminando
+      primero los archivos usados hace más tiempo (LRU según mtime). El
+      directorio solo se recorre cuando el tamaño estimado supera el límite
+      o pasó SCAN_INTERVAL desde el último recorrido.
+    - Los aciertos y fallos se cuentan en el proceso (stats()) y en las
+      métricas de la petición (Server-Timing y /reports/metrics/).
+    """
+
+    # Segundos entre recorridos completos del directorio: otros procesos también escriben
+    SCAN_INTERVAL = 60
+    # Al superar el límite se libera hasta esta fracción, para no recorrer el directorio en cada escritura
+    EVICT_TO = 0.8
+
+    def __init__(self):
+        # Tamaño estimado del directorio: el del último recorrido más lo escrito desde entonces
+        self._size = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def directory(self):
+        return Path(getattr(settings, 'REPORTS_PDF_CACHE_DIR', Path(tempfile.gettempdir()) / 'reports_pdf_cache'))
+
+    @property
+    def max_bytes(self):
+        return getattr(settings, 'REPORTS_PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+    def key(self, tenant_id, report_type, params, version):
+        raw = json.dumps([tenant_id, report_type, params, version], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path(self, key):
+        return self.directory / key[:2] / f"{key}.pdf"
+
+    def get(self, key):
+        """Devuelve la ruta del PDF cacheado o None. Un acierto renueva su uso (LRU)."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            count('pdf_cache_miss')
+            return None
+        with self._lock:
+            self.hits += 1
+        count('pdf_cache_hit')
+        return path
+
+    def stats(self):
+        """Aciertos y fallos del proceso desde su inicio (o desde reset_stats)."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def set(self, key, content):
+        """Guarda el PDF de forma atómica y aplica el límite de tamaño."""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(content)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(content)
+            scan = (
+                self._size is None
+                or self._size > self.max_bytes
+                or time.monotonic() - self._scanned_at > self.SCAN_INTERVAL
+            )
+        if scan:
+            self.evict()
+        return path
+
+    def evict(self):
+        """
+        Recorre el directorio y, si supera el tamaño máximo, elimina los PDFs
+        menos usados hasta quedar en EVICT_TO del máximo. Devuelve la cantidad
+        de archivos eliminados.
+        """
+        files = []
+        total = 0
+        for path in self.directory.glob('*/*.pdf'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        removed = 0
+        target = self.max_bytes * self.EVICT_TO if total > self.max_bytes else total
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+            self._scanned_at = time.monotonic()
+        return removed
+
+
+pdf_cache = PDFCache()
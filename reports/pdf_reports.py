@@ -0,0 +1,143 @@
+from io import BytesIO
+
+from django.template.loader import render_to_string
+from django_xhtml2pdf.utils import fetch_resources
+from xhtml2pdf import pisa
+
+from .metrics import phase
+from .pdf_cache import pdf_cache
+from .report_cache import get_date_version, replica_is_current
+from .reports_serializers import PDFContextSerializer
+
+
+def citas_terapeuta_context(data, validated_data):
+    """Contexto del PDF de citas por terapeuta."""
+    # Preparar contexto usando serializer
+    context_data = {
+        'date': validated_data.get('date'),
+        'data': data,
+        'title': 'Citas por Terapeuta'
+    }
+    return PDFContextSerializer(context_data).data
+
+
+def pacientes_terapeuta_context(data, validated_data):
+    """Contexto del PDF de pacientes por terapeuta."""
+    # Pasar data directamente al template (sin serializar); si no hay datos se muestra un mensaje
+    return {
+        'date': validated_data.get('date'),
+        'data': data or [],
+        'title': 'Pacientes por Terapeuta',
+        'no_data': not data
+    }
+
+
+def resumen_caja_context(data, validated_data):
+    """Contexto del PDF de resumen de caja, agregado por tipo de pago."""
+    total = sum(float(item.get('payment', 0)) for item in data)
+    
+    return {
+        'date': validated_data.get('date'),
+        'data': data,
+        'total': total,
+        'title': 'Resumen de Caja Diaria'
+    }
+
+
+# report_type -> (template, nombre del archivo, método del ReportService, constructor del contexto)
+PDF_REPORTS = {
+    'citas_terapeuta': ('pdf_templates/citas_terapeuta.html', 'citas_terapeuta.pdf', 'get_appointments_count_by_therapist', citas_terapeuta_context),
+    'pacientes_terapeuta': ('pdf_templates/pacientes_terapeuta.html', 'pacientes_por_terapeuta.pdf', 'get_patients_by_therapist', pacientes_terapeuta_context),
+    'resumen_caja': ('pdf_templates/resumen_caja.html', 'resumen_caja.pdf', 'get_daily_cash_summary', resumen_caja_context),
+}
+
+
+def get_report_data(report_type, service, validated_data):
+    """Lee los datos del reporte con el método del ReportService correspondiente."""
+    return getattr(service, PDF_REPORTS[report_type][2])(validated_data)
+
+
+async def aget_report_data(report_type, service, validated_data):
+    """Versión async de get_report_data (usa el método `a...` del servicio)."""
+    return await getattr(service, 'a' + PDF_REPORTS[report_type][2])(validated_data)
+
+
+def render_report_html_from_data(report_type, data, validated_data):
+    """Renderiza el HTML del reporte con datos ya leídos (no consulta la base)."""
+    template, _, _, build_context = PDF_REPORTS[report_type]
+    return render_to_string(template, build_context(data, validated_data))
+
+
+def render_report_html(report_type, service, validated_data):
+    """Renderiza el HTML del reporte indicado (sin convertirlo a PDF)."""
+    data = get_report_data(report_type, service, validated_data)
+    return render_report_html_from_data(report_type, data, validated_data)
+
+
+class PDFRenderError(RuntimeError):
+    """xhtml2pdf no pudo generar el PDF."""
+
+
+def html_to_pdf(html):
+    """
+    Convierte HTML a PDF con xhtml2pdf y devuelve los bytes.
+    No accede a la base de datos, por lo que puede ejecutarse en otro proceso.
+    Si xhtml2pdf informa errores lanza PDFRenderError: un PDF incompleto no
+    debe enviarse ni guardarse en la caché.
+    """
+    output = BytesIO()
+    with phase('pdf'):
+        result = pisa.CreatePDF(html, dest=output, link_callback=fetch_resources)
+    if result.err:
+        raise PDFRenderError(f"xhtml2pdf no pudo generar el PDF ({result.err} errores)")
+    return output.getvalue()
+
+
+def pdf_cache_key(report_type, tenant, validated_data):
+    """
+    Clave de caché del PDF. Incluye la versión de datos de la fecha, que se
+    lee antes de renderizar para no asociar datos nuevos a una clave vieja.
+    """
+    tenant_id = tenant.pk if tenant is not None else None
+    date = validated_data['date']
+    version = get_date_version(tenant_id, date)
+    return pdf_cache.key(tenant_id, report_type, {'date': date.isoformat()}, version)
+
+
+def get_or_render_pdf(report_type, service, validated_data):
+    """
+    Devuelve un archivo abierto con el PDF del reporte. Si ya existe en la
+    caché de disco se envía tal cual; si no, se renderiza y se guarda.
+    """
+    key = pdf_cache_key(report_type, service.tenant, validated_data)
+    pdf = open_cached_pdf(key)
+    if pdf is not None:
+        return pdf
+    # El PDF se cachea con la versión leída de la base principal: si la
+    # réplica todavía no la tiene, los datos se leen de la principal
+    if not replica_is_current(service.using, service.tenant.pk):
+        service = service.on_primary()
+    data = get_report_data(report_type, service, validated_data)
+    return render_and_cache_pdf(report_type, key, data, validated_data)
+
+
+def open_cached_pdf(key):
+    """Abre el PDF guardado en la caché de disco, o None si no existe."""
+    path = pdf_cache.get(key)
+    if path is not None:
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            pass  # Eliminado por la limpieza LRU entre la consulta y la apertura
+    return None
+
+
+def render_and_cache_pdf(report_type, key, data, validated_data):
+    """
+    Renderiza el PDF con datos ya leídos y lo guarda en la caché de disco.
+    No consulta la base de datos: las vistas async lo ejecutan en el pool
+    de hilos de trabajo bloqueante.
+    """
+    content = html_to_pdf(render_report_html_from_data(report_type, data, validated_data))
+    pdf_cache.set(key, content)
+    return BytesIO(content)
@@ -0,0 +1,356 @@
+import calendar
+import hashlib
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.db.models.functions import TruncMonth
+
+from multitenant.context import read_from_primary
+from multitenant.models import Tenant
+from multitenant.routers import primary_database, primary_databases, replica_database, tenant_id_database
+from multitenant.utils import aget_request_tenant, get_request_tenant
+
+from .models import Appointment, ReportDataVersion, TenantDataVersion
+
+
+def _data_version_key(tenant_id):
+    return f"reports:data-version:{tenant_id}"
+
+
+def _read_data_version(tenant_id):
+    version = (
+        TenantDataVersion.objects.using(tenant_id_database(tenant_id))
+        .filter(tenant_id=tenant_id)
+        .values_list('version', flat=True)
+        .first()
+    )
+    return version or 1
+
+
+def get_data_version(tenant_id):
+    """
+    Versión actual de los datos de reportes de un tenant. Se guarda en la
+    caché por REPORTS_DATA_VERSION_TIMEOUT segundos (así un 304 no consulta
+    la base) y si no está se lee de la base principal del tenant (no de la
+    réplica). bump_data_version borra la entrada junto con la escritura;
+    con una caché local por proceso, los demás procesos ven el cambio al
+    vencer la entrada.
+    """
+    key = _data_version_key(tenant_id)
+    version = cache.get(key)
+    if version is None:
+        version = _read_data_version(tenant_id)
+        cache.add(key, version, timeout=settings.REPORTS_DATA_VERSION_TIMEOUT)
+    return version
+
+
+async def aget_data_version(tenant_id):
+    """Versión async de get_data_version."""
+    return await sync_to_async(get_data_version)(tenant_id)
+
+
+def bump_data_version(tenant_id):
+    """
+    Invalida las respuestas cacheadas del tenant incrementando su versión
+    en la base (y borrándola de la caché). Si tenant_id es None (por ejemplo, un tipo de
+    pago compartido) se incrementa la de todos los tenants.
+    """
+    if tenant_id is None:
+        for pk in Tenant.objects.values_list('pk', flat=True):
+            bump_data_version(pk)
+        return
+    using = tenant_id_database(tenant_id)
+    versions = TenantDataVersion.objects.using(using).filter(tenant_id=tenant_id)
+    if not versions.update(version=F('version') + 1):
+        try:
+            # Sin fila la versión era 1
+            with transaction.atomic(using=using):
+                TenantDataVersion.objects.using(using).create(tenant_id=tenant_id, version=2)
+        except IntegrityError:
+            # Otro proceso creó la fila al mismo tiempo
+            versions.update(version=F('version') + 1)
+    # Borrar ahora y al confirmar: antes del commit los demás aún leen la versión anterior
+    key = _data_version_key(tenant_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key), using=using)
+
+
+def replica_is_current(using, tenant_id, version=None):
+    """
+    Indica si la base `using` ya tiene la versión actual de los datos del
+    tenant (`version`, si ya se leyó de la base principal). Una réplica
+    atrasada devuelve datos anteriores a esa versión, que no deben guardarse
+    en una caché cuya clave es esa versión. La base principal siempre lo está.
+    """
+    if using == primary_database(using):
+        return True
+    if version is None:
+        version = get_data_version(tenant_id)
+    replica_version = (
+        TenantDataVersion.objects.using(using)
+        .filter(tenant_id=tenant_id)
+        .values_list('version', flat=True)
+        .first()
+    )
+    return (replica_version or 1) >= version
+
+
+def reads_for_cache(tenant_id, version):
+    """
+    Contexto para calcular un resultado que se cacheará con la versión
+    `version`: si los reportes leen de la réplica (REPORTS_USE_REPLICA) y la
+    del tenant todavía no tiene esa versión, las lecturas del bloque van a
+    la base principal.
+    """
+    if not getattr(settings, 'REPORTS_USE_REPLICA', False):
+        return nullcontext()
+    replica = replica_database(tenant_id_database(tenant_id))
+    return nullcontext() if replica_is_current(replica, tenant_id, version) else read_from_primary()
+
+
+def cached_report(tenant, name, params, compute):
+    """
+    Devuelve el resultado cacheado de un reporte del tenant o lo calcula.
+    La clave incluye la versión de datos del tenant, así cualquier escritura
+    de citas deja obsoletas las entradas anteriores sin borrarlas una a una.
+    `compute` debe crear el servicio que lee la base: si la réplica está
+    atrasada, se ejecuta con las lecturas en la base principal.
+    """
+    tenant_id = tenant.pk if tenant is not None else None
+    version = get_data_version(tenant_id)
+    key = f"reports:{name}:{tenant_id}:{version}:" + ":".join(str(p) for p in params)
+    result = cache.get(key)
+    if result is None:
+        with reads_for_cache(tenant_id, version):
+            result = compute()
+        cache.set(key, result, timeout=getattr(settings, 'REPORTS_CACHE_TIMEOUT', 300))
+    return result
+
+
+async def acached_report(tenant, name, params, compute):
+    """Versión async de cached_report; `compute` es una función async."""
+    tenant_id = tenant.pk if tenant is not None else None
+    version = await aget_data_version(tenant_id)
+    key = f"reports:{name}:{tenant_id}:{version}:" + ":".join(str(p) for p in params)
+    result = await cache.aget(key)
+    if result is None:
+        with await sync_to_async(reads_for_cache)(tenant_id, version):
+            result = await compute()
+        await cache.aset(key, result, timeout=getattr(settings, 'REPORTS_CACHE_TIMEOUT', 300))
+    return result
+
+
+def _response_cache_key(name, tenant_id, version, validated_data):
+    """Clave de caché y ETag de una respuesta de reporte."""
+    params = ":".join(f"{k}={v}" for k, v in sorted(validated_data.items()))
+    key = f"reports:response:{name}:{tenant_id}:{version}:{params}"
+    etag = '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+    return key, etag
+
+
+def _cached_response(request, etag, cached):
+    """Respuesta 304 si el ETag coincide, la respuesta cacheada si existe, o None."""
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        return HttpResponseNotModified()
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    return None
+
+
+def _with_etag(response, etag):
+    response['ETag'] = etag
+    # El navegador puede guardar la respuesta pero debe revalidarla siempre
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie', 'Host'))
+    return response
+
+
+def cache_report_response(name, serializer_class):
+    """
+    Decorador de vistas JSON de reportes con caché por tenant y ETag fuerte.
+    - La clave y el ETag dependen del tenant, de los parámetros validados y
+      de la versión de datos del tenant, que se incrementa con cada escritura
+      de citas, pacientes, terapeutas o tipos de pago.
+    - Si el cliente envía If-None-Match con el ETag vigente se responde 304
+      sin consultar la base de datos.
+    - Si la réplica todavía no tiene esa versión, la vista lee de la base
+      principal: así nunca se guardan datos viejos con una clave nueva.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _view(request, *args, **kwargs):
+            serializer = serializer_class(data=request.GET)
+            if not serializer.is_valid():
+                return view_func(request, *args, **kwargs)
+            
+            tenant = get_request_tenant(request)
+            tenant_id = tenant.pk if tenant is not None else None
+            version = get_data_version(tenant_id)
+            key, etag = _response_cache_key(name, tenant_id, version, serializer.validated_data)
+            
+            response = _cached_response(request, etag, cache.get(key))
+            if response is None:
+                with reads_for_cache(tenant_id, version):
+                    response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    timeout=getattr(settings, 'REPORTS_CACHE_TIMEOUT', 300)
+                )
+            return _with_etag(response, etag)
+        return _view
+    return decorator
+
+
+def acache_report_response(name, serializer_class):
+    """Versión de cache_report_response para vistas async (misma clave y ETag)."""
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _view(request, *args, **kwargs):
+            serializer = serializer_class(data=request.GET)
+            if not serializer.is_valid():
+                return await view_func(request, *args, **kwargs)
+            
+            tenant = await aget_request_tenant(request)
+            tenant_id = tenant.pk if tenant is not None else None
+            version = await aget_data_version(tenant_id)
+            key, etag = _response_cache_key(name, tenant_id, version, serializer.validated_data)
+            
+            response = _cached_response(request, etag, await cache.aget(key))
+            if response is None:
+                with await sync_to_async(reads_for_cache)(tenant_id, version):
+                    response = await view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                await cache.aset(
+                    key,
+                    (response.content, response['Content-Type']),
+                    timeout=getattr(settings, 'REPORTS_CACHE_TIMEOUT', 300)
+                )
+            return _with_etag(response, etag)
+        return _view
+    return decorator
+
+
+def get_date_version(tenant_id, date):
+    """
+    Versión persistente de los datos de una fecha del tenant. Solo lee:
+    una fecha sin contador nunca cambió y tiene versión 1.
+    """
+    version = (
+        ReportDataVersion.objects.using(tenant_id_database(tenant_id))
+        .filter(tenant_id=tenant_id, date=date)
+        .values_list('version', flat=True)
+        .first()
+    )
+    return version or 1
+
+
+def get_month_versions(tenant_id, months):
+    """
+    Versión de cada mes (primer día) de `months`: la suma de las versiones de
+    los contadores de sus fechas, con una consulta y sin escribir. Las fechas
+    sin contador suman 0; como los incrementos crean el contador con versión
+    2 y luego solo crecen, cualquier escritura en una fecha del mes cambia
+    la suma.
+    """
+    months = set(months)
+    if not months:
+        return {}
+    last = max(months)
+    end = last.replace(day=calendar.monthrange(last.year, last.month)[1])
+
+    versions = dict.fromkeys(months, 0)
+    rows = (
+        ReportDataVersion.objects.using(tenant_id_database(tenant_id))
+        .filter(tenant_id=tenant_id, date__range=(min(months), end))
+        .annotate(month=TruncMonth('date'))
+        .order_by()
+        .values('month')
+        .annotate(version=Sum('version'))
+    )
+    for row in rows:
+        if row['month'] in versions:
+            versions[row['month']] = row['version']
+    return versions
+
+
+def _create_date_versions(using, pairs):
+    """
+    Crea con versión 2 (sin contador la versión era 1) los contadores que
+    falten de los pares (tenant_id, fecha) ya incrementados con un UPDATE.
+    Si otro proceso creó alguno entre medio, su incremento ya cambió la
+    versión después de nuestra escritura.
+    """
+    rows = [
+        ReportDataVersion(tenant_id=tenant_id, date=date, version=2)
+        for tenant_id, date in pairs
+        if tenant_id is not None and date is not None
+    ]
+    if rows:
+        ReportDataVersion.objects.using(using).bulk_create(rows, ignore_conflicts=True, batch_size=1000)
+
+
+def bump_date_version(tenant_id, date):
+    """Incrementa la versión de una fecha del tenant."""
+    bump_date_versions(tenant_id, [date])
+
+
+def bump_date_versions(tenant_id, dates):
+    """Incrementa la versión de varias fechas del tenant (crea los contadores que falten)."""
+    dates = {date for date in dates if date is not None}
+    if not dates:
+        return
+    using = tenant_id_database(tenant_id)
+    (
+        ReportDataVersion.objects.using(using)
+        .filter(tenant_id=tenant_id, date__in=dates)
+        .update(version=F('version') + 1)
+    )
+    _create_date_versions(using, [(tenant_id, date) for date in dates])
+
+
+def _appointment_dates(appointments):
+    """Pares (tenant_id, fecha) distintos de las citas `appointments`."""
+    return appointments.order_by().values_list('tenant_id', 'appointment_date').distinct()
+
+
+def bump_appointment_date_versions(using, **lookups):
+    """
+    Incrementa la versión de las fechas con citas que cumplen `lookups` en
+    la base `using` (por ejemplo, las de un paciente cuyo nombre cambió y
+    aparece en los PDF de esas fechas).
+    """
+    appointments = Appointment.objects.using(using).filter(**lookups)
+    dated = appointments.filter(tenant_id=OuterRef('tenant_id'), appointment_date=OuterRef('date'))
+    ReportDataVersion.objects.using(using).filter(Exists(dated)).update(version=F('version') + 1)
+    _create_date_versions(using, _appointment_dates(appointments))
+
+
+def bump_tenant_date_versions(tenant_id=None):
+    """
+    Incrementa la versión de todas las fechas del tenant y crea los
+    contadores de las fechas con citas que no lo tenían (por ejemplo, tras
+    una importación). Si tenant_id es None se incrementan las de todos los
+    tenants (por ejemplo, al cambiar un tipo de pago compartido).
+    """
+    if tenant_id is None:
+        # Sin tenant: incrementar en todas las bases de datos (shards)
+        for alias in primary_databases():
+            ReportDataVersion.objects.using(alias).update(version=F('version') + 1)
+            _create_date_versions(alias, _appointment_dates(Appointment.objects.using(alias)))
+        return
+    using = tenant_id_database(tenant_id)
+    ReportDataVersion.objects.using(using).filter(tenant_id=tenant_id).update(version=F('version') + 1)
+    _create_date_versions(using, _appointment_dates(Appointment.objects.using(using).filter(tenant_id=tenant_id)))
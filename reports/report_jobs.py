@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from multitenant.context import use_tenant
+
+from .models import ReportJob
+from .pdf_cache import pdf_cache
+from .pdf_reports import PDF_REPORTS, pdf_cache_key, render_report_html
+from .reports_serializers import DateParameterSerializer
+from .reports_services import ReportService
+
+
+def submit_job(tenant, report_type, validated_data):
+    """Registra un trabajo pendiente para generar un reporte PDF."""
+    params = {'date': validated_data['date'].strftime('%Y-%m-%d')}
+    return ReportJob.objects.create(tenant=tenant, report_type=report_type, params=params)
+
+
+def claim_pending_jobs(limit):
+    """
+    Toma hasta `limit` trabajos pendientes marcándolos como en proceso.
+    El UPDATE condicional evita que dos workers tomen el mismo trabajo.
+    """
+    claimed = []
+    candidates = (
+        ReportJob.objects
+        .filter(status=ReportJob.STATUS_PENDING)
+        .order_by('created_at')
+        .values_list('pk', flat=True)[:limit]
+    )
+    for pk in list(candidates):
+        updated = ReportJob.objects.filter(pk=pk, status=ReportJob.STATUS_PENDING).update(
+            status=ReportJob.STATUS_RUNNING,
+            started_at=timezone.now()
+        )
+        if updated:
+            claimed.append(ReportJob.objects.select_related('tenant').get(pk=pk))
+    return claimed
+
+
+def requeue_stale_jobs(timeout):
+    """Devuelve a la cola los trabajos en proceso por más de `timeout` segundos."""
+    limit = timezone.now() - timedelta(seconds=timeout)
+    return ReportJob.objects.filter(
+        status=ReportJob.STATUS_RUNNING,
+        started_at__lt=limit
+    ).update(status=ReportJob.STATUS_PENDING, started_at=None)
+
+
+def prepare_job(job):
+    """
+    Prepara un trabajo para renderizar. Devuelve (clave de caché, pdf, html):
+    si el PDF ya está en la caché de disco, `pdf` trae sus bytes y no hace
+    falta renderizar; si no, `html` trae el HTML del reporte.
+    """
+    if job.report_type not in PDF_REPORTS:
+        raise ValueError(f"Tipo de reporte desconocido: {job.report_type}")
+    serializer = DateParameterSerializer(data=job.params)
+    serializer.is_valid(raise_exception=True)
+    
+    # Los datos del trabajo se leen del shard de su tenant
+    with use_tenant(job.tenant):
+        key = pdf_cache_key(job.report_type, job.tenant, serializer.validated_data)
+        path = pdf_cache.get(key)
+        if path is not None:
+            try:
+                return key, path.read_bytes(), None
+            except FileNotFoundError:
+                pass
+        html = render_report_html(job.report_type, ReportService(job.tenant), serializer.validated_data)
+    return key, None, html
+
+
+def finish_job(job, pdf=None, error=''):
+    """Guarda el resultado (o el error) de un trabajo."""
+    job.result = pdf
+    job.error = error
+    job.status = ReportJob.STATUS_FAILED if error else ReportJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'error', 'status', 'finished_at'])
+
+
+def job_filename(job):
+    return PDF_REPORTS[job.report_type][1]
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from datetime import datetime
 from django.utils.timezone import localtime
 
@@ -29,6 +30,144 @@ class DateParameterSerializer(serializers.Serializer):
         return data
 
 
+class AppointmentPageParameterSerializer(DateParameterSerializer):
+    """Valida parámetros de la paginación por cursor de citas entre fechas."""
+    
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    page_size = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate_page_size(self, value):
+        """Limita el tamaño de página al máximo configurado."""
+        return min(value, getattr(settings, 'REPORTS_MAX_PAGE_SIZE', 500))
+
+
+class ReportJobParameterSerializer(DateParameterSerializer):
+    """Valida la solicitud de un reporte PDF en segundo plano."""
+    
+    report_type = serializers.ChoiceField(choices=[
+        'citas_terapeuta',
+        'pacientes_terapeuta',
+        'resumen_caja'
+    ])
+
+
+class PatientSearchParameterSerializer(serializers.Serializer):
+    """Valida los parámetros de la búsqueda de pacientes."""
+    
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate_limit(self, value):
+        """Limita la cantidad de resultados al máximo configurado."""
+        return min(value, getattr(settings, 'PATIENT_SEARCH_MAX_RESULTS', 50))
+
+
+class StatisticsParameterSerializer(serializers.Serializer):
+    """Valida el rango de fechas de las estadísticas (hasta REPORTS_SERIES_MAX_DAYS días)."""
+    
+    start = serializers.DateField(input_formats=['%Y-%m-%d'])
+    end = serializers.DateField(input_formats=['%Y-%m-%d'])
+    
+    def validate(self, data):
+        """Valida que el rango sea coherente."""
+        if data['start'] > data['end']:
+            raise serializers.ValidationError("start no puede ser mayor que end")
+        max_days = settings.REPORTS_SERIES_MAX_DAYS
+        if (data['end'] - data['start']).days >= max_days:
+            raise serializers.ValidationError(f"El rango no puede superar {max_days} días")
+        return data
+
+
+class AvailabilityParameterSerializer(serializers.Serializer):
+    """Valida el rango y el horario de la consulta de turnos libres."""
+    
+    start_date = serializers.DateField(input_formats=['%Y-%m-%d'])
+    end_date = serializers.DateField(input_formats=['%Y-%m-%d'])
+    therapist = serializers.IntegerField(required=False, min_value=1)
+    start_time = serializers.TimeField(required=False, input_formats=['%H:%M'])
+    end_time = serializers.TimeField(required=False, input_formats=['%H:%M'])
+    slot_minutes = serializers.IntegerField(required=False, min_value=5, max_value=24 * 60)
+    
+    def validate(self, data):
+        """Completa el horario con los valores configurados y valida el rango."""
+        data.setdefault('start_time', datetime.strptime(settings.AVAILABILITY_START_TIME, '%H:%M').time())
+        data.setdefault('end_time', datetime.strptime(settings.AVAILABILITY_END_TIME, '%H:%M').time())
+        data.setdefault('slot_minutes', settings.AVAILABILITY_SLOT_MINUTES)
+        
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("start_date no puede ser mayor que end_date")
+        max_days = settings.AVAILABILITY_MAX_DAYS
+        if (data['end_date'] - data['start_date']).days >= max_days:
+            raise serializers.ValidationError(f"El rango no puede superar {max_days} días")
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("start_time debe ser menor que end_time")
+        return data
+
+
+class BookingItemSerializer(serializers.Serializer):
+    """Valida una cita de la reserva en bloque."""
+    
+    patient = serializers.IntegerField(min_value=1)
+    therapist = serializers.IntegerField(min_value=1)
+    appointment_date = serializers.DateField(input_formats=['%Y-%m-%d'])
+    appointment_hour = serializers.TimeField(input_formats=['%H:%M', '%H:%M:%S'])
+    initial_date = serializers.DateField(required=False, allow_null=True, input_formats=['%Y-%m-%d'])
+    final_date = serializers.DateField(required=False, allow_null=True, input_formats=['%Y-%m-%d'])
+    appointment_type = serializers.CharField(required=False, allow_null=True, allow_blank=True, max_length=100)
+    payment = serializers.DecimalField(required=False, allow_null=True, max_digits=10, decimal_places=2)
+    payment_type = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    
+    def validate(self, data):
+        """Valida que el periodo de tratamiento sea coherente."""
+        if data.get('initial_date') and data.get('final_date') and data['initial_date'] > data['final_date']:
+            raise serializers.ValidationError("initial_date no puede ser mayor que final_date")
+        return data
+
+
+class TreatmentSeriesSerializer(serializers.Serializer):
+    """Valida la creación de las sesiones recurrentes de un tratamiento."""
+    
+    patient = serializers.IntegerField(min_value=1)
+    therapist = serializers.IntegerField(min_value=1)
+    initial_date = serializers.DateField(input_formats=['%Y-%m-%d'])
+    final_date = serializers.DateField(required=False, allow_null=True, input_formats=['%Y-%m-%d'])
+    weekdays = serializers.ListField(child=serializers.IntegerField(min_value=0, max_value=6), allow_empty=False)
+    sessions = serializers.IntegerField(min_value=1)
+    appointment_hour = serializers.TimeField(input_formats=['%H:%M', '%H:%M:%S'])
+    appointment_type = serializers.CharField(required=False, allow_null=True, allow_blank=True, max_length=100)
+    payment = serializers.DecimalField(required=False, allow_null=True, max_digits=10, decimal_places=2)
+    payment_type = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    skip_conflicts = serializers.BooleanField(required=False, default=False)
+    
+    def validate_sessions(self, value):
+        """Limita la cantidad de sesiones al máximo configurado."""
+        if value > settings.TREATMENT_MAX_SESSIONS:
+            raise serializers.ValidationError(f"Máximo {settings.TREATMENT_MAX_SESSIONS} sesiones por tratamiento.")
+        return value
+    
+    def validate(self, data):
+        """Valida que el periodo de tratamiento sea coherente."""
+        if data.get('final_date') and data['initial_date'] > data['final_date']:
+            raise serializers.ValidationError("initial_date no puede ser mayor que final_date")
+        return data
+
+
+class TreatmentSeriesUpdateSerializer(serializers.Serializer):
+    """Valida el cambio en bloque de las sesiones de una serie."""
+    
+    from_date = serializers.DateField(required=False, input_formats=['%Y-%m-%d'])
+    days = serializers.IntegerField(required=False, default=0, min_value=-366, max_value=366)
+    appointment_hour = serializers.TimeField(required=False, input_formats=['%H:%M', '%H:%M:%S'])
+    therapist = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate(self, data):
+        """Exige al menos un cambio y por defecto modifica las sesiones desde hoy."""
+        if not data['days'] and 'appointment_hour' not in data and 'therapist' not in data:
+            raise serializers.ValidationError("Indique days, appointment_hour o therapist")
+        data.setdefault('from_date', localtime().date())
+        return data
+
+
 class TherapistAppointmentSerializer(serializers.Serializer):
     """Serializa datos de citas por terapeuta."""
     
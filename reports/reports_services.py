@@ -1,111 +1,184 @@
-from datetime import datetime
-from django.utils.timezone import localtime
-from django.db.models import Count, Q, Sum
-from .models import Appointment, Therapist, Patient
-from django.db import models
+from django.db.models import Count, Exists, Max, OuterRef, Q, Sum
+from .models import Appointment, Therapist, DailyReportRollup
+from .pagination import decode_cursor, encode_cursor, keyset_filter
+from .timeseries_services import DailySeriesService
+from asgiref.sync import sync_to_async
+from django.db import router
+from multitenant.routers import primary_database, streaming_database
+
+def format_appointment_row(row):
+    """Formatea una fila de `values()` de citas con el formato del reporte."""
+    patient_name = " ".join(filter(None, [
+        row["patient__paternal_lastname"],
+        row["patient__maternal_lastname"],
+        row["patient__name"]
+    ]))
+    hour = row["appointment_hour"]
+    
+    return {
+        "appointment_id": row["id"],
+        "patient_id": row["patient_id"],
+        "document_number_patient": row["patient__document_number"],
+        "patient": patient_name,
+        "primary_phone_patient": row["patient__primary_phone"],
+        "appointment_date": row["appointment_date"].strftime("%Y-%m-%d"),
+        "appointment_hour": hour if isinstance(hour, str) else hour.strftime("%H:%M")
+    }
+
 
 class ReportService:
     """Responsable exclusivamente de consultas de base de datos para reportes."""
+
+    def __init__(self, tenant, using=None):
+        # Todas las consultas se limitan al tenant activo
+        self.tenant = tenant
+        # La base se fija al crear el servicio (shard del tenant o su réplica),
+        # así las exportaciones en streaming leen de la misma base aunque se
+        # consuman después de salir de la vista.
+        self.using = using or router.db_for_read(Appointment, instance=tenant) or 'default'
+    
+    def on_primary(self):
+        """El mismo servicio leyendo de la base principal (si este lee de una réplica)."""
+        primary = primary_database(self.using)
+        return self if primary == self.using else ReportService(self.tenant, using=primary)
     
     def get_appointments_count_by_therapist(self, validated_data):
         """Obtiene el conteo de citas por terapeuta para una fecha dada."""
+        therapists = list(self.appointments_count_by_therapist_queryset(validated_data))
+        return self.build_appointments_count_by_therapist(therapists)
+    
+    async def aget_appointments_count_by_therapist(self, validated_data):
+        """Versión async (ORM async) de get_appointments_count_by_therapist."""
+        therapists = [row async for row in self.appointments_count_by_therapist_queryset(validated_data)]
+        return self.build_appointments_count_by_therapist(therapists)
+    
+    def appointments_count_by_therapist_queryset(self, validated_data):
+        """Terapeutas del día con la cantidad de citas, leída desde el resumen diario."""
         query_date = validated_data.get("date")
         
-        # Consultar terapeutas con la cantidad de citas
-        therapists = (
-            Therapist.objects
-            .annotate(
-                appointments_count=Count(
-                    "appointment",
-                    filter=Q(appointment__appointment_date=query_date)
-                )
+        # Consultar terapeutas con la cantidad de citas desde el resumen diario
+        return (
+            Therapist.objects.using(self.using)
+            .filter(
+                tenant=self.tenant,
+                daily_rollups__tenant=self.tenant,
+                daily_rollups__date=query_date
             )
+            .annotate(appointments_count=Sum("daily_rollups__appointments_count"))
             .filter(appointments_count__gt=0)
             .values("id", "first_name", "last_name_paternal", "last_name_maternal", "appointments_count")
+            # Mismo orden que el dashboard
+            .order_by("id")
         )
-        
+    
+    @staticmethod
+    def build_appointments_count_by_therapist(therapists):
         # Sumar el total de citas
         total_appointments = sum(t["appointments_count"] for t in therapists)
         
         return {
-            "therapists_appointments": list(therapists),
+            "therapists_appointments": therapists,
             "total_appointments_count": total_appointments
         }
     
     def get_patients_by_therapist(self, validated_data):
-        """Obtiene pacientes agrupados por terapeuta para una fecha dada."""
+        """
+        Obtiene pacientes agrupados por terapeuta para una fecha dada.
+        El conteo de citas se agrupa en la base de datos por (terapeuta, paciente)
+        y solo se leen las columnas necesarias.
+        """
+        return self.build_patients_by_therapist(self.patients_by_therapist_queryset(validated_data))
+    
+    async def aget_patients_by_therapist(self, validated_data):
+        """Versión async (ORM async) de get_patients_by_therapist."""
+        rows = [row async for row in self.patients_by_therapist_queryset(validated_data)]
+        return self.build_patients_by_therapist(rows)
+    
+    def patients_by_therapist_queryset(self, validated_data):
+        """Citas del día agrupadas por terapeuta y paciente."""
         query_date = validated_data.get("date")
         
-        # Consultar citas para la fecha
-        appointments = (
-            Appointment.objects
-            .select_related("patient", "therapist")
+        # Consultar citas del día agrupadas por terapeuta y paciente
+        return (
+            Appointment.objects.using(self.using)
             .filter(
+                tenant=self.tenant,
                 appointment_date=query_date
             )
+            .values(
+                "therapist_id",
+                "therapist__first_name",
+                "therapist__last_name_paternal",
+                "therapist__last_name_maternal",
+                "patient_id",
+                "patient__name",
+                "patient__paternal_lastname",
+                "patient__maternal_lastname"
+            )
+            .annotate(appointments=Count("id"), latest_hour=Max("appointment_hour"))
+            # Mismo orden que al recorrer las citas de la más tardía a la más temprana:
+            # cada terapeuta y cada paciente aparecen por su última cita del día
+            .order_by("-latest_hour", "therapist_id", "patient_id")
         )
-        
-        # Procesar datos
+    
+    @staticmethod
+    def build_patients_by_therapist(rows):
+        # Procesar datos (una fila por terapeuta y paciente)
         report = {}
         sin_terapeuta = {
             "therapist_id": "",
             "therapist": "Sin terapeuta asignado",
-            "patients": {}
+            "patients": []
         }
         
-        for appointment in appointments:
-            patient = appointment.patient
-            therapist = appointment.therapist
-            
-            if not patient:
+        for row in rows:
+            if row["patient_id"] is None:
                 continue
             
             patient_data = {
-                "patient_id": patient.id,
-                "patient": f"{patient.paternal_lastname} {patient.maternal_lastname or ''} {patient.name}".strip(),
-                "appointments": 1
+                "patient_id": row["patient_id"],
+                "patient": f"{row['patient__paternal_lastname']} {row['patient__maternal_lastname'] or ''} {row['patient__name']}".strip(),
+                "appointments": row["appointments"]
             }
             
-            if not therapist:
+            t_id = row["therapist_id"]
+            if t_id is None:
                 # Paciente sin terapeuta
-                key = patient.id
-                if key not in sin_terapeuta["patients"]:
-                    sin_terapeuta["patients"][key] = patient_data
-                else:
-                    sin_terapeuta["patients"][key]["appointments"] += 1
-            else:
-                # Paciente con terapeuta
-                t_id = therapist.id
-                if t_id not in report:
-                    report[t_id] = {
-                        "therapist_id": t_id,
-                        "therapist": f"{therapist.last_name_paternal} {therapist.last_name_maternal or ''} {therapist.first_name}".strip(),
-                        "patients": {}
-                    }
-                key = patient.id
-                if key not in report[t_id]["patients"]:
-                    report[t_id]["patients"][key] = patient_data
-                else:
-                    report[t_id]["patients"][key]["appointments"] += 1
+                sin_terapeuta["patients"].append(patient_data)
+                continue
+            
+            # Paciente con terapeuta
+            if t_id not in report:
+                report[t_id] = {
+                    "therapist_id": t_id,
+                    "therapist": f"{row['therapist__last_name_paternal']} {row['therapist__last_name_maternal'] or ''} {row['therapist__first_name']}".strip(),
+                    "patients": []
+                }
+            report[t_id]["patients"].append(patient_data)
         
         # Agregar pacientes sin terapeuta si existen
         if sin_terapeuta["patients"]:
             report["sinTherapist"] = sin_terapeuta
         
-        # Convertir diccionarios a listas
-        for therapist_id in report:
-            report[therapist_id]["patients"] = list(report[therapist_id]["patients"].values())
-        
         return list(report.values())
     
     def get_daily_cash(self, validated_data):
         """Obtiene el resumen diario de efectivo detallado por cita."""
+        return self.build_daily_cash(self.daily_cash_queryset(validated_data))
+    
+    async def aget_daily_cash(self, validated_data):
+        """Versión async (ORM async) de get_daily_cash."""
+        return self.build_daily_cash([row async for row in self.daily_cash_queryset(validated_data)])
+    
+    def daily_cash_queryset(self, validated_data):
+        """Pagos del día, uno por cita."""
         query_date = validated_data.get("date")
         
         # Consultar pagos del día
-        payments = (
-            Appointment.objects
+        return (
+            Appointment.objects.using(self.using)
             .filter(
+                tenant=self.tenant,
                 appointment_date=query_date,
                 payment__isnull=False,
                 payment_type__isnull=False
@@ -118,7 +191,9 @@ class ReportService:
             )
             .order_by('-id')  # Ordenar por id descendente para tener las más recientes primero
         )
-        
+    
+    @staticmethod
+    def build_daily_cash(payments):
         # Formatear resultado
         result = [
             {
@@ -132,42 +207,361 @@ class ReportService:
         
         return result
     
+    def get_daily_dashboard(self, validated_data):
+        """
+        Obtiene en una sola consulta los tres reportes del día: citas por
+        terapeuta, caja diaria y pacientes por terapeuta. Se recorren las
+        citas del día una sola vez (una única sentencia SELECT, que ya es una
+        lectura consistente) y se agrupan en memoria.
+        """
+        return self.build_daily_dashboard(self.daily_dashboard_queryset(validated_data))
+    
+    async def aget_daily_dashboard(self, validated_data):
+        """Versión async (ORM async) de get_daily_dashboard."""
+        return self.build_daily_dashboard([row async for row in self.daily_dashboard_queryset(validated_data)])
+    
+    def daily_dashboard_queryset(self, validated_data):
+        """Citas del día con las columnas de los tres reportes diarios."""
+        query_date = validated_data.get("date")
+        
+        return (
+            Appointment.objects.using(self.using)
+            .filter(tenant=self.tenant, appointment_date=query_date)
+            .order_by("-id")
+            .values(
+                "id",
+                "appointment_hour",
+                "payment",
+                "payment_type_id",
+                "payment_type__name",
+                "therapist_id",
+                "therapist__first_name",
+                "therapist__last_name_paternal",
+                "therapist__last_name_maternal",
+                "patient_id",
+                "patient__name",
+                "patient__paternal_lastname",
+                "patient__maternal_lastname"
+            )
+        )
+    
+    @staticmethod
+    def build_daily_dashboard(appointments):
+        therapists = {}
+        patients_report = {}
+        daily_cash = []
+        # Última hora de cada terapeuta y de cada (terapeuta, paciente), para ordenar como get_patients_by_therapist
+        latest = {}
+        for row in appointments:
+            t_id = row["therapist_id"]
+            
+            # Citas por terapeuta
+            if t_id not in therapists:
+                therapists[t_id] = {
+                    "id": t_id,
+                    "first_name": row["therapist__first_name"],
+                    "last_name_paternal": row["therapist__last_name_paternal"],
+                    "last_name_maternal": row["therapist__last_name_maternal"],
+                    "appointments_count": 0
+                }
+            therapists[t_id]["appointments_count"] += 1
+            
+            # Caja diaria
+            if row["payment"] is not None and row["payment_type_id"] is not None:
+                daily_cash.append({
+                    "id_cita": row["id"],
+                    "payment": row["payment"],
+                    "payment_type": row["payment_type_id"],
+                    "payment_type_name": row["payment_type__name"]
+                })
+            
+            # Pacientes por terapeuta
+            if t_id not in patients_report:
+                patients_report[t_id] = {
+                    "therapist_id": t_id,
+                    "therapist": f"{row['therapist__last_name_paternal']} {row['therapist__last_name_maternal'] or ''} {row['therapist__first_name']}".strip(),
+                    "patients": {}
+                }
+            therapist_patients = patients_report[t_id]["patients"]
+            p_id = row["patient_id"]
+            if p_id not in therapist_patients:
+                therapist_patients[p_id] = {
+                    "patient_id": p_id,
+                    "patient": f"{row['patient__paternal_lastname']} {row['patient__maternal_lastname'] or ''} {row['patient__name']}".strip(),
+                    "appointments": 0
+                }
+            therapist_patients[p_id]["appointments"] += 1
+            for key in (t_id, (t_id, p_id)):
+                latest[key] = max(latest.get(key, row["appointment_hour"]), row["appointment_hour"])
+        
+        # Mismo orden que get_patients_by_therapist: por la última cita (y luego por id)
+        patients_by_therapist = sorted(patients_report.values(), key=lambda g: g["therapist_id"])
+        patients_by_therapist.sort(key=lambda g: latest[g["therapist_id"]], reverse=True)
+        for group in patients_by_therapist:
+            group["patients"] = sorted(
+                group["patients"].values(),
+                key=lambda p: latest[(group["therapist_id"], p["patient_id"])],
+                reverse=True
+            )
+        
+        therapists_appointments = sorted(therapists.values(), key=lambda t: t["id"])
+        return {
+            "appointments_per_therapist": {
+                "therapists_appointments": therapists_appointments,
+                "total_appointments_count": sum(t["appointments_count"] for t in therapists_appointments)
+            },
+            "daily_cash": daily_cash,
+            "patients_by_therapist": patients_by_therapist
+        }
+    
+    def get_daily_cash_summary(self, validated_data):
+        """Obtiene el total de caja del día agrupado por tipo de pago desde el resumen diario."""
+        return self.build_daily_cash_summary(self.daily_cash_summary_queryset(validated_data))
+    
+    async def aget_daily_cash_summary(self, validated_data):
+        """Versión async (ORM async) de get_daily_cash_summary."""
+        return self.build_daily_cash_summary([row async for row in self.daily_cash_summary_queryset(validated_data)])
+    
+    def daily_cash_summary_queryset(self, validated_data):
+        """Totales del día por tipo de pago desde el resumen diario."""
+        query_date = validated_data.get("date")
+
+        return (
+            DailyReportRollup.objects.using(self.using)
+            .filter(
+                tenant=self.tenant,
+                date=query_date,
+                payment_type__isnull=False,
+                payments_count__gt=0
+            )
+            .values('payment_type', 'payment_type__name')
+            .annotate(
+                total=Sum('payment_total'),
+                count=Sum('payments_count')
+            )
+            .order_by('payment_type__name')
+        )
+    
+    @staticmethod
+    def build_daily_cash_summary(summary):
+        return [
+            {
+                "payment_type": row['payment_type'],
+                "payment_type_name": row['payment_type__name'],
+                "payment": row['total'],
+                "appointment_count": row['count']
+            }
+            for row in summary
+        ]
+    
     def get_appointments_between_dates(self, validated_data):
         """Obtiene citas entre dos fechas dadas."""
+        return list(self.iter_appointments_between_dates(validated_data))
+    
+    def get_appointments_between_dates_queryset(self, validated_data):
+        """Consulta de citas entre dos fechas con solo las columnas del reporte."""
         start_date = validated_data.get("start_date")
         end_date = validated_data.get("end_date")
         
-        # Consultar citas
-        appointments = (
-            Appointment.objects
-            .select_related("patient", "therapist")
+        return (
+            Appointment.objects.using(self.using)
             .filter(
+                tenant=self.tenant,
                 appointment_date__gte=start_date,
                 appointment_date__lte=end_date
             )
-            .order_by("appointment_date", "appointment_hour")
+            .order_by("appointment_date", "appointment_hour", "id")
+            .values(
+                "id",
+                "appointment_date",
+                "appointment_hour",
+                "patient_id",
+                "patient__document_number",
+                "patient__paternal_lastname",
+                "patient__maternal_lastname",
+                "patient__name",
+                "patient__primary_phone"
+            )
         )
+    
+    def iter_appointments_between_dates(self, validated_data, chunk_size=2000):
+        """
+        Recorre las citas entre dos fechas por bloques, sin cargar todo el
+        resultado en memoria. Útil para exportaciones de rangos grandes.
+        Lee de la conexión de streaming de la base (DATABASE_STREAMING): en
+        MySQL usa un cursor sin buffer, así la primera fila llega enseguida.
+        """
+        appointments = self.get_appointments_between_dates_queryset(validated_data)
+        for row in appointments.using(streaming_database(self.using)).iterator(chunk_size=chunk_size):
+            yield format_appointment_row(row)
+    
+    async def aiter_appointments_between_dates(self, validated_data, chunk_size=2000):
+        """Versión async de iter_appointments_between_dates (usa aiterator)."""
+        appointments = self.get_appointments_between_dates_queryset(validated_data)
+        async for row in appointments.using(streaming_database(self.using)).aiterator(chunk_size=chunk_size):
+            yield format_appointment_row(row)
+    
+    def get_appointments_page(self, validated_data, cursor=None, page_size=100):
+        """
+        Obtiene una página de citas entre dos fechas usando paginación por
+        cursor (keyset) sobre (appointment_date, appointment_hour, id).
+        Cada página cuesta lo mismo sin importar el tamaño del rango.
+        """
+        appointments, reverse = self.appointments_page_queryset(validated_data, cursor, page_size)
+        return self.build_appointments_page(list(appointments), cursor, reverse, page_size)
+    
+    async def aget_appointments_page(self, validated_data, cursor=None, page_size=100):
+        """Versión async (ORM async) de get_appointments_page."""
+        appointments, reverse = self.appointments_page_queryset(validated_data, cursor, page_size)
+        rows = [row async for row in appointments]
+        return self.build_appointments_page(rows, cursor, reverse, page_size)
+    
+    def appointments_page_queryset(self, validated_data, cursor, page_size):
+        """Consulta de una página (con una fila extra) y si se recorre hacia atrás."""
+        appointments = self.get_appointments_between_dates_queryset(validated_data)
+        reverse = False
+        if cursor:
+            day, hour, pk, reverse = decode_cursor(cursor)
+            appointments = appointments.filter(keyset_filter(day, hour, pk, reverse))
+        if reverse:
+            appointments = appointments.reverse()
         
-        # Formatear resultado
-        result = []
-        for app in appointments:
-            if not app.patient:
-                continue
-                
-            patient_name = " ".join(filter(None, [
-                app.patient.paternal_lastname,
-                app.patient.maternal_lastname,
-                app.patient.name
-            ]))
-            
-            result.append({
-                "appointment_id": app.id,
-                "patient_id": app.patient.id,
-                "document_number_patient": app.patient.document_number,
-                "patient": patient_name,
-                "primary_phone_patient": app.patient.primary_phone,
-                "appointment_date": app.appointment_date.strftime("%Y-%m-%d"),
-                "appointment_hour": app.appointment_hour if isinstance(app.appointment_hour, str) else app.appointment_hour.strftime("%H:%M")
-            })
-        
-        return result
\ No newline at end of file
+        # Se pide una fila extra para saber si hay más páginas en esa dirección
+        return appointments[:page_size + 1], reverse
+    
+    @staticmethod
+    def build_appointments_page(rows, cursor, reverse, page_size):
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+        
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else bool(cursor)
+        
+        return {
+            "results": [format_appointment_row(row) for row in rows],
+            "next": encode_cursor(rows[-1]) if rows and has_next else None,
+            "previous": encode_cursor(rows[0], reverse=True) if rows and has_previous else None
+        }
+    
+    def get_statistics(self, validated_data):
+        """
+        Obtiene las estadísticas del rango de fechas con un número fijo de
+        consultas agrupadas (por terapeuta, por tipo de pago y de pacientes)
+        más la serie diaria, que solo consulta los meses no cacheados.
+        """
+        per_therapist, per_payment_type, patients = self.statistics_querysets(validated_data)
+        return self.build_statistics(
+            self.get_daily_series(validated_data),
+            list(per_therapist),
+            list(per_payment_type),
+            patients.aggregate(**self.patient_counts())
+        )
+    
+    async def aget_statistics(self, validated_data):
+        """Versión async (ORM async) de get_statistics."""
+        per_therapist, per_payment_type, patients = self.statistics_querysets(validated_data)
+        return self.build_statistics(
+            await sync_to_async(self.get_daily_series)(validated_data),
+            [row async for row in per_therapist],
+            [row async for row in per_payment_type],
+            await patients.aaggregate(**self.patient_counts())
+        )
+    
+    def get_daily_series(self, validated_data):
+        """Sesiones e ingresos de cada día del rango, con ceros (ver DailySeriesService)."""
+        return DailySeriesService(self.tenant, using=self.using).get_daily_series(
+            validated_data.get("start"),
+            validated_data.get("end")
+        )
+    
+    def statistics_querysets(self, validated_data):
+        """
+        Las consultas de las estadísticas. La de pacientes se agrega con
+        patient_counts() (aggregate o aaggregate según el caso).
+        """
+        start = validated_data.get("start")
+        end = validated_data.get("end")
+        
+        appointments = Appointment.objects.using(self.using).filter(
+            tenant=self.tenant,
+            appointment_date__gte=start,
+            appointment_date__lte=end
+        ).order_by()
+        
+        # 1. Sesiones e ingresos por terapeuta
+        per_therapist = (
+            appointments
+            .values(
+                "therapist_id",
+                "therapist__first_name",
+                "therapist__last_name_paternal",
+                "therapist__last_name_maternal"
+            )
+            .annotate(sesiones=Count("id"), ingresos=Sum("payment"))
+            .order_by("-sesiones", "therapist_id")
+        )
+        
+        # 2. Citas pagadas por tipo de pago
+        per_payment_type = (
+            appointments
+            .filter(payment_type__isnull=False)
+            .values("payment_type__name")
+            .annotate(total=Count("id"))
+            .order_by("payment_type__name")
+        )
+        
+        # 3. Pacientes atendidos: nuevos (sin citas previas al rango) y continuadores
+        previous_appointments = Appointment.objects.using(self.using).filter(
+            tenant=self.tenant,
+            patient=OuterRef("patient"),
+            appointment_date__lt=start
+        )
+        patients = appointments.annotate(is_returning=Exists(previous_appointments))
+        return per_therapist, per_payment_type, patients
+    
+    @staticmethod
+    def patient_counts():
+        """Conteos de pacientes distintos: total, nuevos y continuadores."""
+        return {
+            "total": Count("patient", distinct=True),
+            "nuevos": Count("patient", distinct=True, filter=Q(is_returning=False)),
+            "continuadores": Count("patient", distinct=True, filter=Q(is_returning=True))
+        }
+    
+    @staticmethod
+    def build_statistics(series, per_therapist, per_payment_type, patients):
+        ingresos = series["ingresos"]
+        sesiones = series["sesiones"]
+        
+        terapeutas = [
+            {
+                "id": row["therapist_id"],
+                "terapeuta": " ".join(filter(None, [
+                    row["therapist__first_name"],
+                    row["therapist__last_name_paternal"],
+                    row["therapist__last_name_maternal"]
+                ])),
+                "sesiones": row["sesiones"],
+                "ingresos": float(row["ingresos"] or 0)
+            }
+            for row in per_therapist
+        ]
+        tipos_pago = {row["payment_type__name"]: row["total"] for row in per_payment_type}
+        
+        return {
+            "metricas": {
+                "ttlpacientes": patients["total"],
+                "ttlsesiones": sum(sesiones.values()),
+                "ttlganancias": sum(ingresos.values())
+            },
+            "terapeutas": terapeutas,
+            "ingresos": ingresos,
+            "sesiones": sesiones,
+            "tipos_pago": tipos_pago,
+            "tipos_pacientes": {
+                "Nuevos": patients["nuevos"],
+                "Continuadores": patients["continuadores"]
+            }
+        }
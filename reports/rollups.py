@@ -0,0 +1,184 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from multitenant.routers import tenant_database, tenant_id_database
+
+from .models import Appointment, DailyReportRollup
+
+
+ROLLUP_BATCH_SIZE = 1000
+
+# Campos de Appointment que determinan su aporte al resumen diario
+ROLLUP_FIELDS = {'tenant_id', 'appointment_date', 'therapist_id', 'payment_type_id', 'payment'}
+
+
+def rollup_key(appointment):
+    """Clave del resumen diario al que pertenece una cita."""
+    return (
+        appointment.tenant_id,
+        appointment.appointment_date,
+        appointment.therapist_id,
+        appointment.payment_type_id,
+    )
+
+
+def rollup_state(appointment):
+    """Estado de la cita relevante para el resumen: (clave, pago)."""
+    return rollup_key(appointment), appointment.payment
+
+
+def apply_delta(key, appointments, payments, amount):
+    """
+    Suma (o resta) los valores dados a la fila del resumen indicada por `key`.
+    Crea la fila si no existe y el delta es positivo. Si otra escritura la
+    crea al mismo tiempo, la restricción única lo detecta y se vuelve a
+    aplicar el delta como actualización.
+    """
+    tenant_id, date, therapist_id, payment_type_id = key
+    if date is None or therapist_id is None:
+        return
+
+    using = tenant_id_database(tenant_id)
+    rows = DailyReportRollup.objects.using(using).filter(
+        tenant_id=tenant_id,
+        date=date,
+        therapist_id=therapist_id,
+        payment_type_id=payment_type_id,
+    )
+    changes = {
+        'appointments_count': F('appointments_count') + appointments,
+        'payments_count': F('payments_count') + payments,
+        'payment_total': F('payment_total') + amount,
+    }
+    if rows.update(**changes) or appointments <= 0:
+        return
+    try:
+        # Punto de guardado: un choque con la restricción no invalida la transacción externa
+        with transaction.atomic(using=using):
+            DailyReportRollup.objects.using(using).create(
+                tenant_id=tenant_id,
+                date=date,
+                therapist_id=therapist_id,
+                payment_type_id=payment_type_id,
+                appointments_count=appointments,
+                payments_count=payments,
+                payment_total=amount,
+            )
+    except IntegrityError:
+        rows.update(**changes)
+
+
+def add_appointment(key, payment):
+    apply_delta(key, 1, 1 if payment is not None else 0, payment or Decimal('0'))
+
+
+def remove_appointment(key, payment):
+    apply_delta(key, -1, -1 if payment is not None else 0, -(payment or Decimal('0')))
+
+
+def add_appointments(appointments, sign=1):
+    """
+    Suma (sign=1) o resta (sign=-1) al resumen un conjunto de citas creadas o
+    modificadas en bloque (bulk_create/update no disparan señales): una
+    actualización por fila existente del resumen y un bulk_create para las
+    filas nuevas, en lugar de una operación por cita.
+    """
+    deltas = {}
+    for appointment in appointments:
+        key, payment = rollup_state(appointment)
+        if key[1] is None or key[2] is None:
+            continue
+        count, payments, amount = deltas.get(key, (0, 0, Decimal('0')))
+        deltas[key] = (count + 1, payments + (payment is not None), amount + (payment or Decimal('0')))
+    if not deltas:
+        return
+
+    tenant_ids = {key[0] for key in deltas}
+    for tenant_id in tenant_ids:
+        keys = [key for key in deltas if key[0] == tenant_id]
+        using = tenant_id_database(tenant_id)
+        existing = set(
+            DailyReportRollup.objects.using(using)
+            .filter(
+                tenant_id=tenant_id,
+                date__in={key[1] for key in keys},
+                therapist_id__in={key[2] for key in keys},
+            )
+            .values_list('tenant_id', 'date', 'therapist_id', 'payment_type_id')
+        )
+        new_rows = []
+        for key in keys:
+            count, payments, amount = deltas[key]
+            if key in existing:
+                apply_delta(key, sign * count, sign * payments, sign * amount)
+            elif sign > 0:
+                new_rows.append(DailyReportRollup(
+                    tenant_id=key[0],
+                    date=key[1],
+                    therapist_id=key[2],
+                    payment_type_id=key[3],
+                    appointments_count=count,
+                    payments_count=payments,
+                    payment_total=amount,
+                ))
+        try:
+            with transaction.atomic(using=using):
+                DailyReportRollup.objects.using(using).bulk_create(new_rows, batch_size=ROLLUP_BATCH_SIZE)
+        except IntegrityError:
+            # Otra escritura creó alguna de las filas mientras tanto: aplicarlas una por una
+            for row in new_rows:
+                apply_delta(
+                    (row.tenant_id, row.date, row.therapist_id, row.payment_type_id),
+                    row.appointments_count, row.payments_count, row.payment_total
+                )
+
+
+def rebuild_rollups(tenant=None, using=None):
+    """
+    Reconstruye el resumen diario desde cero a partir de las citas.
+    Si se indica un tenant, solo se reconstruyen sus filas (en su shard);
+    si no, se reconstruyen todas las filas de la base `using`.
+    Devuelve la cantidad de filas creadas.
+    """
+    using = tenant_database(tenant) or using or 'default'
+    appointments = Appointment.objects.using(using)
+    rollups = DailyReportRollup.objects.using(using)
+    if tenant is not None:
+        appointments = appointments.filter(tenant=tenant)
+        rollups = rollups.filter(tenant=tenant)
+
+    aggregates = (
+        appointments
+        .order_by()
+        .values('tenant_id', 'appointment_date', 'therapist_id', 'payment_type_id')
+        .annotate(
+            appointments_count=Count('id'),
+            payments_count=Count('payment'),
+            payment_total=Sum('payment'),
+        )
+    )
+
+    created = 0
+    with transaction.atomic(using=using):
+        rollups.delete()
+        batch = []
+        for row in aggregates.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+            batch.append(DailyReportRollup(
+                tenant_id=row['tenant_id'],
+                date=row['appointment_date'],
+                therapist_id=row['therapist_id'],
+                payment_type_id=row['payment_type_id'],
+                appointments_count=row['appointments_count'],
+                payments_count=row['payments_count'],
+                payment_total=row['payment_total'] or Decimal('0'),
+            ))
+            if len(batch) >= ROLLUP_BATCH_SIZE:
+                DailyReportRollup.objects.using(using).bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            DailyReportRollup.objects.using(using).bulk_create(batch)
+            created += len(batch)
+    return created
@@ -0,0 +1,22 @@
+import re
+import unicodedata
+
+
+SEARCH_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize_search(text):
+    """
+    Normaliza un texto para búsqueda: minúsculas, sin tildes ni signos.
+    'Núñez-Pérez ' -> 'nunez perez'
+    """
+    if not text:
+        return ''
+    folded = unicodedata.normalize('NFKD', str(text))
+    folded = ''.join(char for char in folded if not unicodedata.combining(char)).lower()
+    return ' '.join(SEARCH_TOKEN_RE.findall(folded))
+
+
+def search_tokens(text, max_tokens=4):
+    """Palabras normalizadas de una búsqueda (se ignoran las que sobran)."""
+    return normalize_search(text).split()[:max_tokens]
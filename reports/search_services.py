@@ -0,0 +1,91 @@
+from django.db import router
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Patient
+from .search import search_tokens
+
+
+class PatientSearchService:
+    """Búsqueda de pacientes del tenant por documento y nombre (prefijos indexados)."""
+
+    # Campos normalizados donde se busca cada palabra
+    NAME_FIELDS = ('search_paternal_lastname', 'search_maternal_lastname', 'search_name')
+
+    def __init__(self, tenant, using=None):
+        self.tenant = tenant
+        self.using = using or router.db_for_read(Patient, instance=tenant) or 'default'
+
+    # Orden del resultado; también el de cada consulta por columna
+    ORDERING = ('-rank', 'search_paternal_lastname', 'search_maternal_lastname', 'search_name', 'id')
+
+    # Columnas devueltas
+    FIELDS = ('id', 'document_number', 'name', 'paternal_lastname', 'maternal_lastname', 'primary_phone')
+
+    def search(self, query, limit=20):
+        """
+        Busca pacientes cuyo documento empiece por `query` o en los que cada
+        palabra de `query` sea prefijo del nombre o de algún apellido.
+        Orden: documento exacto, documento por prefijo, apellido paterno
+        exacto, apellido paterno por prefijo y luego alfabético.
+
+        Cada columna se consulta por separado con un prefijo (LIKE 'x%') sobre
+        su índice (tenant, columna): un OR entre columnas impide usar los
+        índices. Las columnas se comparan ya normalizadas (minúsculas, sin
+        tildes), por eso se usa startswith y no istartswith. Cada consulta
+        trae sus primeros `limit` según el orden final y los resultados se
+        combinan en Python; las del apellido materno y el nombre (los de
+        menor relevancia) se omiten si ya hay `limit` resultados mejores.
+        """
+        document = query.strip()
+        if not document:
+            return []
+        tokens = search_tokens(query)
+        rank = self.rank(document, tokens)
+
+        found = {}
+        lookups = [Q(document_number__startswith=document)]
+        if tokens:
+            lookups.append(Q(search_paternal_lastname__startswith=tokens[0]))
+        for lookup in lookups:
+            found.update(self.run(lookup, tokens[1:], rank, limit))
+        if tokens and sum(row['rank'] > 0 for row in found.values()) < limit:
+            for field in ('search_maternal_lastname', 'search_name'):
+                found.update(self.run(Q(**{f'{field}__startswith': tokens[0]}), tokens[1:], rank, limit))
+
+        rows = sorted(found.values(), key=lambda row: (
+            -row['rank'], row['search_paternal_lastname'], row['search_maternal_lastname'], row['search_name'], row['id']
+        ))[:limit]
+        return [{field: row[field] for field in self.FIELDS + ('rank',)} for row in rows]
+
+    @staticmethod
+    def rank(document, tokens):
+        """Relevancia de un paciente (la misma expresión en todas las consultas)."""
+        whens = [
+            When(document_number=document, then=Value(4)),
+            When(document_number__startswith=document, then=Value(3)),
+        ]
+        if tokens:
+            whens += [
+                When(search_paternal_lastname=tokens[0], then=Value(2)),
+                When(search_paternal_lastname__startswith=tokens[0], then=Value(1)),
+            ]
+        return Case(*whens, default=Value(0), output_field=IntegerField())
+
+    def run(self, lookup, other_tokens, rank, limit):
+        """
+        Primeros `limit` pacientes que cumplen `lookup` (un prefijo sobre una
+        columna con índice) y en los que cada una de `other_tokens` es prefijo
+        de alguna columna del nombre. Devuelve {id: fila}.
+        """
+        patients = Patient.objects.using(self.using).filter(lookup, tenant=self.tenant)
+        for token in other_tokens:
+            patients = patients.filter(
+                Q(*[Q(**{f'{field}__startswith': token}) for field in self.NAME_FIELDS], _connector=Q.OR)
+            )
+        rows = (
+            patients
+            .annotate(rank=rank)
+            .order_by(*self.ORDERING)
+            .values(*self.FIELDS, *self.NAME_FIELDS, 'rank')[:limit]
+        )
+        return {row['id']: row for row in rows}
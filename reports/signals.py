@@ -0,0 +1,109 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from multitenant.routers import primary_databases
+
+from .models import Appointment, Patient, PaymentType, Therapist
+from . import rollups
+from .report_cache import (
+    bump_appointment_date_versions,
+    bump_data_version,
+    bump_date_version,
+    bump_tenant_date_versions,
+)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_rollup_state(sender, instance, raw=False, **kwargs):
+    """
+    Lee de la base el estado original de la cita para calcular el delta al
+    guardar. Se hace al guardar y no en post_init, que agregaría trabajo a
+    cada cita cargada (exportaciones, listados del admin).
+    """
+    instance._rollup_state = None
+    if raw or instance._state.adding:
+        return
+    original = (
+        Appointment.objects.using(instance._state.db)
+        .filter(pk=instance.pk)
+        .values_list('tenant_id', 'appointment_date', 'therapist_id', 'payment_type_id', 'payment')
+        .first()
+    )
+    if original is not None:
+        *key, payment = original
+        instance._rollup_state = tuple(key), payment
+
+
+@receiver(post_save, sender=Appointment)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    """Actualiza el resumen diario de forma incremental al guardar una cita."""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_rollup_state', None)
+    current = rollups.rollup_state(instance)
+    if previous != current:
+        if previous is not None:
+            rollups.remove_appointment(*previous)
+        rollups.add_appointment(*current)
+    instance._rollup_state = current
+    bump_data_version(instance.tenant_id)
+    bump_date_version(instance.tenant_id, instance.appointment_date)
+    if previous is not None:
+        previous_tenant_id, previous_date = previous[0][:2]
+        if previous_tenant_id != instance.tenant_id:
+            bump_data_version(previous_tenant_id)
+        if (previous_tenant_id, previous_date) != (instance.tenant_id, instance.appointment_date):
+            bump_date_version(previous_tenant_id, previous_date)
+
+
+@receiver(post_delete, sender=Appointment)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Descuenta la cita eliminada del resumen diario."""
+    state = getattr(instance, '_rollup_state', None) or rollups.rollup_state(instance)
+    rollups.remove_appointment(*state)
+    bump_data_version(state[0][0])
+    bump_date_version(*state[0][:2])
+
+
+@receiver(post_delete, sender=PaymentType)
+def rebuild_rollup_on_payment_type_delete(sender, instance, **kwargs):
+    """
+    Al eliminar un tipo de pago las citas quedan sin tipo (SET_NULL) mediante
+    un UPDATE masivo sin señales, por eso se reconstruye el resumen del tenant
+    (o el de la base, si el tipo de pago es compartido).
+    """
+    rollups.rebuild_rollups(tenant=instance.tenant, using=instance._state.db)
+    bump_data_version(instance.tenant_id)
+    bump_tenant_date_versions(instance.tenant_id)
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+@receiver(post_save, sender=Therapist)
+@receiver(post_delete, sender=Therapist)
+@receiver(post_save, sender=PaymentType)
+@receiver(post_delete, sender=PaymentType)
+def invalidate_report_responses(sender, instance, **kwargs):
+    """Invalida las respuestas de reportes cacheadas del tenant."""
+    bump_data_version(instance.tenant_id)
+
+
+# Campo de la cita que apunta a cada modelo cuyos datos se muestran en los PDF
+APPOINTMENT_RELATIONS = {Patient: 'patient', Therapist: 'therapist', PaymentType: 'payment_type'}
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_save, sender=Therapist)
+@receiver(post_save, sender=PaymentType)
+def invalidate_appointment_dates(sender, instance, created, raw=False, **kwargs):
+    """
+    Los PDF muestran nombres de pacientes, terapeutas y tipos de pago: al
+    modificar uno se invalidan las fechas de sus citas. Un tipo de pago
+    compartido (sin tenant) puede estar en citas de cualquier base. Las
+    eliminaciones ya invalidan las fechas (cascada de citas o reconstrucción).
+    """
+    if raw or created:
+        return
+    aliases = primary_databases() if instance.tenant_id is None else [instance._state.db]
+    for alias in aliases:
+        bump_appointment_date_versions(alias, **{f'{APPOINTMENT_RELATIONS[sender]}_id': instance.pk})
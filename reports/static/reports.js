@@ -5,9 +5,12 @@ function downloadCashPDF() {
 async function loadReports() {
     const date = document.getElementById("date").value || new Date().toISOString().split("T")[0];
 
+    // Los tres reportes del día llegan en una sola petición
+    const res = await fetch(`/reports/daily-dashboard/?date=${date}`);
+    const dashboard = await res.json();
+
     // 1️⃣ Citas por terapeuta
-    const res1 = await fetch(`/reports/appointments-per-therapist/?date=${date}`);
-    const data1 = await res1.json();
+    const data1 = dashboard.appointments_per_therapist;
 
     const appointmentsTable = document.querySelector("#appointmentsTable tbody");
     appointmentsTable.innerHTML = "";
@@ -26,8 +29,7 @@ async function loadReports() {
     }
 
     // 2️⃣ Caja diaria
-    const res2 = await fetch(`/reports/daily-cash/?date=${date}`);
-    const data2 = await res2.json();
+    const data2 = dashboard.daily_cash;
 
     const cashTable = document.querySelector("#cashTable tbody");
     cashTable.innerHTML = "";
@@ -46,8 +48,7 @@ async function loadReports() {
     }
 
     // 3️⃣ Pacientes por terapeuta
-    const res3 = await fetch(`/reports/patients-by-therapist/?date=${date}`);
-    const data3 = await res3.json();
+    const data3 = dashboard.patients_by_therapist;
 
     const patientsDiv = document.getElementById("patientsByTherapist");
     patientsDiv.innerHTML = "";
@@ -70,8 +71,11 @@ async function loadReports() {
     }
 }
 
-// 4️⃣ Citas entre fechas
-async function loadAppointmentsBetweenDates() {
+// 4️⃣ Citas entre fechas (paginadas por cursor)
+let appointmentsNextCursor = null;
+let appointmentsPrevCursor = null;
+
+async function loadAppointmentsBetweenDates(cursor = null) {
     const startDate = document.getElementById("start_date").value;
     const endDate = document.getElementById("end_date").value;
 
@@ -80,15 +84,24 @@ async function loadAppointmentsBetweenDates() {
         return;
     }
 
-    const res = await fetch(`/reports/appointments-between-dates/?start_date=${startDate}&end_date=${endDate}`);
+    let url = `/reports/appointments-between-dates/?start_date=${startDate}&end_date=${endDate}`;
+    if (cursor) {
+        url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    const res = await fetch(url);
     const data = await res.json();
 
+    appointmentsNextCursor = data.next;
+    appointmentsPrevCursor = data.previous;
+    document.getElementById("appointmentsNextPage").disabled = !data.next;
+    document.getElementById("appointmentsPrevPage").disabled = !data.previous;
+
     const appointmentsBetweenTable = document.querySelector("#appointmentsBetweenTable tbody");
     appointmentsBetweenTable.innerHTML = "";
-    if (data.length === 0) {
+    if (data.results.length === 0) {
         appointmentsBetweenTable.innerHTML = `<tr><td colspan="6">Sin datos</td></tr>`;
     } else {
-        data.forEach(a => {
+        data.results.forEach(a => {
             appointmentsBetweenTable.innerHTML += `
                 <tr>
                     <td>${a.appointment_id}</td>
@@ -103,6 +116,18 @@ async function loadAppointmentsBetweenDates() {
     }
 }
 
+function loadNextAppointmentsPage() {
+    if (appointmentsNextCursor) {
+        loadAppointmentsBetweenDates(appointmentsNextCursor);
+    }
+}
+
+function loadPrevAppointmentsPage() {
+    if (appointmentsPrevCursor) {
+        loadAppointmentsBetweenDates(appointmentsPrevCursor);
+    }
+}
+
 // Exportar citas a Excel
 function exportAppointmentsExcel() {
     const startDate = document.getElementById("start_date").value;
@@ -0,0 +1,158 @@
+import csv
+import os
+import re
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import content_disposition_header
+
+from .blocking import run_blocking
+
+
+# Tamaño aproximado de cada bloque enviado al cliente
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+class _Echo:
+    """Objeto tipo archivo que devuelve lo escrito, para usar csv.writer en streaming."""
+
+    def write(self, value):
+        return value
+
+
+def _buffered(pieces):
+    """Agrupa fragmentos pequeños en bloques de ~STREAM_CHUNK_SIZE bytes."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= STREAM_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+async def _abuffered(pieces):
+    """Versión async de _buffered."""
+    buffer = []
+    size = 0
+    async for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= STREAM_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_csv(rows, fields):
+    """Genera el contenido CSV (con encabezado) de un iterador de diccionarios."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[field] for field in fields])
+
+
+async def aiter_csv(rows, fields):
+    """Versión async de iter_csv (para un iterador async de filas)."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    async for row in rows:
+        yield writer.writerow([row[field] for field in fields])
+
+
+def iter_ndjson(rows):
+    """Genera una línea JSON por cada diccionario del iterador."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+async def aiter_ndjson(rows):
+    """Versión async de iter_ndjson (para un iterador async de filas)."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    async for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def gzip_stream(chunks):
+    """Comprime al vuelo un iterador de bloques de bytes en formato gzip."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def agzip_stream(chunks):
+    """Versión async de gzip_stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_response(request, pieces, content_type, filename):
+    """
+    Construye un StreamingHttpResponse a partir de fragmentos de texto.
+    Si el cliente acepta gzip, el contenido se comprime al vuelo.
+    `pieces` puede ser un iterador normal o async (vistas async bajo ASGI).
+    """
+    is_async = hasattr(pieces, '__aiter__')
+    chunks = _abuffered(pieces) if is_async else _buffered(pieces)
+    compress = bool(_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+    if compress:
+        chunks = agzip_stream(chunks) if is_async else gzip_stream(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+async def aiter_file(file, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Lee un archivo por bloques en el pool de trabajo bloqueante y lo cierra
+    al terminar (o si el cliente se desconecta).
+    """
+    try:
+        while True:
+            chunk = await run_blocking(file.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await run_blocking(file.close)
+
+
+def async_file_response(file, filename, content_type):
+    """
+    Respuesta de descarga para vistas async. FileResponse lee de forma
+    síncrona los archivos y bajo ASGI Django los carga completos en memoria
+    antes de enviarlos; aquí el archivo se envía por bloques sin bloquear
+    el event loop.
+    """
+    start = file.tell()
+    size = file.seek(0, os.SEEK_END) - start
+    file.seek(start)
+
+    response = StreamingHttpResponse(aiter_file(file), content_type=content_type)
+    response['Content-Length'] = str(size)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
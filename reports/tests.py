@@ -1,3 +1,1052 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import time as time_module
+from datetime import date, time, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models.query import QuerySet
+from django.contrib.auth.models import AnonymousUser
+from django.db import router
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from multitenant.context import read_from_primary, read_from_replica, track_writes, use_tenant
+from multitenant.models import Tenant, User
+from multitenant.routers import TenantShardRouter, primary_databases, streaming_database
+from multitenant.tenant_cache import tenant_cache
+
+from . import booking_services, pdf_reports, rollups
+from .availability_services import free_slots
+from .fast_serializers import serialize_many
+from .booking_services import BookingService
+from .importers import TenantImporter, read_rows
+from .management.commands import run_report_worker
+from .report_jobs import claim_pending_jobs, requeue_stale_jobs, submit_job
+from .metrics import metrics_store, track_request
+from .xlsx_export import AppointmentWorkbook
+from .report_cache import bump_data_version, get_data_version, get_date_version, replica_is_current
+from .reports_services import ReportService
+from .search_services import PatientSearchService
+from .reports_serializers import (
+    AppointmentRangeSerializer,
+    DailyCashSerializer,
+    PatientByTherapistSerializer,
+    TherapistAppointmentSerializer,
+)
+from .views import get_report_service
+from .pdf_cache import PDFCache
+from .models import (
+    Appointment, DailyReportRollup, DocumentType, Patient, PaymentType, ReportDataVersion, ReportJob, Therapist
+)
+
+
+DAY = date(2025, 6, 2)
+
+
+class TenantDataMixin:
+    """Tenants, usuarios, pacientes, terapeutas y citas mínimos para las pruebas."""
+
+    numbers = count(10000000)
+
+    def setUp(self):
+        super().setUp()
+        # Las cachés del proceso sobreviven al rollback de cada prueba
+        cache.clear()
+        tenant_cache.clear()
+
+    def create_tenant(self, name, database='default'):
+        return Tenant.objects.create(name=name, domain=f'{name}.localhost', database=database)
+
+    def create_user(self, tenant, **extra):
+        return User.objects.create_user(username=f'user{next(self.numbers)}', password='x', tenant=tenant, **extra)
+
+    def document_type(self, tenant):
+        return DocumentType.objects.create(tenant=tenant, name='DNI')
+
+    def create_patient(self, tenant, name='Ana', paternal='Pérez', maternal='Gómez', **extra):
+        return Patient.objects.create(
+            tenant=tenant,
+            document_number=extra.pop('document_number', str(next(self.numbers))),
+            document_type=extra.pop('document_type', None) or self.document_type(tenant),
+            name=name,
+            paternal_lastname=paternal,
+            maternal_lastname=maternal,
+            sex='F',
+            primary_phone='999',
+            **extra
+        )
+
+    def create_therapist(self, tenant, first_name='Luis', last_name='Soto', **extra):
+        return Therapist.objects.create(
+            tenant=tenant,
+            document_number=str(next(self.numbers)),
+            document_type=extra.pop('document_type', None) or self.document_type(tenant),
+            first_name=first_name,
+            last_name_paternal=last_name,
+            gender='M',
+            phone='999',
+            **extra
+        )
+
+    def create_payment_type(self, tenant, name='Efectivo'):
+        return PaymentType.objects.create(tenant=tenant, name=name)
+
+    def create_appointment(self, tenant, patient, therapist, day=DAY, hour=time(9), payment=None, payment_type=None):
+        return Appointment.objects.create(
+            tenant=tenant,
+            patient=patient,
+            therapist=therapist,
+            appointment_date=day,
+            appointment_hour=hour,
+            payment=Decimal(payment) if payment is not None else None,
+            payment_type=payment_type,
+        )
+
+    def login(self, tenant, **extra):
+        user = self.create_user(tenant, **extra)
+        self.client.force_login(user)
+        return user
+
+    def create_clinic(self, login=False):
+        """Deja en self.tenant, self.patient y self.therapist una clínica mínima (y su usuario, con `login`)."""
+        self.tenant = self.create_tenant('clinica')
+        self.patient = self.create_patient(self.tenant)
+        self.therapist = self.create_therapist(self.tenant)
+        if login:
+            self.user = self.login(self.tenant)
+
+    def create_clinics(self, *names):
+        """Un tenant por nombre, cada uno con una cita."""
+        tenants = [self.create_tenant(name) for name in names]
+        for tenant in tenants:
+            self.create_appointment(tenant, self.create_patient(tenant), self.create_therapist(tenant))
+        return tenants
+
+
+class TenantScopeTests(TenantDataMixin, TestCase):
+    """Los reportes solo muestran datos del tenant de la petición; sin tenant responden 403 sin consultar la base."""
+
+    def setUp(self):
+        super().setUp()
+        self.clinic_a, self.clinic_b = self.create_clinics('clinica-a', 'clinica-b')
+
+    def test_reports_are_limited_to_user_tenant(self):
+        self.login(self.clinic_a)
+        response = self.client.get('/reports/appointments-per-therapist/', {'date': '2025-06-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_appointments_count'], 1)
+
+        rows = self.client.get('/reports/appointments-between-dates/', {
+            'start_date': '2025-06-01', 'end_date': '2025-06-30'
+        }).json()['results']
+        self.assertEqual({row['appointment_id'] for row in rows}, set(
+            Appointment.objects.filter(tenant=self.clinic_a).values_list('id', flat=True)
+        ))
+
+    def test_request_without_tenant_is_rejected_without_querying(self):
+        # Filas sin tenant: no deben verse desde una petición sin tenant
+        Appointment.objects.filter(tenant=self.clinic_b).update(tenant=None)
+        tenant_cache.get_by_domain('testserver')  # el dominio desconocido queda en caché
+        for path in (
+            '/reports/daily-dashboard/?date=2025-06-02',
+            '/api/company/reports/statistics/?start=2025-06-01&end=2025-06-30',
+            '/exports/csv/citas-rango/?start_date=2025-06-01&end_date=2025-06-30',
+            '/exports/pdf/resumen-caja/?date=2025-06-02',
+        ):
+            with self.assertNumQueries(0):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 403, path)
+
+    def test_unknown_domain_is_rejected(self):
+        response = self.client.get('/reports/daily-cash/?date=2025-06-02', HTTP_HOST='otra.localhost')
+        self.assertEqual(response.status_code, 403)
+
+    def test_domain_resolves_tenant_for_anonymous_requests(self):
+        response = self.client.get('/reports/daily-dashboard/?date=2025-06-02', HTTP_HOST='clinica-b.localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['appointments_per_therapist']['total_appointments_count'], 1)
+
+    async def test_async_views_reject_requests_without_tenant(self):
+        response = await self.async_client.get('/async/reports/daily-dashboard/?date=2025-06-02')
+        self.assertEqual(response.status_code, 403)
+
+
+class RollupTests(TenantDataMixin, TestCase):
+    """El resumen diario que se actualiza con cada cita coincide con el reconstruido desde cero."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic()
+        self.cash = self.create_payment_type(self.tenant)
+
+    def rollup_rows(self):
+        return set(
+            DailyReportRollup.objects.filter(tenant=self.tenant, appointments_count__gt=0)
+            .values_list('date', 'therapist_id', 'payment_type_id', 'appointments_count', 'payments_count', 'payment_total')
+        )
+
+    def assertRollupsMatchRebuild(self):
+        incremental = self.rollup_rows()
+        rollups.rebuild_rollups(tenant=self.tenant)
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_create_update_and_delete_keep_rollup_in_sync(self):
+        first = self.create_appointment(self.tenant, self.patient, self.therapist, payment='50', payment_type=self.cash)
+        second = self.create_appointment(self.tenant, self.patient, self.therapist, hour=time(10))
+        self.assertEqual(self.rollup_rows(), {
+            (DAY, self.therapist.pk, self.cash.pk, 1, 1, Decimal('50')),
+            (DAY, self.therapist.pk, None, 1, 0, Decimal('0')),
+        })
+
+        first.appointment_date = date(2025, 6, 3)
+        first.payment = Decimal('70')
+        first.save()
+        second.payment_type = self.cash
+        second.save()
+        self.assertRollupsMatchRebuild()
+
+        first.delete()
+        self.assertRollupsMatchRebuild()
+
+    def test_saving_an_instance_loaded_with_deferred_fields(self):
+        appointment = self.create_appointment(self.tenant, self.patient, self.therapist, payment='50', payment_type=self.cash)
+        loaded = Appointment.objects.only('id', 'payment').get(pk=appointment.pk)
+        loaded.payment = Decimal('80')
+        loaded.save()
+        self.assertEqual(self.rollup_rows(), {(DAY, self.therapist.pk, self.cash.pk, 1, 1, Decimal('80'))})
+
+    def test_rows_without_payment_type_are_unique(self):
+        key = (self.tenant.pk, DAY, self.therapist.pk, None)
+        rollups.add_appointment(key, None)
+        rollups.add_appointment(key, Decimal('20'))
+        self.assertEqual(self.rollup_rows(), {(DAY, self.therapist.pk, None, 2, 1, Decimal('20'))})
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyReportRollup.objects.create(tenant=self.tenant, date=DAY, therapist=self.therapist, payment_type=None)
+
+    def test_concurrent_creation_is_applied_as_update(self):
+        key = (self.tenant.pk, DAY, self.therapist.pk, None)
+        rollups.add_appointment(key, None)
+
+        # Simula otra escritura que creó la fila entre el UPDATE y el INSERT
+        real_update = QuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update):
+            rollups.add_appointment(key, Decimal('30'))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.rollup_rows(), {(DAY, self.therapist.pk, None, 2, 1, Decimal('30'))})
+
+
+class StreamingExportTests(TenantDataMixin, TestCase):
+    """Las exportaciones envían todas las filas por bloques, sin cargar el resultado completo en memoria."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic(login=True)
+        for hour in range(8, 12):
+            self.create_appointment(self.tenant, self.patient, self.therapist, hour=time(hour))
+
+    def test_streaming_alias_is_read_only(self):
+        self.assertEqual(streaming_database('default'), 'default')
+        with override_settings(DATABASE_STREAMING={'default': 'replica'}, DATABASE_REPLICAS={}):
+            self.assertEqual(streaming_database('default'), 'replica')
+            self.assertEqual(streaming_database('shard_1'), 'shard_1')
+            self.assertNotIn('replica', primary_databases())
+            self.assertIs(TenantShardRouter().allow_migrate('replica', 'reports'), False)
+        with override_settings(DATABASE_STREAMING={'default': 'missing'}):
+            self.assertEqual(streaming_database('default'), 'default')
+
+    def test_csv_export_streams_every_row(self):
+        response = self.client.get('/exports/csv/citas-rango/', {'start_date': '2025-06-01', 'end_date': '2025-06-30'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 5)
+
+    async def test_async_xlsx_export_is_streamed_in_chunks(self):
+        # FileResponse se cargaría completo en memoria bajo ASGI
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            '/async/exports/excel/citas-rango/', {'start_date': '2025-06-01', 'end_date': '2025-06-30'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="citas.xlsx"')
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content), int(response['Content-Length']))
+        self.assertTrue(content.startswith(b'PK'))
+
+
+class KeysetPaginationTests(TenantDataMixin, TestCase):
+    """La paginación por cursor recorre cada cita una sola vez, en ambos sentidos."""
+
+    url = '/reports/appointments-between-dates/'
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+        self.login(self.tenant)
+        patient = self.create_patient(self.tenant)
+        therapists = [self.create_therapist(self.tenant) for _ in range(3)]
+        # Varias citas con la misma fecha y hora: el id desempata
+        for day in (date(2025, 6, 3), DAY):
+            for hour in (time(10), time(9)):
+                for therapist in therapists:
+                    self.create_appointment(self.tenant, patient, therapist, day=day, hour=hour)
+        self.expected = list(
+            Appointment.objects.order_by('appointment_date', 'appointment_hour', 'id').values_list('id', flat=True)
+        )
+
+    def page(self, cursor=None):
+        params = {'start_date': '2025-06-01', 'end_date': '2025-06-30', 'page_size': 5}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_forward_and_backward_traversal(self):
+        pages, cursor = [], None
+        while True:
+            page = self.page(cursor)
+            pages.append([row['appointment_id'] for row in page['results']])
+            cursor = page['next']
+            if not cursor:
+                break
+        self.assertEqual([pk for ids in pages for pk in ids], self.expected)
+        self.assertEqual([len(ids) for ids in pages], [5, 5, 2])
+        self.assertIsNone(self.page()['previous'])
+
+        # Desde la última página hacia atrás se obtienen las mismas páginas
+        back, cursor = [pages[-1]], page['previous']
+        while cursor:
+            page = self.page(cursor)
+            back.append([row['appointment_id'] for row in page['results']])
+            cursor = page['previous']
+        self.assertEqual(back[::-1], pages)
+        self.assertIsNotNone(page['next'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'start_date': '2025-06-01', 'end_date': '2025-06-30', 'cursor': 'xx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PDFCacheTests(TenantDataMixin, TestCase):
+    """Caché de PDFs por fecha: invalidación al renombrar, errores de render, límite de tamaño y contadores."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic()
+        self.cash = self.create_payment_type(self.tenant)
+        self.create_appointment(self.tenant, self.patient, self.therapist, payment='50', payment_type=self.cash)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def key(self, report_type='pacientes_terapeuta', day=DAY):
+        return pdf_reports.pdf_cache_key(report_type, self.tenant, {'date': day})
+
+    def test_renaming_shown_entities_changes_the_key_of_their_dates(self):
+        other_day = date(2025, 6, 9)
+        for entity, field, value in (
+            (self.patient, 'name', 'Ana María'),
+            (self.therapist, 'first_name', 'Luis Alberto'),
+            (self.cash, 'name', 'Contado'),
+        ):
+            before, unrelated = self.key(), self.key(day=other_day)
+            setattr(entity, field, value)
+            entity.save()
+            self.assertNotEqual(self.key(), before, entity)
+            self.assertEqual(self.key(day=other_day), unrelated, entity)
+
+    def test_render_errors_are_not_cached(self):
+        failed = mock.Mock(err=1)
+        with self.settings(REPORTS_PDF_CACHE_DIR=self.directory), \
+                mock.patch.object(pdf_reports.pisa, 'CreatePDF', return_value=failed):
+            with self.assertRaises(pdf_reports.PDFRenderError):
+                pdf_reports.render_and_cache_pdf('pacientes_terapeuta', self.key(), [], {'date': DAY})
+            self.assertIsNone(pdf_reports.pdf_cache.get(self.key()))
+
+    def test_directory_is_scanned_only_when_over_the_limit(self):
+        pdf_cache = PDFCache()
+        with self.settings(REPORTS_PDF_CACHE_DIR=self.directory, REPORTS_PDF_CACHE_MAX_BYTES=450):
+            with mock.patch.object(PDFCache, 'evict', autospec=True, side_effect=PDFCache.evict) as evict:
+                for n in range(7):
+                    pdf_cache.set(f'{n:02d}' * 32, b'x' * 100)
+            # Primer recorrido al iniciar y luego solo al superar el límite estimado
+            self.assertEqual(evict.call_count, 3)
+            remaining = sorted(path.name[:2] for path in pdf_cache.directory.glob('*/*.pdf'))
+            self.assertEqual(remaining, ['04', '05', '06'])
+
+    def test_hits_and_misses_are_counted(self):
+        pdf_cache = PDFCache()
+        key = 'ab' * 32
+        with self.settings(REPORTS_PDF_CACHE_DIR=self.directory), track_request() as metrics:
+            self.assertIsNone(pdf_cache.get(key))
+            pdf_cache.set(key, b'%PDF')
+            self.assertIsNotNone(pdf_cache.get(key))
+        self.assertEqual(pdf_cache.stats(), {'hits': 1, 'misses': 1})
+        self.assertEqual(dict(metrics.counters), {'pdf_cache_miss': 1, 'pdf_cache_hit': 1})
+        self.assertIn('pdf_cache_hit;desc="1"', metrics.server_timing())
+
+
+class ResponseCacheTests(TenantDataMixin, TestCase):
+    """La versión de datos del tenant se comparte por la base, se cachea poco tiempo y cambia el ETag tras una escritura."""
+
+    url = '/reports/appointments-per-therapist/'
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic(login=True)
+
+    def test_version_is_shared_through_the_database(self):
+        start = get_data_version(self.tenant.pk)
+        self.create_appointment(self.tenant, self.patient, self.therapist)
+        # Otro proceso (o una caché local vacía) ve el mismo valor
+        cache.clear()
+        self.assertGreater(get_data_version(self.tenant.pk), start)
+
+    def test_version_is_read_from_the_cache_until_a_write(self):
+        start = get_data_version(self.tenant.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_data_version(self.tenant.pk), start)
+        bump_data_version(self.tenant.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_data_version(self.tenant.pk), start + 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_data_version(self.tenant.pk), start + 1)
+
+    def test_shared_changes_bump_every_tenant(self):
+        other = self.create_tenant('otra')
+        before = [get_data_version(self.tenant.pk), get_data_version(other.pk)]
+        bump_data_version(None)
+        self.assertEqual([get_data_version(self.tenant.pk), get_data_version(other.pk)], [v + 1 for v in before])
+
+    def test_etag_changes_after_a_write(self):
+        params = {'date': '2025-06-02'}
+        first = self.client.get(self.url, params)
+        self.assertEqual(first.json()['total_appointments_count'], 0)
+        etag = first['ETag']
+        self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.create_appointment(self.tenant, self.patient, self.therapist)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['total_appointments_count'], 1)
+
+
+class ImporterTests(TenantDataMixin, TestCase):
+    """La importación por lotes crea las filas válidas y reporta cada fila con error."""
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+
+    def run_import(self, kind, content, file_format='csv', batch_size=2000):
+        rows = read_rows(io.StringIO(content), file_format)
+        return TenantImporter(self.tenant, batch_size=batch_size).run(kind, rows)
+
+    def test_patients_report_invalid_and_duplicate_rows(self):
+        # Documento ya usado por otro tenant: la restricción única obliga a insertar fila por fila
+        self.create_patient(self.create_tenant('otra'), document_number='70000003')
+        result = self.run_import('patients', (
+            "document_number,document_type,name,paternal_lastname,maternal_lastname,sex,primary_phone\n"
+            "70000001,DNI,Ana,Pérez,Gómez,F,999\n"
+            "70000002,dni,Luis,Soto,,M,998\n"
+            "70000001,DNI,Repetida,Pérez,,F,997\n"
+            "70000004,DNI,Sin sexo,Rojas,,X,996\n"
+            "70000003,DNI,Ajena,Díaz,,F,995\n"
+        ), batch_size=3)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(sorted(error['row'] for error in result['errors']), [3, 4, 5])
+        patients = Patient.objects.filter(tenant=self.tenant)
+        self.assertEqual(set(patients.values_list('document_number', flat=True)), {'70000001', '70000002'})
+        self.assertEqual(DocumentType.objects.filter(tenant=self.tenant).count(), 1)
+        self.assertEqual(patients.get(document_number='70000001').search_paternal_lastname, 'perez')
+
+    def test_appointments_skip_taken_slots_and_rebuild_rollups(self):
+        patient = self.create_patient(self.tenant, document_number='80000001')
+        therapist = self.create_therapist(self.tenant)
+        self.create_appointment(self.tenant, patient, therapist, hour=time(8))
+        row = '{"patient_document": "80000001", "therapist_document": "%s", "appointment_date": "2025-06-02", "appointment_hour": "%s", "payment": "%s", "payment_type": "Efectivo"}'
+        result = self.run_import('appointments', "\n".join([
+            row % (therapist.document_number, '08:00', '10'),  # turno ocupado en la base
+            row % (therapist.document_number, '09:00', '20'),
+            row % (therapist.document_number, '09:00', '30'),  # repetido en el archivo
+            row % ('00000000', '10:00', '40'),                 # terapeuta inexistente
+            'no es json',
+            row % (therapist.document_number, '11:00', '50'),
+        ]), file_format='jsonl')
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(sorted(error['row'] for error in result['errors']), [1, 3, 4, 5])
+        self.assertEqual(
+            DailyReportRollup.objects.filter(tenant=self.tenant, payment_type__name='Efectivo')
+            .values_list('appointments_count', 'payment_total').get(),
+            (2, Decimal('70'))
+        )
+
+    def test_upload_requires_staff(self):
+        self.login(self.tenant)
+        upload = io.BytesIO(b"document_number\n1\n")
+        upload.name = 'pacientes.csv'
+        self.assertEqual(self.client.post('/imports/patients/', {'file': upload}).status_code, 403)
+
+        self.login(self.tenant, is_staff=True)
+        upload.seek(0)
+        response = self.client.post('/imports/patients/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['error_count'], 1)
+
+
+class RequestMetricsTests(TenantDataMixin, TestCase):
+    """Métricas por petición: visibilidad por tenant, tiempo por fase y respuestas en streaming."""
+
+    csv_url = '/exports/csv/citas-rango/?start_date=2025-06-01&end_date=2025-06-30'
+
+    def setUp(self):
+        super().setUp()
+        metrics_store.clear()
+        self.addCleanup(metrics_store.clear)
+        self.clinic_a, self.clinic_b = self.create_clinics('clinica-a', 'clinica-b')
+
+    def test_staff_only_sees_their_tenant(self):
+        for tenant in (self.clinic_a, self.clinic_b):
+            self.login(tenant)
+            self.client.get('/reports/daily-cash/?date=2025-06-02')
+
+        self.login(self.clinic_a)
+        self.assertEqual(self.client.get('/reports/metrics/').status_code, 403)
+        self.login(self.clinic_a, is_staff=True)
+        self.assertEqual(set(self.client.get('/reports/metrics/').json()), {'clinica-a'})
+        self.login(None, is_staff=True, is_superuser=True)
+        self.assertEqual(set(self.client.get('/reports/metrics/').json()), {'clinica-a', 'clinica-b'})
+
+    def test_streamed_queries_are_recorded_when_the_stream_ends(self):
+        self.login(self.clinic_a)
+        response = self.client.get(self.csv_url)
+        self.assertEqual(metrics_store.summary(), {})
+        b''.join(response.streaming_content)
+        stats = metrics_store.summary(tenant='clinica-a')['clinica-a']['exportar_csv_citas']
+        self.assertGreaterEqual(stats['sql_queries']['max'], 1)
+
+    def test_xlsx_phase_excludes_reading_rows(self):
+        def rows():
+            for n in range(4):
+                time_module.sleep(0.02)  # simula la consulta de cada bloque
+                yield {
+                    'patient_id': n, 'document_number_patient': '1', 'patient': 'Ana',
+                    'primary_phone_patient': '999', 'appointment_date': '2025-06-02', 'appointment_hour': '09:00',
+                }
+
+        with track_request() as metrics:
+            workbook = AppointmentWorkbook()
+            workbook.write_rows(rows(), chunk_size=2)
+            workbook.close().close()
+        self.assertLess(metrics.phases['xlsx'], 40)
+
+
+class ReplicaRoutingTests(TenantDataMixin, TestCase):
+    """Las lecturas van a la réplica salvo tras escribir y nunca se cachean datos anteriores a la versión vigente."""
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+
+    def report_request(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.tenant = self.tenant
+        return request
+
+    def test_settings_choose_the_replica_for_reports_and_exports(self):
+        request = self.report_request()
+        with override_settings(REPORTS_USE_REPLICA=True, REPORTS_EXPORTS_USE_REPLICA=False):
+            self.assertEqual(get_report_service(request).using, 'replica')
+            self.assertEqual(get_report_service(request, export=True).using, 'default')
+        with override_settings(REPORTS_USE_REPLICA=False, REPORTS_EXPORTS_USE_REPLICA=True):
+            self.assertEqual(get_report_service(request).using, 'default')
+            self.assertEqual(get_report_service(request, export=True).using, 'replica')
+
+    def test_reads_stay_on_the_primary_after_a_write(self):
+        with use_tenant(self.tenant), track_writes(), read_from_replica():
+            self.assertEqual(router.db_for_read(Patient), 'replica')
+            self.assertEqual(router.db_for_write(Patient), 'default')
+            self.assertEqual(router.db_for_read(Patient), 'default')
+        with use_tenant(self.tenant), track_writes(), read_from_replica(), read_from_primary():
+            self.assertEqual(router.db_for_read(Patient), 'default')
+
+    def test_primary_is_always_current(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(replica_is_current('default', self.tenant.pk, version=99))
+        self.assertEqual(ReportService(self.tenant, using='replica').on_primary().using, 'default')
+
+    @override_settings(REPORTS_USE_REPLICA=True)
+    def test_cached_responses_are_rendered_from_the_primary_when_the_replica_lags(self):
+        self.login(self.tenant)
+        self.create_appointment(self.tenant, self.create_patient(self.tenant), self.create_therapist(self.tenant))
+        # La réplica (espejo en las pruebas) no puede leerse dentro de la transacción de
+        # la prueba: una lectura en ella fallaría. Se simula que está atrasada.
+        with mock.patch('reports.report_cache.replica_is_current', return_value=False) as is_current:
+            response = self.client.get('/reports/appointments-per-therapist/', {'date': '2025-06-02'})
+            statistics = self.client.get('/api/company/reports/statistics/', {'start': '2025-06-01', 'end': '2025-06-30'})
+        self.assertEqual(response.json()['total_appointments_count'], 1)
+        self.assertEqual(statistics.status_code, 200)
+        self.assertEqual(is_current.call_count, 2)
+
+
+class PatientSearchTests(TenantDataMixin, TestCase):
+    """La búsqueda de pacientes compara prefijos por columna y ordena por relevancia."""
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+        self.service = PatientSearchService(self.tenant)
+        self.perez = self.create_patient(self.tenant, 'Ana', 'Pérez', 'Gómez', document_number='11111111')
+        self.perezoso = self.create_patient(self.tenant, 'Luis', 'Perezoso', 'Díaz', document_number='11112222')
+        self.gomez = self.create_patient(self.tenant, 'Pedro', 'Gómez', 'Pérez', document_number='22221111')
+        self.named = self.create_patient(self.tenant, 'Perla', 'Ríos', 'Lara', document_number='33331111')
+        # Otro tenant con los mismos nombres
+        self.create_patient(self.create_tenant('otra'), 'Ana', 'Pérez', 'Gómez')
+
+    def ids(self, query, **kwargs):
+        return [row['id'] for row in self.service.search(query, **kwargs)]
+
+    def test_results_are_ranked_and_limited_to_the_tenant(self):
+        self.assertEqual(self.ids('perez'), [self.perez.pk, self.perezoso.pk, self.gomez.pk])
+        self.assertEqual(self.ids('PER'), [self.perez.pk, self.perezoso.pk, self.gomez.pk, self.named.pk])
+        self.assertEqual(self.ids('1111'), [self.perez.pk, self.perezoso.pk])
+        self.assertEqual(self.ids('11111111')[0], self.perez.pk)
+        self.assertEqual(self.service.search('11111111')[0]['rank'], 4)
+
+    def test_every_token_must_match_some_column(self):
+        self.assertEqual(self.ids('gomez ana'), [self.perez.pk])
+        self.assertEqual(self.ids('perez ped'), [self.gomez.pk])
+        self.assertEqual(self.ids('perez zz'), [])
+
+    def test_low_relevance_columns_are_skipped_when_the_page_is_full(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.ids('perez', limit=2), [self.perez.pk, self.perezoso.pk])
+        with self.assertNumQueries(4):
+            self.ids('perez', limit=3)
+
+
+class BookingTests(TenantDataMixin, TestCase):
+    """La reserva en bloque no duplica turnos de un terapeuta, tampoco ante reservas concurrentes."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic()
+        self.service = BookingService(self.tenant)
+
+    def item(self, hour):
+        return {
+            'patient': self.patient.pk,
+            'therapist': self.therapist.pk,
+            'appointment_date': date(2025, 6, 2),
+            'appointment_hour': time(hour),
+        }
+
+    def statuses(self, results):
+        return [result['status'] for result in results]
+
+    def test_taken_and_repeated_slots_are_reported(self):
+        self.create_appointment(self.tenant, self.patient, self.therapist, hour=time(9))
+        items = [self.item(9), self.item(10), self.item(10)]
+
+        created, results = self.service.book(items)
+        self.assertEqual(created, [])
+        self.assertEqual(self.statuses(results), ['conflict', 'skipped', 'conflict'])
+
+        created, results = self.service.book(items, partial=True)
+        self.assertEqual(self.statuses(results), ['conflict', 'created', 'conflict'])
+        self.assertEqual(results[1]['id'], created[0].pk)
+        self.assertEqual(Appointment.objects.filter(tenant=self.tenant).count(), 2)
+
+    def test_slots_taken_by_a_concurrent_booking_are_retried_without_them(self):
+        real_taken_slots = booking_services.taken_slots
+        calls = count()
+
+        def taken_slots(*args, **kwargs):
+            # La primera verificación no ve la cita que otra petición inserta después
+            return set() if next(calls) == 0 else real_taken_slots(*args, **kwargs)
+
+        self.create_appointment(self.tenant, self.patient, self.therapist, hour=time(9))
+        with mock.patch.object(booking_services, 'taken_slots', side_effect=taken_slots):
+            created, results = self.service.book([self.item(9), self.item(10)], partial=True)
+        self.assertEqual(self.statuses(results), ['conflict', 'created'])
+        self.assertEqual([appointment.appointment_hour for appointment in created], [time(10)])
+
+        calls = count()
+        with mock.patch.object(booking_services, 'taken_slots', side_effect=taken_slots):
+            created, results = self.service.book([self.item(10), self.item(11)])
+        self.assertEqual(self.statuses(results), ['conflict', 'skipped'])
+        self.assertFalse(Appointment.objects.filter(appointment_hour=time(11)).exists())
+
+    def test_endpoint_creates_the_appointments(self):
+        self.login(self.tenant)
+        response = self.client.post(
+            '/api/appointments/bulk/',
+            {'appointments': [
+                {'patient': self.patient.pk, 'therapist': self.therapist.pk, 'appointment_date': '2025-06-02', 'appointment_hour': '09:00'},
+                {'patient': 0, 'therapist': self.therapist.pk},
+            ], 'partial': True},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.statuses(response.json()['results']), ['created', 'invalid'])
+        self.assertEqual(DailyReportRollup.objects.get(tenant=self.tenant).appointments_count, 1)
+
+
+class TreatmentSeriesTests(TenantDataMixin, TestCase):
+    """Las series de tratamiento crean sesiones en los días indicados y se mueven en bloque."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic(login=True)
+
+    def create_series(self, **extra):
+        payload = {
+            'patient': self.patient.pk,
+            'therapist': self.therapist.pk,
+            'initial_date': '2025-06-02',
+            'weekdays': [0, 2],
+            'sessions': 4,
+            'appointment_hour': '09:00',
+            **extra,
+        }
+        return self.client.post('/api/appointments/series/', payload, content_type='application/json')
+
+    def edit_series(self, series, **payload):
+        return self.client.post(f'/api/appointments/series/{series}/', payload, content_type='application/json')
+
+    def test_sessions_are_created_on_the_weekdays(self):
+        response = self.create_series()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [row['appointment_date'] for row in response.json()['appointments']],
+            ['2025-06-02', '2025-06-04', '2025-06-09', '2025-06-11'],
+        )
+        self.assertEqual(DailyReportRollup.objects.filter(tenant=self.tenant).count(), 4)
+
+    def test_conflicts_abort_unless_skipped(self):
+        self.create_appointment(self.tenant, self.patient, self.therapist, day=date(2025, 6, 4))
+        self.assertEqual(self.create_series().status_code, 409)
+        response = self.create_series(skip_conflicts=True)
+        self.assertEqual(response.json()['created'], 3)
+
+    def test_sessions_are_moved_from_a_date(self):
+        series = self.create_series().json()['series']
+        response = self.edit_series(series, from_date='2025-06-04', days=1, appointment_hour='10:00')
+        self.assertEqual(response.json(), {'updated': 3})
+        sessions = Appointment.objects.filter(series=series).order_by('appointment_date')
+        self.assertEqual(
+            [(row.appointment_date.day, row.appointment_hour.hour) for row in sessions],
+            [(2, 9), (5, 10), (10, 10), (12, 10)],
+        )
+        self.assertEqual(sessions[0].final_date, date(2025, 6, 12))
+
+    def test_unknown_series_is_not_found(self):
+        series = self.create_series().json()['series']
+        other = self.create_tenant('otra')
+        self.login(other)
+        self.assertEqual(self.edit_series(series, days=1).status_code, 404)
+        self.assertEqual(self.edit_series('00000000-0000-0000-0000-000000000000', days=1).status_code, 404)
+        # La serie existe pero no tiene sesiones desde from_date
+        self.login(self.tenant)
+        self.assertEqual(self.edit_series(series, from_date='2026-01-01', days=1).json(), {'updated': 0})
+
+
+class DailySeriesTests(TenantDataMixin, TestCase):
+    """La serie diaria cachea los meses cerrados por versión y leerla no escribe en la base."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic(login=True)
+        self.create_appointment(self.tenant, self.patient, self.therapist, payment='30')
+
+    def series(self, start='2025-05-01', end='2025-06-30'):
+        return self.client.get('/api/company/reports/daily-series/', {'start': start, 'end': end})
+
+    def test_range_is_capped(self):
+        self.assertEqual(self.series('2020-01-01', '2025-06-30').status_code, 400)
+        self.assertEqual(self.series('2024-01-01', '2025-06-30').status_code, 200)
+
+    def test_reading_creates_no_version_rows(self):
+        rows = ReportDataVersion.objects.count()
+        response = self.series()
+        self.assertEqual(response.json()['sesiones']['2025-06-02'], 1)
+        self.assertEqual(response.json()['sesiones']['2025-05-31'], 0)
+        self.assertEqual(ReportDataVersion.objects.count(), rows)
+        self.assertEqual(get_date_version(self.tenant.pk, date(2025, 6, 20)), 1)
+
+    def test_write_on_a_new_date_invalidates_its_month(self):
+        self.series()
+        self.create_appointment(self.tenant, self.patient, self.therapist, day=date(2025, 6, 20))
+        self.assertEqual(get_date_version(self.tenant.pk, date(2025, 6, 20)), 2)
+        data = self.series().json()
+        self.assertEqual(data['sesiones']['2025-06-20'], 1)
+        self.assertEqual(data['sesiones']['2025-06-02'], 1)
+
+
+class ReportJobTests(TenantDataMixin, TestCase):
+    """Cola de reportes PDF en segundo plano: endpoints, reclamo de trabajos y worker."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_clinic(login=True)
+        self.create_appointment(self.tenant, self.patient, self.therapist)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = self.settings(REPORTS_PDF_CACHE_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def submit(self, report_type='citas_terapeuta'):
+        return self.client.post('/exports/pdf/jobs/', {'report_type': report_type, 'date': '2025-06-02'})
+
+    def run_worker(self):
+        # Los PDF se renderizan en hilos con html_to_pdf simulado (un mock no se envía a otro proceso)
+        with mock.patch.object(run_report_worker, 'ProcessPoolExecutor', ThreadPoolExecutor), \
+                mock.patch.object(run_report_worker, 'init_render_process'), \
+                mock.patch.object(run_report_worker, 'html_to_pdf', return_value=b'%PDF-1.4 job') as html_to_pdf:
+            call_command('run_report_worker', '--once', '--poll-interval=0.01', stdout=io.StringIO())
+        return html_to_pdf
+
+    def test_submit_returns_the_job_id(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        job = ReportJob.objects.get(pk=data['job_id'])
+        self.assertEqual((job.tenant, job.status, job.params), (self.tenant, 'pending', {'date': '2025-06-02'}))
+        self.assertEqual(data['status_url'], f'/exports/pdf/jobs/{job.pk}/')
+        self.assertEqual(self.submit(report_type='otro').status_code, 400)
+
+    def test_each_job_is_claimed_once(self):
+        first = submit_job(self.tenant, 'citas_terapeuta', {'date': DAY})
+        second = submit_job(self.tenant, 'resumen_caja', {'date': DAY})
+        self.assertEqual(claim_pending_jobs(1), [first])
+        self.assertEqual(claim_pending_jobs(5), [second])
+        self.assertEqual(claim_pending_jobs(5), [])
+
+        # Otro worker lo tomó entre la lectura de candidatos y el UPDATE condicional
+        third = submit_job(self.tenant, 'citas_terapeuta', {'date': DAY})
+        candidates = ReportJob.objects.filter(pk=third.pk).values_list('pk', flat=True)
+        ReportJob.objects.filter(pk=third.pk).update(status=ReportJob.STATUS_RUNNING)
+        with mock.patch.object(QuerySet, 'values_list', return_value=candidates):
+            self.assertEqual(claim_pending_jobs(5), [])
+
+    def test_stale_running_jobs_are_requeued(self):
+        stale = submit_job(self.tenant, 'citas_terapeuta', {'date': DAY})
+        recent = submit_job(self.tenant, 'resumen_caja', {'date': DAY})
+        claim_pending_jobs(2)
+        ReportJob.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(seconds=700))
+
+        self.assertEqual(requeue_stale_jobs(600), 1)
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((stale.status, stale.started_at), ('pending', None))
+        self.assertEqual(recent.status, 'running')
+
+    def test_worker_finishes_the_job_and_it_can_be_downloaded(self):
+        job_id = self.submit().json()['job_id']
+        download_url = f'/exports/pdf/jobs/{job_id}/download/'
+        self.assertEqual(self.client.get(download_url).status_code, 409)
+
+        html_to_pdf = self.run_worker()
+        html_to_pdf.assert_called_once()
+        job = ReportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.error), ('done', ''))
+
+        status = self.client.get(f'/exports/pdf/jobs/{job_id}/').json()
+        self.assertEqual((status['status'], status['download_url']), ('done', download_url))
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'%PDF-1.4 job')
+
+        # El mismo reporte sale de la caché de PDFs sin renderizar
+        self.submit()
+        self.run_worker().assert_not_called()
+
+    def test_other_tenant_jobs_are_not_found(self):
+        job_id = self.submit().json()['job_id']
+        self.login(self.create_tenant('otra'))
+        self.assertEqual(self.client.get(f'/exports/pdf/jobs/{job_id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/exports/pdf/jobs/{job_id}/download/').status_code, 404)
+
+
+class AvailabilityTests(TenantDataMixin, TestCase):
+    """Turnos libres por terapeuta: citas fuera de la grilla, horario, días laborables y tenant."""
+
+    url = '/api/therapists/availability/'
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+        self.login(self.tenant)
+        self.patient = self.create_patient(self.tenant)
+        self.luis = self.create_therapist(self.tenant, 'Luis', 'Soto')
+        self.ana = self.create_therapist(self.tenant, 'Ana', 'Ríos')
+
+    def get(self, **params):
+        params = {'start_date': '2025-06-02', 'end_date': '2025-06-02', 'start_time': '08:00', 'end_time': '12:00', **params}
+        return self.client.get(self.url, params)
+
+    def free(self, response, therapist):
+        row = next(row for row in response.json()['therapists'] if row['id'] == therapist.pk)
+        return {day['date']: day['free'] for day in row['days']}
+
+    def test_booking_off_the_grid_blocks_both_overlapping_slots(self):
+        self.assertEqual(free_slots([630], 480, 720, 60), [480, 540])
+        self.create_appointment(self.tenant, self.patient, self.luis, hour=time(10, 30))
+        response = self.get()
+        self.assertEqual(self.free(response, self.luis)['2025-06-02'], ['08:00', '09:00'])
+        self.assertEqual(self.free(response, self.ana)['2025-06-02'], ['08:00', '09:00', '10:00', '11:00'])
+
+    def test_last_slot_ends_at_closing_time(self):
+        self.assertEqual(free_slots([], 480, 600, 60), [480, 540])
+        self.assertEqual(free_slots([], 480, 590, 60), [480])
+        response = self.get(start_time='18:00', end_time='20:00', slot_minutes=30)
+        self.assertEqual(self.free(response, self.luis)['2025-06-02'], ['18:00', '18:30', '19:00', '19:30'])
+
+    def test_non_working_days_are_excluded(self):
+        # Del lunes 2 al domingo 8 de junio; el domingo no es laborable
+        response = self.get(end_date='2025-06-08')
+        self.assertEqual(list(self.free(response, self.luis)), [f'2025-06-0{day}' for day in range(2, 8)])
+
+    def test_therapist_filter_and_tenant_scope(self):
+        response = self.get(therapist=self.ana.pk)
+        self.assertEqual([row['id'] for row in response.json()['therapists']], [self.ana.pk])
+
+        other = self.create_tenant('otra')
+        self.create_appointment(other, self.create_patient(other), self.create_therapist(other), hour=time(8))
+        response = self.get()
+        self.assertEqual([row['id'] for row in response.json()['therapists']], [self.ana.pk, self.luis.pk])
+        self.assertEqual(self.free(response, self.luis)['2025-06-02'][0], '08:00')
+
+    def test_inverted_ranges_are_rejected(self):
+        self.assertEqual(self.get(start_date='2025-06-03').status_code, 400)
+        self.assertEqual(self.get(start_time='12:00', end_time='08:00').status_code, 400)
+
+
+class FastSerializationTests(TenantDataMixin, TestCase):
+    """Los formateadores rápidos producen exactamente la salida de los serializers DRF."""
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+        self.service = ReportService(self.tenant)
+        patient = self.create_patient(self.tenant)
+        therapist = self.create_therapist(self.tenant)
+        other = self.create_therapist(self.tenant, 'Ana', 'Ríos', last_name_maternal='Lara')
+        cash = self.create_payment_type(self.tenant)
+        self.create_appointment(self.tenant, patient, therapist, payment='50.5', payment_type=cash)
+        self.create_appointment(self.tenant, patient, other, hour=time(10, 30))
+        self.create_appointment(self.tenant, patient, other, hour=time(11), payment='0')
+
+    def assertSameOutput(self, serializer_class, rows, context=None):
+        fast = serialize_many(serializer_class, rows, context=context, fast=True)
+        drf = serialize_many(serializer_class, rows, context=context, fast=False)
+        # Se compara el JSON: también distingue 1 de 1.0 y Decimal de texto
+        self.assertEqual(json.dumps(fast), json.dumps(drf))
+        self.assertTrue(fast)
+
+    def test_appointments_per_therapist(self):
+        data = self.service.get_appointments_count_by_therapist({'date': DAY})
+        context = {'total_appointments': data['total_appointments_count']}
+        self.assertSameOutput(TherapistAppointmentSerializer, data['therapists_appointments'], context)
+        self.assertSameOutput(TherapistAppointmentSerializer, data['therapists_appointments'], {'total_appointments': 0})
+
+    def test_patients_by_therapist(self):
+        self.assertSameOutput(PatientByTherapistSerializer, self.service.get_patients_by_therapist({'date': DAY}))
+
+    def test_daily_cash(self):
+        rows = self.service.get_daily_cash({'date': DAY})
+        # Un tipo de pago nulo (clave foránea sin valor) también debe coincidir
+        rows.append({'id_cita': 99, 'payment': Decimal('12.30'), 'payment_type': None, 'payment_type_name': None})
+        self.assertSameOutput(DailyCashSerializer, rows)
+
+    def test_appointment_range(self):
+        rows = self.service.get_appointments_between_dates({'start_date': DAY, 'end_date': DAY})
+        self.assertEqual([row['appointment_hour'] for row in rows], ['09:00', '10:30', '11:00'])
+        self.assertSameOutput(AppointmentRangeSerializer, rows)
+
+
+class DailyReportTests(TenantDataMixin, TestCase):
+    """Reportes del día: pacientes agrupados por terapeuta y el dashboard de una sola consulta."""
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self.create_tenant('clinica')
+        self.login(self.tenant)
+        self.ana = self.create_patient(self.tenant, 'Ana', 'Pérez', 'Gómez')
+        self.luis = self.create_patient(self.tenant, 'Luis', 'Díaz', 'Lara')
+        self.first = self.create_therapist(self.tenant, 'Carlos', 'Soto')
+        self.second = self.create_therapist(self.tenant, 'Rosa', 'Ríos', last_name_maternal='Vega')
+        cash = self.create_payment_type(self.tenant)
+        # Ambos terapeutas atienden a ambos pacientes; hay citas sin pago o sin tipo de pago
+        self.create_appointment(self.tenant, self.ana, self.first, hour=time(9), payment='40', payment_type=cash)
+        self.create_appointment(self.tenant, self.luis, self.first, hour=time(10))
+        self.create_appointment(self.tenant, self.ana, self.first, hour=time(11), payment='40.50', payment_type=cash)
+        self.create_appointment(self.tenant, self.luis, self.second, hour=time(12), payment='25', payment_type=cash)
+        self.create_appointment(self.tenant, self.ana, self.second, hour=time(8), payment='10')
+
+    def old_patients_by_therapist(self):
+        """Agrupación original: recorre las citas del día (orden por defecto) con sus relaciones."""
+        report = {}
+        for appointment in Appointment.objects.select_related('patient', 'therapist').filter(tenant=self.tenant, appointment_date=DAY):
+            patient, therapist = appointment.patient, appointment.therapist
+            group = report.setdefault(therapist.id, {
+                'therapist_id': therapist.id,
+                'therapist': f"{therapist.last_name_paternal} {therapist.last_name_maternal or ''} {therapist.first_name}".strip(),
+                'patients': {},
+            })
+            row = group['patients'].setdefault(patient.id, {
+                'patient_id': patient.id,
+                'patient': f"{patient.paternal_lastname} {patient.maternal_lastname or ''} {patient.name}".strip(),
+                'appointments': 0,
+            })
+            row['appointments'] += 1
+        for group in report.values():
+            group['patients'] = list(group['patients'].values())
+        return list(report.values())
+
+    def get(self, path):
+        response = self.client.get(path, {'date': '2025-06-02'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_patients_are_grouped_in_the_original_order(self):
+        expected = self.old_patients_by_therapist()
+        # El terapeuta con la cita más tardía va primero, aunque su id sea mayor
+        self.assertEqual([group['therapist_id'] for group in expected], [self.second.pk, self.first.pk])
+        self.assertEqual([row['patient_id'] for row in expected[0]['patients']], [self.luis.pk, self.ana.pk])
+        self.assertEqual(ReportService(self.tenant).get_patients_by_therapist({'date': DAY}), expected)
+
+        response = self.get('/reports/patients-by-therapist/')
+        self.assertEqual(response, json.loads(json.dumps(serialize_many(PatientByTherapistSerializer, expected, fast=False))))
+        self.assertEqual(response[1]['patients'][0], {'patient_id': self.ana.pk, 'patient': 'Pérez Gómez Ana', 'appointments': 2})
+
+    def test_dashboard_blocks_match_the_individual_endpoints(self):
+        dashboard = self.get('/reports/daily-dashboard/')
+        self.assertEqual(dashboard['appointments_per_therapist'], self.get('/reports/appointments-per-therapist/'))
+        self.assertEqual(dashboard['daily_cash'], self.get('/reports/daily-cash/'))
+        self.assertEqual(dashboard['patients_by_therapist'], self.get('/reports/patients-by-therapist/'))
+
+        self.assertEqual(dashboard['appointments_per_therapist']['total_appointments_count'], 5)
+        # Solo las citas con pago y tipo de pago, de la más reciente a la más antigua
+        self.assertEqual([row['payment'] for row in dashboard['daily_cash']], ['25.00', '40.50', '40.00'])
+        self.assertEqual(
+            [group['therapist_id'] for group in dashboard['patients_by_therapist']],
+            [str(self.second.pk), str(self.first.pk)]
+        )
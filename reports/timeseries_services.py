@@ -0,0 +1,129 @@
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils.timezone import localtime
+
+from multitenant.routers import tenant_database
+
+from .models import DailyReportRollup
+from .report_cache import get_month_versions
+
+
+def month_end(month):
+    """Último día del mes de `month`."""
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def months_between(start, end):
+    """Primer día de cada mes entre `start` y `end` (inclusive)."""
+    months = []
+    month = start.replace(day=1)
+    while month <= end:
+        months.append(month)
+        month = month_end(month) + timedelta(days=1)
+    return months
+
+
+class DailySeriesService:
+    """
+    Serie diaria densa (todas las fechas, con ceros) de sesiones e ingresos
+    del tenant, leída del resumen diario (DailyReportRollup).
+
+    Los meses cerrados se cachean como particiones inmutables: su clave
+    incluye la versión del mes (get_month_versions), así una escritura
+    retroactiva crea una clave nueva en lugar de borrar entradas. El mes en
+    curso (y los futuros, con citas agendadas) se consultan siempre.
+    """
+
+    def __init__(self, tenant, using=None):
+        self.tenant = tenant
+        self.tenant_id = tenant.pk if tenant is not None else None
+        self.using = using or router.db_for_read(DailyReportRollup, instance=tenant) or 'default'
+
+    def get_daily_series(self, start, end):
+        """Devuelve {'ingresos': {fecha: monto}, 'sesiones': {fecha: citas}} con una entrada por día."""
+        current_month = localtime().date().replace(day=1)
+        closed = [month for month in months_between(start, end) if month < current_month]
+
+        days = {}
+        if closed:
+            days.update(self.closed_months(closed))
+        if end >= current_month:
+            days.update(self.query_days(max(start, current_month), end, using=self.using))
+
+        ingresos = {}
+        sesiones = {}
+        day = start
+        while day <= end:
+            key = day.strftime("%Y-%m-%d")
+            count, amount = days.get(key, (0, 0.0))
+            ingresos[key] = amount
+            sesiones[key] = count
+            day += timedelta(days=1)
+        return {"ingresos": ingresos, "sesiones": sesiones}
+
+    def closed_months(self, months):
+        """Días de los meses cerrados, desde la caché o con una consulta para los que falten."""
+        # Leer las versiones antes que los datos: una escritura posterior cambia la clave
+        versions = get_month_versions(self.tenant_id, months)
+        keys = {
+            month: f"reports:daily-series:{self.tenant_id}:{month:%Y-%m}:{versions[month]}"
+            for month in months
+        }
+        cached = cache.get_many(keys.values())
+
+        days = {}
+        missing = []
+        for month, key in keys.items():
+            if key in cached:
+                days.update(cached[key])
+            else:
+                missing.append(month)
+
+        if missing:
+            # La base principal: una réplica atrasada dejaría un mes incorrecto en la caché
+            computed = self.query_days(
+                min(missing), month_end(max(missing)),
+                using=tenant_database(self.tenant) or 'default',
+                months=missing
+            )
+            partitions = {keys[month]: {} for month in missing}
+            for key, value in computed.items():
+                partitions[keys[self.month_of(key)]][key] = value
+            cache.set_many(partitions, timeout=settings.REPORTS_SERIES_PARTITION_TIMEOUT)
+            days.update(computed)
+        return days
+
+    @staticmethod
+    def month_of(key):
+        """Primer día del mes de una fecha 'AAAA-MM-DD'."""
+        year, month, _ = key.split("-")
+        return date(int(year), int(month), 1)
+
+    def query_days(self, start, end, using, months=None):
+        """Sesiones e ingresos por fecha, solo de los días con citas (una consulta)."""
+        rollups = DailyReportRollup.objects.using(using).filter(
+            tenant=self.tenant,
+            date__range=(start, end)
+        )
+        if months:
+            # Solo los meses pedidos, aunque haya meses cacheados entre ellos
+            rollups = rollups.annotate(month=TruncMonth('date')).filter(month__in=months)
+
+        rows = (
+            rollups
+            .order_by()
+            .values("date")
+            .annotate(sesiones=Sum("appointments_count"), ingresos=Sum("payment_total"))
+        )
+        return {
+            row["date"].strftime("%Y-%m-%d"): (row["sesiones"], float(row["ingresos"] or Decimal("0")))
+            for row in rows
+            if row["sesiones"]
+        }
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from .views import ReportView
 from . import views
+from . import async_views
 
 urlpatterns = [
     path('reportes/', ReportView.as_view(), name='reportes'),
@@ -10,20 +11,56 @@ reports_urlpatterns = [
     path('reports/appointments-per-therapist/', views.get_number_appointments_per_therapist, name='appointments_per_therapist'),
     path('reports/patients-by-therapist/', views.get_patients_by_therapist, name='patients_by_therapist'),
     path('reports/daily-cash/', views.get_daily_cash, name='daily_cash'),
+    path('reports/daily-dashboard/', views.get_daily_dashboard, name='daily_dashboard'),
     path('reports/appointments-between-dates/', views.get_appointments_between_dates, name='appointments_between_dates'),
+    path('api/company/reports/statistics/', views.get_statistics, name='statistics'),
+    path('api/company/reports/daily-series/', views.get_daily_series, name='daily_series'),
 ]
 
 export_urlpatterns = [
     path('exports/pdf/citas-terapeuta/', views.pdf_citas_terapeuta, name='pdf_citas_terapeuta'),#listo
     path('exports/pdf/pacientes-terapeuta/', views.pdf_pacientes_terapeuta, name='pdf_pacientes_terapeuta'),#listo
     path('exports/pdf/resumen-caja/', views.pdf_resumen_caja, name='pdf_resumen_caja'),
+    path('exports/pdf/jobs/', views.submit_pdf_job, name='submit_pdf_job'),
+    path('exports/pdf/jobs/<uuid:job_id>/', views.pdf_job_status, name='pdf_job_status'),
+    path('exports/pdf/jobs/<uuid:job_id>/download/', views.pdf_job_download, name='pdf_job_download'),
     path('exports/excel/citas-rango/', views.exportar_excel_citas, name='exportar_excel_citas'),#listo
+    path('exports/csv/citas-rango/', views.exportar_csv_citas, name='exportar_csv_citas'),
+    path('exports/ndjson/citas-rango/', views.exportar_ndjson_citas, name='exportar_ndjson_citas'),
+]
+
+import_urlpatterns = [
+    path('imports/<str:kind>/', views.importar_datos, name='importar_datos'),
+]
+
+# Versiones async de reportes y exportaciones (servir con ASGI: uvicorn core.asgi:application)
+async_urlpatterns = [
+    path('async/reports/appointments-per-therapist/', async_views.get_number_appointments_per_therapist, name='appointments_per_therapist_async'),
+    path('async/reports/patients-by-therapist/', async_views.get_patients_by_therapist, name='patients_by_therapist_async'),
+    path('async/reports/daily-cash/', async_views.get_daily_cash, name='daily_cash_async'),
+    path('async/reports/daily-dashboard/', async_views.get_daily_dashboard, name='daily_dashboard_async'),
+    path('async/reports/appointments-between-dates/', async_views.get_appointments_between_dates, name='appointments_between_dates_async'),
+    path('async/api/company/reports/statistics/', async_views.get_statistics, name='statistics_async'),
+    path('async/exports/pdf/citas-terapeuta/', async_views.pdf_citas_terapeuta, name='pdf_citas_terapeuta_async'),
+    path('async/exports/pdf/pacientes-terapeuta/', async_views.pdf_pacientes_terapeuta, name='pdf_pacientes_terapeuta_async'),
+    path('async/exports/pdf/resumen-caja/', async_views.pdf_resumen_caja, name='pdf_resumen_caja_async'),
+    path('async/exports/excel/citas-rango/', async_views.exportar_excel_citas, name='exportar_excel_citas_async'),
+    path('async/exports/csv/citas-rango/', async_views.exportar_csv_citas, name='exportar_csv_citas_async'),
+    path('async/exports/ndjson/citas-rango/', async_views.exportar_ndjson_citas, name='exportar_ndjson_citas_async'),
 ]
 
 views_urlpatterns = [
+    path('reports/metrics/', views.request_metrics, name='request_metrics'),
+    path('api/patients/search/', views.buscar_pacientes, name='buscar_pacientes'),
+    path('api/therapists/availability/', views.turnos_libres, name='turnos_libres'),
+    path('api/appointments/bulk/', views.reservar_citas, name='reservar_citas'),
+    path('api/appointments/series/', views.crear_serie, name='crear_serie'),
+    path('api/appointments/series/<uuid:series>/', views.editar_serie, name='editar_serie'),
     path('reports/', views.reports_dashboard, name='reports'),
 ]
 
 urlpatterns.extend(reports_urlpatterns)
 urlpatterns.extend(export_urlpatterns)
+urlpatterns.extend(import_urlpatterns)
+urlpatterns.extend(async_urlpatterns)
 urlpatterns.extend(views_urlpatterns)
\ No newline at end of file
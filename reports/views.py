@@ -1,21 +1,46 @@
-from django.http import JsonResponse, HttpResponse
-from django.shortcuts import render
-import io
+import json
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, HttpResponse, FileResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from django.conf import settings
 from datetime import datetime
 from django.utils.timezone import localtime
-from .models import Appointment
+from .models import Appointment, ReportJob
 from django.views.generic import ListView
 from .reports_services import ReportService
+from .search_services import PatientSearchService
+from .availability_services import AvailabilityService
+from .booking_services import BookingService, SeriesError, SeriesNotFound, TreatmentSeriesService
+from multitenant.context import read_from_replica
+from multitenant.utils import aget_request_tenant, get_request_tenant
 from .reports_serializers import (
     DateParameterSerializer,
+    AppointmentPageParameterSerializer,
+    ReportJobParameterSerializer,
     TherapistAppointmentSerializer,
     PatientByTherapistSerializer,
     DailyCashSerializer,
     AppointmentRangeSerializer,
-    PDFContextSerializer
+    StatisticsParameterSerializer,
+    PatientSearchParameterSerializer,
+    AvailabilityParameterSerializer,
+    BookingItemSerializer,
+    TreatmentSeriesSerializer,
+    TreatmentSeriesUpdateSerializer
 )
-from django_xhtml2pdf.utils import pdf_decorator
-import xlsxwriter
+from .report_cache import cache_report_response, cached_report
+from .pagination import InvalidCursor
+from .pdf_reports import PDF_REPORTS, get_or_render_pdf
+from .report_jobs import submit_job, job_filename
+from .importers import IMPORT_KINDS, TenantImporter, open_text, read_rows
+from .metrics import metrics_store
+from .fast_serializers import serialize_many, json_response
+from .streaming import iter_csv, iter_ndjson, streaming_response
+from .xlsx_export import AppointmentWorkbook
 
 # Create your views here.
 class ReportView(ListView):
@@ -24,14 +49,59 @@ class ReportView(ListView):
 
     def get_queryset(self):
         # Mostrar solo citas del tenant del usuario logueado
-        return Appointment.objects.filter(tenant=self.request.user.tenant)
+        tenant = get_request_tenant(self.request)
+        if tenant is None:
+            raise PermissionDenied("No se pudo determinar el tenant")
+        return Appointment.objects.filter(tenant=tenant)
 
-report_service = ReportService()
+
+def tenant_forbidden():
+    return JsonResponse({'error': 'No se pudo determinar el tenant'}, status=403)
+
+
+def tenant_required(view_func):
+    """
+    Responde 403 sin consultar la base si la petición no tiene tenant
+    (usuario anónimo o dominio desconocido). Filtrar por tenant=None
+    devolvería las filas sin tenant y las guardaría en caché bajo None.
+    Sirve para vistas síncronas y async.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_view(request, *args, **kwargs):
+            if await aget_request_tenant(request) is None:
+                return tenant_forbidden()
+            return await view_func(request, *args, **kwargs)
+        return _async_view
+
+    @wraps(view_func)
+    def _view(request, *args, **kwargs):
+        if get_request_tenant(request) is None:
+            return tenant_forbidden()
+        return view_func(request, *args, **kwargs)
+    return _view
+
+
+def get_report_service(request, export=False):
+    """
+    Crea un ReportService limitado al tenant activo de la petición.
+    Sus lecturas van a la réplica si está habilitada para reportes
+    (REPORTS_USE_REPLICA) o exportaciones (REPORTS_EXPORTS_USE_REPLICA);
+    si la petición ya escribió, se usa la base principal.
+    """
+    tenant = get_request_tenant(request)
+    setting = 'REPORTS_EXPORTS_USE_REPLICA' if export else 'REPORTS_USE_REPLICA'
+    if getattr(settings, setting, False):
+        with read_from_replica():
+            return ReportService(tenant)
+    return ReportService(tenant)
 
 class ReportAPIView:
     """Responsable exclusivamente de endpoints JSON de reportes."""
     
     @staticmethod
+    @tenant_required
+    @cache_report_response('appointments_per_therapist', DateParameterSerializer)
     def get_number_appointments_per_therapist(request):
         """Devuelve JSON con el número de citas por terapeuta para una fecha dada."""
         # Validar parámetros
@@ -40,23 +110,29 @@ class ReportAPIView:
             return JsonResponse(serializer.errors, status=400)
         
         # Obtener datos usando parámetros validados
-        data = report_service.get_appointments_count_by_therapist(serializer.validated_data)
+        data = get_report_service(request).get_appointments_count_by_therapist(serializer.validated_data)
+        return ReportAPIView.appointments_per_therapist_response(data)
+    
+    @staticmethod
+    def appointments_per_therapist_response(data):
         if isinstance(data, dict) and "error" in data:
             return JsonResponse(data, status=400)
         
         # Serializar respuesta
-        response_serializer = TherapistAppointmentSerializer(
-            data['therapists_appointments'], 
-            many=True,
+        therapists_appointments = serialize_many(
+            TherapistAppointmentSerializer,
+            data['therapists_appointments'],
             context={'total_appointments': data['total_appointments_count']}
         )
         
-        return JsonResponse({
-            'therapists_appointments': response_serializer.data,
+        return json_response({
+            'therapists_appointments': therapists_appointments,
             'total_appointments_count': data['total_appointments_count']
         })
     
     @staticmethod
+    @tenant_required
+    @cache_report_response('patients_by_therapist', DateParameterSerializer)
     def get_patients_by_therapist(request):
         """Devuelve JSON con los pacientes agrupados por terapeuta para una fecha dada."""
         # Validar parámetros
@@ -65,15 +141,20 @@ class ReportAPIView:
             return JsonResponse(serializer.errors, status=400)
         
         # Obtener datos
-        data = report_service.get_patients_by_therapist(serializer.validated_data)
+        data = get_report_service(request).get_patients_by_therapist(serializer.validated_data)
+        return ReportAPIView.patients_by_therapist_response(data)
+    
+    @staticmethod
+    def patients_by_therapist_response(data):
         if isinstance(data, dict) and "error" in data:
             return JsonResponse(data, status=400)
         
         # Serializar respuesta
-        response_serializer = PatientByTherapistSerializer(data, many=True)
-        return JsonResponse(response_serializer.data, safe=False)
+        return json_response(serialize_many(PatientByTherapistSerializer, data))
     
     @staticmethod
+    @tenant_required
+    @cache_report_response('daily_cash', DateParameterSerializer)
     def get_daily_cash(request):
         """Devuelve JSON con el resumen diario de efectivo agrupado por tipo de pago."""
         # Validar parámetros
@@ -82,256 +163,531 @@ class ReportAPIView:
             return JsonResponse(serializer.errors, status=400)
         
         # Obtener datos
-        data = report_service.get_daily_cash(serializer.validated_data)
+        data = get_report_service(request).get_daily_cash(serializer.validated_data)
+        return ReportAPIView.daily_cash_response(data)
+    
+    @staticmethod
+    def daily_cash_response(data):
         if isinstance(data, dict) and "error" in data:
             return JsonResponse(data, status=400)
         
         # Serializar respuesta
-        response_serializer = DailyCashSerializer(data, many=True)
-        return JsonResponse(response_serializer.data, safe=False)
+        return json_response(serialize_many(DailyCashSerializer, data))
     
     @staticmethod
-    def get_appointments_between_dates(request):
-        """Devuelve JSON con todas las citas entre dos fechas con info de paciente y terapeuta."""
+    @tenant_required
+    @cache_report_response('daily_dashboard', DateParameterSerializer)
+    def get_daily_dashboard(request):
+        """Devuelve JSON con los tres reportes del día (citas, caja y pacientes por terapeuta) en una sola respuesta."""
         # Validar parámetros
         serializer = DateParameterSerializer(data=request.GET)
         if not serializer.is_valid():
             return JsonResponse(serializer.errors, status=400)
         
-        # Obtener datos
-        data = report_service.get_appointments_between_dates(serializer.validated_data)
-        if isinstance(data, dict) and "error" in data:
-            return JsonResponse(data, status=400)
+        # Obtener datos con una sola pasada sobre las citas del día
+        data = get_report_service(request).get_daily_dashboard(serializer.validated_data)
+        return ReportAPIView.daily_dashboard_response(data)
+    
+    @staticmethod
+    def daily_dashboard_response(data):
+        appointments = data['appointments_per_therapist']
+        
+        # Serializar respuesta
+        return json_response({
+            'appointments_per_therapist': {
+                'therapists_appointments': serialize_many(
+                    TherapistAppointmentSerializer,
+                    appointments['therapists_appointments'],
+                    context={'total_appointments': appointments['total_appointments_count']}
+                ),
+                'total_appointments_count': appointments['total_appointments_count']
+            },
+            'daily_cash': serialize_many(DailyCashSerializer, data['daily_cash']),
+            'patients_by_therapist': serialize_many(PatientByTherapistSerializer, data['patients_by_therapist'])
+        })
+    
+    @staticmethod
+    @tenant_required
+    @cache_report_response('appointments_between_dates', AppointmentPageParameterSerializer)
+    def get_appointments_between_dates(request):
+        """
+        Devuelve JSON con las citas entre dos fechas, paginadas por cursor.
+        La respuesta incluye `results` y los cursores opacos `next` y `previous`.
+        """
+        # Validar parámetros
+        serializer = AppointmentPageParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
         
+        # Obtener la página solicitada
+        params = serializer.validated_data
+        try:
+            data = get_report_service(request).get_appointments_page(
+                params,
+                cursor=params.get('cursor'),
+                page_size=params.get('page_size', settings.REPORTS_PAGE_SIZE)
+            )
+        except InvalidCursor as e:
+            return JsonResponse({'cursor': [str(e)]}, status=400)
+        return ReportAPIView.appointments_page_response(data)
+    
+    @staticmethod
+    def appointments_page_response(data):
         # Serializar respuesta
-        response_serializer = AppointmentRangeSerializer(data, many=True)
-        return JsonResponse(response_serializer.data, safe=False)
+        return json_response({
+            'results': serialize_many(AppointmentRangeSerializer, data['results']),
+            'next': data['next'],
+            'previous': data['previous']
+        })
+
+    
+    @staticmethod
+    @tenant_required
+    def get_statistics(request):
+        """Devuelve JSON con las estadísticas del tenant para un rango de fechas."""
+        # Validar parámetros
+        serializer = StatisticsParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        
+        # Obtener datos (cacheados por tenant y rango); el servicio se crea
+        # solo al calcular, para que lea de la base que indique cached_report
+        params = serializer.validated_data
+        data = cached_report(
+            get_request_tenant(request),
+            "statistics",
+            (params["start"], params["end"]),
+            lambda: get_report_service(request).get_statistics(params)
+        )
+        return JsonResponse(data)
+    
+    @staticmethod
+    @tenant_required
+    def get_daily_series(request):
+        """Devuelve las sesiones e ingresos de cada día del rango (con ceros)."""
+        serializer = StatisticsParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        
+        # Los meses cerrados salen de la caché por meses; solo el mes en curso se consulta siempre
+        data = get_report_service(request).get_daily_series(serializer.validated_data)
+        return JsonResponse(data)
 
 
 class PDFExportView:
     """Responsable exclusivamente de la generación de PDFs."""
     
     @staticmethod
-    @pdf_decorator(pdfname='citas_terapeuta.pdf')
-    def pdf_citas_terapeuta(request):
+    @tenant_required
+    def render_pdf(request, report_type):
+        """Valida parámetros y devuelve el PDF del reporte, usando la caché en disco."""
         # Validar parámetros
         serializer = DateParameterSerializer(data=request.GET)
         if not serializer.is_valid():
             return JsonResponse(serializer.errors, status=400)
         
-        # Obtener datos
-        data = report_service.get_appointments_count_by_therapist(serializer.validated_data)
-        if isinstance(data, dict) and "error" in data:
-            return JsonResponse(data, status=400)
-        
-        # Preparar contexto usando serializer
-        context_data = {
-            'date': serializer.validated_data.get('date'),
-            'data': data,
-            'title': 'Citas por Terapeuta'
-        }
-        context_serializer = PDFContextSerializer(context_data)
-        context = context_serializer.data
-        
-        return render(request, 'pdf_templates/citas_terapeuta.html', context)
+        # Obtener el PDF (cacheado o recién generado)
+        pdf = get_or_render_pdf(report_type, get_report_service(request, export=True), serializer.validated_data)
+        return FileResponse(
+            pdf,
+            as_attachment=True,
+            filename=PDF_REPORTS[report_type][1],
+            content_type='application/pdf'
+        )
+    
+    @staticmethod
+    def pdf_citas_terapeuta(request):
+        return PDFExportView.render_pdf(request, 'citas_terapeuta')
     
     #listo
     @staticmethod
-    @pdf_decorator(pdfname='pacientes_por_terapeuta.pdf')
     def pdf_pacientes_terapeuta(request):
+        return PDFExportView.render_pdf(request, 'pacientes_terapeuta')
+    
+    @staticmethod
+    def pdf_resumen_caja(request):
+        return PDFExportView.render_pdf(request, 'resumen_caja')
+
+
+class ReportJobView:
+    """Responsable exclusivamente de los reportes PDF generados en segundo plano."""
+    
+    @staticmethod
+    def job_status(request, job):
+        data = {
+            'job_id': str(job.pk),
+            'report_type': job.report_type,
+            'status': job.status,
+            'error': job.error,
+            'created_at': job.created_at,
+            'finished_at': job.finished_at,
+            'download_url': None
+        }
+        if job.status == ReportJob.STATUS_DONE:
+            data['download_url'] = reverse('pdf_job_download', args=[job.pk])
+        return data
+    
+    @staticmethod
+    def get_job(request, job_id):
+        return get_object_or_404(
+            ReportJob.objects.defer('result'),
+            pk=job_id,
+            tenant=get_request_tenant(request)
+        )
+    
+    @staticmethod
+    @require_POST
+    @tenant_required
+    def submit(request):
+        """Registra un reporte PDF para generarlo en segundo plano y devuelve su id."""
         # Validar parámetros
-        serializer = DateParameterSerializer(data=request.GET)
+        serializer = ReportJobParameterSerializer(data=request.POST or request.GET)
         if not serializer.is_valid():
             return JsonResponse(serializer.errors, status=400)
+        
+        job = submit_job(
+            get_request_tenant(request),
+            serializer.validated_data['report_type'],
+            serializer.validated_data
+        )
+        data = ReportJobView.job_status(request, job)
+        data['status_url'] = reverse('pdf_job_status', args=[job.pk])
+        return JsonResponse(data, status=202)
+    
+    @staticmethod
+    @tenant_required
+    def status(request, job_id):
+        """Devuelve el estado del trabajo."""
+        job = ReportJobView.get_job(request, job_id)
+        return JsonResponse(ReportJobView.job_status(request, job))
+    
+    @staticmethod
+    @tenant_required
+    def download(request, job_id):
+        """Descarga el PDF generado si el trabajo terminó."""
+        job = ReportJobView.get_job(request, job_id)
+        if job.status != ReportJob.STATUS_DONE:
+            return JsonResponse(ReportJobView.job_status(request, job), status=409)
+        
+        response = HttpResponse(bytes(job.result), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename={job_filename(job)}'
+        return response
 
-        # Obtener datos
-        data = report_service.get_patients_by_therapist(serializer.validated_data)
-        if isinstance(data, dict) and "error" in data:
-            return JsonResponse(data, status=400)
 
-        # Si no hay datos, mostrar mensaje en PDF
-        if not data or (isinstance(data, list) and len(data) == 0):
-            context = {
-                'date': serializer.validated_data.get('date'),
-                'data': [],
-                'title': 'Pacientes por Terapeuta',
-                'no_data': True
-            }
-            return render(request, 'pdf_templates/pacientes_terapeuta.html', context)
-
-        # Preparar contexto y pasarlo directamente al template (sin serializar 'data')
-        context = {
-            'date': serializer.validated_data.get('date'),
-            'data': data,
-            'title': 'Pacientes por Terapeuta',
-            'no_data': False
-        }
-        return render(request, 'pdf_templates/pacientes_terapeuta.html', context)
+class PatientSearchView:
+    """Responsable exclusivamente de la búsqueda de pacientes del tenant."""
     
     @staticmethod
-    @pdf_decorator(pdfname='resumen_caja.pdf')
-    def pdf_resumen_caja(request):
-        # Validar parámetros
-        serializer = DateParameterSerializer(data=request.GET)
+    @tenant_required
+    def buscar(request):
+        """Devuelve los pacientes del tenant que coinciden con `q`, ordenados por relevancia."""
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'No autorizado'}, status=403)
+        serializer = PatientSearchParameterSerializer(data=request.GET)
         if not serializer.is_valid():
             return JsonResponse(serializer.errors, status=400)
         
-        # Obtener datos
-        data = report_service.get_daily_cash(serializer.validated_data)
-        if isinstance(data, dict) and "error" in data:
-            return JsonResponse(data, status=400)
+        limit = serializer.validated_data.get('limit') or getattr(settings, 'PATIENT_SEARCH_RESULTS', 20)
+        service = PatientSearchService(get_request_tenant(request))
+        results = service.search(serializer.validated_data['q'], limit=limit)
+        return JsonResponse({'results': results})
+
+
+class AvailabilityView:
+    """Responsable exclusivamente de los turnos libres de los terapeutas."""
+    
+    @staticmethod
+    @tenant_required
+    def turnos_libres(request):
+        """Devuelve los turnos libres de cada terapeuta del tenant entre start_date y end_date."""
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'No autorizado'}, status=403)
+        serializer = AvailabilityParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        
+        params = serializer.validated_data
+        service = AvailabilityService(get_request_tenant(request))
+        therapists = service.get_free_slots(
+            params['start_date'],
+            params['end_date'],
+            params['start_time'],
+            params['end_time'],
+            params['slot_minutes'],
+            settings.AVAILABILITY_WORKING_DAYS,
+            therapist_id=params.get('therapist')
+        )
+        return JsonResponse({
+            'start_date': params['start_date'].strftime('%Y-%m-%d'),
+            'end_date': params['end_date'].strftime('%Y-%m-%d'),
+            'slot_minutes': params['slot_minutes'],
+            'therapists': therapists
+        })
+
+
+def read_json(request):
+    """Cuerpo JSON (objeto) de la petición, o None si no es válido."""
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+class BookingView:
+    """Responsable exclusivamente de la reserva de citas en bloque."""
+    
+    @staticmethod
+    @require_POST
+    def reservar_lote(request):
+        """
+        Crea en una transacción las citas del JSON `{"appointments": [...], "partial": false}`.
+        Responde con el estado de cada ítem (created, invalid, conflict o skipped);
+        sin `partial`, basta un ítem con error para que no se cree ninguna cita.
+        """
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'No autorizado'}, status=403)
+        tenant = get_request_tenant(request)
+        if tenant is None:
+            return JsonResponse({'error': 'No se pudo determinar el tenant'}, status=400)
         
-        # Calcular el total según la estructura de data
-        if isinstance(data, dict) and 'payments' in data:
-            payments = data['payments']
-            total = sum(item.get('total_payment', 0) for item in payments)
-        elif isinstance(data, list):
-            total = sum(float(item.get('payment', 0)) for item in data)
+        payload = read_json(request)
+        if payload is None:
+            return JsonResponse({'error': 'JSON inválido'}, status=400)
+        appointments = payload.get('appointments')
+        if not isinstance(appointments, list) or not appointments:
+            return JsonResponse({'appointments': ['Se requiere una lista de citas.']}, status=400)
+        if len(appointments) > settings.BOOKING_MAX_ITEMS:
+            return JsonResponse({'appointments': [f'Máximo {settings.BOOKING_MAX_ITEMS} citas por solicitud.']}, status=400)
+        
+        items = []
+        errors = {}
+        for index, data in enumerate(appointments):
+            serializer = BookingItemSerializer(data=data if isinstance(data, dict) else {})
+            if serializer.is_valid():
+                items.append(serializer.validated_data)
+            else:
+                items.append(None)
+                errors[index] = serializer.errors
+        
+        created, results = BookingService(tenant).book(items, partial=bool(payload.get('partial')))
+        for index, item_errors in errors.items():
+            results[index]['errors'] = item_errors
+        
+        if created:
+            status = 201
+        elif any(result['status'] == 'conflict' for result in results):
+            status = 409
         else:
-            total = 0
-
-        # Pasar el contexto directamente al template
-        context = {
-            'date': serializer.validated_data.get('date'),
-            'data': data,
-            'total': total,
-            'title': 'Resumen de Caja Diaria'
+            status = 400
+        return JsonResponse({'created': len(created), 'results': results}, status=status)
+
+
+class TreatmentSeriesView:
+    """Responsable exclusivamente de las sesiones recurrentes de un tratamiento."""
+    
+    @staticmethod
+    def series_appointment(appointment):
+        return {
+            'id': appointment.pk,
+            'appointment_date': appointment.appointment_date.strftime('%Y-%m-%d'),
+            'appointment_hour': appointment.appointment_hour.strftime('%H:%M')
         }
+    
+    @staticmethod
+    @require_POST
+    def crear(request):
+        """Genera las sesiones de un tratamiento según los días de la semana y la cantidad de sesiones."""
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'No autorizado'}, status=403)
+        tenant = get_request_tenant(request)
+        if tenant is None:
+            return JsonResponse({'error': 'No se pudo determinar el tenant'}, status=400)
+        payload = read_json(request)
+        if payload is None:
+            return JsonResponse({'error': 'JSON inválido'}, status=400)
+        serializer = TreatmentSeriesSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        
+        params = serializer.validated_data
+        try:
+            series, appointments, conflicts = TreatmentSeriesService(tenant).create(
+                params, skip_conflicts=params['skip_conflicts']
+            )
+        except SeriesError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if series is None:
+            return JsonResponse({'created': 0, 'conflicts': conflicts}, status=409)
+        return JsonResponse({
+            'series': str(series),
+            'created': len(appointments),
+            'conflicts': conflicts,
+            'appointments': [TreatmentSeriesView.series_appointment(appointment) for appointment in appointments]
+        }, status=201)
+    
+    @staticmethod
+    @require_POST
+    def editar(request, series):
+        """Mueve en bloque las sesiones de la serie desde `from_date` (por defecto, hoy)."""
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'No autorizado'}, status=403)
+        tenant = get_request_tenant(request)
+        if tenant is None:
+            return JsonResponse({'error': 'No se pudo determinar el tenant'}, status=400)
+        payload = read_json(request)
+        if payload is None:
+            return JsonResponse({'error': 'JSON inválido'}, status=400)
+        serializer = TreatmentSeriesUpdateSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        
+        params = serializer.validated_data
+        try:
+            updated, conflicts = TreatmentSeriesService(tenant).update(
+                series,
+                params['from_date'],
+                days=params['days'],
+                appointment_hour=params.get('appointment_hour'),
+                therapist=params.get('therapist')
+            )
+        except SeriesNotFound as e:
+            return JsonResponse({'error': str(e)}, status=404)
+        except SeriesError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if conflicts:
+            return JsonResponse({'updated': 0, 'conflicts': conflicts}, status=409)
+        return JsonResponse({'updated': updated})
+
 
-        return render(request, 'pdf_templates/resumen_caja.html', context)
+class ImportView:
+    """Responsable exclusivamente de la importación masiva de datos del tenant."""
+    
+    # Cantidad máxima de errores por fila incluidos en la respuesta
+    MAX_REPORTED_ERRORS = 1000
+    
+    @staticmethod
+    @require_POST
+    def importar(request, kind):
+        """Importa un archivo CSV/JSONL subido en el campo `file` para el tenant activo."""
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return JsonResponse({'error': 'No autorizado'}, status=403)
+        tenant = get_request_tenant(request)
+        if tenant is None:
+            return JsonResponse({'error': 'No se pudo determinar el tenant'}, status=400)
+        if kind not in IMPORT_KINDS:
+            return JsonResponse({'error': f'Tipo de importación inválido: {kind}'}, status=404)
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse({'file': ['Este campo es obligatorio.']}, status=400)
+        file_format = request.POST.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'jsonl'):
+            return JsonResponse({'format': ['Use csv o jsonl.']}, status=400)
+        
+        # Las filas se leen del archivo subido de forma incremental
+        result = TenantImporter(tenant).run(kind, read_rows(open_text(upload.file), file_format))
+        errors = result['errors']
+        return JsonResponse({
+            'created': result['created'],
+            'error_count': len(errors),
+            'errors': errors[:ImportView.MAX_REPORTED_ERRORS]
+        })
 
 
 class ExcelExportView:
     """Responsable exclusivamente de la exportación a Excel."""
     
     @staticmethod
+    @tenant_required
     def exportar_excel_citas(request):
+        """
+        Exporta las citas entre dos fechas en modo streaming: las filas se leen
+        por bloques y xlsxwriter escribe en modo `constant_memory` sobre un
+        archivo temporal, así la memoria no crece con la cantidad de filas.
+        """
         # Validar parámetros
         serializer = DateParameterSerializer(data=request.GET)
         if not serializer.is_valid():
             return JsonResponse(serializer.errors, status=400)
         
-        # Obtener datos
-        data = report_service.get_appointments_between_dates(serializer.validated_data)
-        if isinstance(data, dict) and "error" in data:
-            return JsonResponse(data, status=400)
-        
-        # Crear archivo Excel
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet('Citas')
-        
-        # Formato para encabezados
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#2c3e50',
-            'font_color': 'white',
-            'border': 1
-        })
-        
-        # Escribir encabezados
-        headers = [
-            'ID Paciente', 
-            'DNI/Documento', 
-            'Paciente', 
-            'Teléfono', 
-            'Fecha', 
-            'Hora'
-        ]
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
+        # Obtener datos como iterador por bloques
+        rows = get_report_service(request, export=True).iter_appointments_between_dates(serializer.validated_data)
         
-        # Escribir datos
-        for row, appointment in enumerate(data, start=1):
-            worksheet.write(row, 0, appointment['patient_id'])
-            worksheet.write(row, 1, appointment['document_number_patient'])
-            worksheet.write(row, 2, appointment['patient'])
-            worksheet.write(row, 3, appointment['primary_phone_patient'])
-            worksheet.write(row, 4, appointment['appointment_date'])
-            worksheet.write(row, 5, appointment['appointment_hour'])
+        # Escribir el xlsx (fase medida en Server-Timing)
+        workbook = AppointmentWorkbook()
+        workbook.write_rows(rows)
+        output = workbook.close()
         
-        # Ajustar anchos de columna
-        worksheet.set_column('A:A', 12)  # ID Paciente
-        worksheet.set_column('B:B', 15)  # DNI/Documento
-        worksheet.set_column('C:C', 40)  # Paciente
-        worksheet.set_column('D:D', 15)  # Teléfono
-        worksheet.set_column('E:E', 12)  # Fecha
-        worksheet.set_column('F:F', 10)  # Hora
-        
-        workbook.close()
-        output.seek(0)
-        
-        # Generar respuesta
-        response = HttpResponse(
-            output.read(),
+        # Generar respuesta enviando el archivo por bloques
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename='citas.xlsx',
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        response['Content-Disposition'] = 'attachment; filename=citas.xlsx'
-        return response
+
+
+class StreamExportView:
+    """Responsable exclusivamente de las exportaciones en streaming (CSV y NDJSON)."""
+    
+    # Columnas exportadas, en el mismo orden que el reporte de citas entre fechas
+    APPOINTMENT_FIELDS = [
+        'appointment_id',
+        'patient_id',
+        'document_number_patient',
+        'patient',
+        'primary_phone_patient',
+        'appointment_date',
+        'appointment_hour'
+    ]
+    
+    @staticmethod
+    @tenant_required
+    def exportar_csv_citas(request):
         # Validar parámetros
         serializer = DateParameterSerializer(data=request.GET)
         if not serializer.is_valid():
             return JsonResponse(serializer.errors, status=400)
         
-        # Obtener datos
-        data = report_service.get_appointments_between_dates(serializer.validated_data)
-        if isinstance(data, dict) and "error" in data:
-            return JsonResponse(data, status=400)
-        
-        # Crear archivo Excel
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet('Citas')
-        
-        # Formato para encabezados
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#2c3e50',
-            'font_color': 'white',
-            'border': 1
-        })
-        
-        # Escribir encabezados
-        headers = ['Fecha', 'Hora', 'Terapeuta', 'Paciente', 'Pago', 'Tipo de Pago']
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-        
-        # Escribir datos
-        for row, appointment in enumerate(data, start=1):
-            worksheet.write(row, 0, appointment.get('appointment_date', ''))
-            worksheet.write(row, 1, appointment.get('appointment_hour', ''))
-            worksheet.write(row, 2, appointment.get('therapist', ''))
-            worksheet.write(row, 3, appointment.get('patient', ''))
-            worksheet.write(row, 4, float(appointment.get('payment', 0)))
-            worksheet.write(row, 5, appointment.get('payment_type', ''))
-        
-        # Ajustar anchos de columna
-        worksheet.set_column('A:A', 15)
-        worksheet.set_column('B:B', 10)
-        worksheet.set_column('C:D', 30)
-        worksheet.set_column('E:E', 12)
-        worksheet.set_column('F:F', 15)
-        
-        workbook.close()
-        output.seek(0)
-        
-        # Generar nombre de archivo
-        start_date = serializer.validated_data.get('start_date', '')
-        end_date = serializer.validated_data.get('end_date', '')
-        filename = f'citas_{start_date}_a_{end_date}.xlsx'
+        # Las filas se leen por bloques mientras se envía la respuesta
+        rows = get_report_service(request, export=True).iter_appointments_between_dates(serializer.validated_data)
+        return streaming_response(
+            request,
+            iter_csv(rows, StreamExportView.APPOINTMENT_FIELDS),
+            content_type='text/csv; charset=utf-8',
+            filename='citas.csv'
+        )
+    
+    @staticmethod
+    @tenant_required
+    def exportar_ndjson_citas(request):
+        # Validar parámetros
+        serializer = DateParameterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
         
-        response = HttpResponse(
-            output,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        # Las filas se leen por bloques mientras se envía la respuesta
+        rows = get_report_service(request, export=True).iter_appointments_between_dates(serializer.validated_data)
+        return streaming_response(
+            request,
+            iter_ndjson(rows),
+            content_type='application/x-ndjson',
+            filename='citas.ndjson'
         )
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-        return response
 
 
 # Instancias de las clases para mantener compatibilidad
 report_api = ReportAPIView()
 pdf_export = PDFExportView()
 excel_export = ExcelExportView()
+report_jobs = ReportJobView()
+importer = ImportView()
+patient_search = PatientSearchView()
+availability = AvailabilityView()
+booking = BookingView()
+treatment_series = TreatmentSeriesView()
+stream_export = StreamExportView()
 
 
 # Funciones que mantienen la interfaz original (no rompen funcionalidad) "# Versión función wrapper (capa de protección)"
@@ -383,6 +739,57 @@ def get_appointments_between_dates(request):
             'traceback': traceback.format_exc()
         }, status=500)
 
+def get_daily_dashboard(request):
+    try:
+        return report_api.get_daily_dashboard(request)
+    except Exception as e:
+        import traceback
+        print(f"Error en get_daily_dashboard: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return JsonResponse({
+            'error': f'Error interno del servidor: {str(e)}',
+            'traceback': traceback.format_exc()
+        }, status=500)
+
+def get_statistics(request):
+    try:
+        return report_api.get_statistics(request)
+    except Exception as e:
+        import traceback
+        print(f"Error en get_statistics: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return JsonResponse({
+            'error': f'Error interno del servidor: {str(e)}',
+            'traceback': traceback.format_exc()
+        }, status=500)
+
+def get_daily_series(request):
+    try:
+        return report_api.get_daily_series(request)
+    except Exception as e:
+        import traceback
+        print(f"Error en get_daily_series: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return JsonResponse({
+            'error': f'Error interno del servidor: {str(e)}',
+            'traceback': traceback.format_exc()
+        }, status=500)
+
+
+def request_metrics(request):
+    """
+    Devuelve los percentiles de tiempo y SQL por tenant y endpoint.
+    Los superusuarios ven todos los tenants; el resto del staff, solo el suyo.
+    """
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    if request.user.is_superuser:
+        return JsonResponse(metrics_store.summary())
+    tenant = get_request_tenant(request)
+    if tenant is None:
+        return tenant_forbidden()
+    return JsonResponse(metrics_store.summary(tenant=tenant.name))
+
 
 def reports_dashboard(request):
     return render(request, 'reports.html')
@@ -396,5 +803,38 @@ def pdf_pacientes_terapeuta(request):
 def pdf_resumen_caja(request):
     return pdf_export.pdf_resumen_caja(request)
 
+def buscar_pacientes(request):
+    return patient_search.buscar(request)
+
+def turnos_libres(request):
+    return availability.turnos_libres(request)
+
+def reservar_citas(request):
+    return booking.reservar_lote(request)
+
+def crear_serie(request):
+    return treatment_series.crear(request)
+
+def editar_serie(request, series):
+    return treatment_series.editar(request, series)
+
+def importar_datos(request, kind):
+    return importer.importar(request, kind)
+
+def submit_pdf_job(request):
+    return report_jobs.submit(request)
+
+def pdf_job_status(request, job_id):
+    return report_jobs.status(request, job_id)
+
+def pdf_job_download(request, job_id):
+    return report_jobs.download(request, job_id)
+
 def exportar_excel_citas(request):
     return excel_export.exportar_excel_citas(request)
+
+def exportar_csv_citas(request):
+    return stream_export.exportar_csv_citas(request)
+
+def exportar_ndjson_citas(request):
+    return stream_export.exportar_ndjson_citas(request)
@@ -0,0 +1,80 @@
+import tempfile
+from itertools import islice
+
+import xlsxwriter
+
+from .metrics import phase
+
+
+class AppointmentWorkbook:
+    """
+    Libro xlsx de citas escrito en modo `constant_memory` sobre un archivo
+    temporal: las filas se agregan por bloques y la memoria no crece con la
+    cantidad de filas.
+    """
+
+    HEADERS = [
+        'ID Paciente', 
+        'DNI/Documento', 
+        'Paciente', 
+        'Teléfono', 
+        'Fecha', 
+        'Hora'
+    ]
+
+    def __init__(self):
+        with phase('xlsx'):
+            # Crear archivo Excel sobre un archivo temporal (se elimina al cerrarse)
+            self.output = tempfile.TemporaryFile()
+            self.workbook = xlsxwriter.Workbook(self.output, {'constant_memory': True})
+            self.worksheet = self.workbook.add_worksheet('Citas')
+            
+            # Formato para encabezados
+            header_format = self.workbook.add_format({
+                'bold': True,
+                'bg_color': '#2c3e50',
+                'font_color': 'white',
+                'border': 1
+            })
+            
+            # Ajustar anchos de columna
+            self.worksheet.set_column('A:A', 12)  # ID Paciente
+            self.worksheet.set_column('B:B', 15)  # DNI/Documento
+            self.worksheet.set_column('C:C', 40)  # Paciente
+            self.worksheet.set_column('D:D', 15)  # Teléfono
+            self.worksheet.set_column('E:E', 12)  # Fecha
+            self.worksheet.set_column('F:F', 10)  # Hora
+            
+            # Escribir encabezados
+            for col, header in enumerate(self.HEADERS):
+                self.worksheet.write(0, col, header, header_format)
+        self.row = 1
+
+    def write_rows(self, rows, chunk_size=2000):
+        """
+        Agrega filas de citas (en modo constant_memory deben ir en orden).
+        Cada bloque se lee de `rows` fuera de la fase 'xlsx': si es un
+        iterador del ORM, el tiempo de sus consultas se mide como SQL.
+        """
+        worksheet = self.worksheet
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            with phase('xlsx'):
+                for appointment in chunk:
+                    worksheet.write(self.row, 0, appointment['patient_id'])
+                    worksheet.write(self.row, 1, appointment['document_number_patient'])
+                    worksheet.write(self.row, 2, appointment['patient'])
+                    worksheet.write(self.row, 3, appointment['primary_phone_patient'])
+                    worksheet.write(self.row, 4, appointment['appointment_date'])
+                    worksheet.write(self.row, 5, appointment['appointment_hour'])
+                    self.row += 1
+
+    def close(self):
+        """Cierra el libro y devuelve el archivo temporal listo para leer."""
+        with phase('xlsx'):
+            self.workbook.close()
+        self.output.seek(0)
+        return self.output